@@ -1,13 +1,29 @@
+import re
 from datetime import datetime
 
-def calculate_priority_score(thoi_gian_ket_thuc_str, muc_do_quan_trong, diem_kho):
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Các mốc (giờ còn lại) mà công thức Urgency đổi nhánh:
+# <= 0: quá hạn | 0-24: tuyến tính dốc | 24-72: tuyến tính thoải | >= 72: hằng số
+URGENCY_BREAKPOINTS = (0, 24, 72)
+LINEAR_BAND_HOURS = URGENCY_BREAKPOINTS[-1]
+
+def calculate_priority_score(thoi_gian_ket_thuc_str, muc_do_quan_trong, diem_kho, now=None):
     """
     Tính điểm ưu tiên dựa trên Deadline (Urgency), Độ quan trọng (Importance) và Độ khó (Difficulty).
+    thoi_gian_ket_thuc_str: chuỗi '%Y-%m-%d %H:%M:%S' hoặc datetime (đọc thẳng từ DB).
+    now: mốc thời gian tính điểm, mặc định là datetime.now().
     """
     try:
         # 1. Tính độ khẩn cấp (Urgency)
-        deadline = datetime.strptime(thoi_gian_ket_thuc_str, '%Y-%m-%d %H:%M:%S')
-        now = datetime.now()
+        if isinstance(thoi_gian_ket_thuc_str, datetime):
+            deadline = thoi_gian_ket_thuc_str
+        else:
+            deadline = datetime.strptime(thoi_gian_ket_thuc_str, '%Y-%m-%d %H:%M:%S')
+        now = now or datetime.now()
         hours_remaining = (deadline - now).total_seconds() / 3600
         
         if hours_remaining <= 0: return 1000.0 # Quá hạn -> Ưu tiên tối đa
@@ -28,4 +44,80 @@ def calculate_priority_score(thoi_gian_ket_thuc_str, muc_do_quan_trong, diem_kho
         return round(final_score, 2)
     except Exception as e:
         print(f"Lỗi tính toán Priority: {e}")
-        return 0.0
\ No newline at end of file
+        return 0.0
+
+# ======================================================
+# TÍNH ĐIỂM HÀNG LOẠT (VECTOR HÓA BẰNG NUMPY)
+# ======================================================
+# Chuỗi đúng dạng '%Y-%m-%d %H:%M:%S' có đủ số 0 đầu -> NumPy đọc được trực tiếp
+_CANONICAL_DT = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+def _to_datetime64(deadlines):
+    """
+    Chuyển danh sách deadline sang datetime64[s]; dòng lỗi -> NaT.
+    Chuỗi chỉ nhận đúng dạng mà calculate_priority_score nhận ('%Y-%m-%d %H:%M:%S'):
+    NumPy tự đọc được cả '2030-01-01' hay '...T14:40' nên không đưa thẳng chuỗi lạ cho NumPy.
+    """
+    if all(isinstance(d, str) and _CANONICAL_DT.fullmatch(d) for d in deadlines):
+        try:
+            return np.asarray(deadlines, dtype='datetime64[s]')
+        except ValueError:
+            pass   # đúng dạng nhưng sai giá trị (tháng 13...) -> xử lý từng dòng
+    out = np.empty(len(deadlines), dtype='datetime64[s]')
+    for i, d in enumerate(deadlines):
+        try:
+            if isinstance(d, str):
+                d = datetime.strptime(d, '%Y-%m-%d %H:%M:%S')
+            elif not isinstance(d, (datetime, np.datetime64)):
+                raise TypeError(d)
+            out[i] = np.datetime64(d, 's')
+        except (ValueError, TypeError):
+            out[i] = np.datetime64('NaT')
+    return out
+
+def _to_float(values):
+    """Chuyển sang mảng float; dòng lỗi -> NaN."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (ValueError, TypeError):
+        out = np.empty(len(values), dtype=float)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (ValueError, TypeError):
+                out[i] = np.nan
+        return out
+
+def calculate_priority_scores_batch(deadlines, importance, difficulty, now=None):
+    """
+    Phiên bản hàng loạt của calculate_priority_score, tính trên mảng NumPy trong một lượt.
+    deadlines: chuỗi '%Y-%m-%d %H:%M:%S', datetime hoặc datetime64.
+    importance, difficulty: cùng độ dài với deadlines (thang 1-5).
+    Trả về (scores, error_mask): dòng lỗi có score 0.0 và error_mask True
+    thay vì bị nuốt lỗi như bản đơn lẻ.
+    """
+    if np is None:
+        raise RuntimeError("Cần cài numpy để dùng calculate_priority_scores_batch")
+
+    deadline_arr = _to_datetime64(deadlines)
+    importance_arr = _to_float(importance)
+    difficulty_arr = _to_float(difficulty)
+    if not (len(deadline_arr) == len(importance_arr) == len(difficulty_arr)):
+        raise ValueError("deadlines, importance, difficulty phải cùng độ dài")
+
+    now64 = np.datetime64(now or datetime.now(), 's')
+    hours = (deadline_arr - now64).astype('timedelta64[s]').astype(float) / 3600
+
+    error_mask = np.isnat(deadline_arr) | np.isnan(importance_arr) | np.isnan(difficulty_arr)
+
+    # Cùng công thức nhiều nhánh như calculate_priority_score
+    urgency = np.select(
+        [hours < 24, hours < 72],
+        [100 - hours * 2, 50 - hours / 3],
+        default=10.0,
+    )
+    scores = (np.maximum(0, urgency) * 0.5) + (importance_arr * 20 * 0.3) + (difficulty_arr * 20 * 0.2)
+    scores = np.round(scores, 2)
+    scores = np.where(hours <= 0, 1000.0, scores)
+    scores = np.where(error_mask, 0.0, scores)
+    return scores, error_mask
@@ -1,8 +1,74 @@
-def optimize_schedule(tasks):
+import heapq
+from datetime import datetime
+
+# Câu ORDER BY tương ứng với thứ tự của optimize_schedule (_priority_key), dùng khi muốn DB sắp
+# xếp sẵn: điểm NULL tính là 0, hạn NULL xếp cuối nhóm cùng điểm, LichTrinhID để thứ tự ổn định
+SCHEDULE_ORDER_BY = ("ORDER BY COALESCE(DiemUuTien, 0) DESC, "
+                     "CASE WHEN ThoiGianKetThuc IS NULL THEN 1 ELSE 0 END, ThoiGianKetThuc ASC, LichTrinhID ASC")
+
+def _priority_key(task):
+    """
+    Khóa sắp xếp: điểm cao trước, cùng điểm thì hạn sớm trước.
+    Task không có hạn xếp cuối trong nhóm cùng điểm.
+    """
+    deadline = task.get('ThoiGianKetThuc')
+    if isinstance(deadline, datetime):
+        deadline = deadline.strftime('%Y-%m-%d %H:%M:%S')
+    return (-(task.get('DiemUuTien') or 0), deadline is None, deadline or '')
+
+def row_to_task(columns, row):
+    """Chuyển một dòng SQL thành dictionary nhiệm vụ (điểm float, thời gian dạng chuỗi)."""
+    task = dict(zip(columns, row))
+    if task.get('DiemUuTien'): task['DiemUuTien'] = float(task['DiemUuTien'])
+    # Convert datetime to string for JSON
+    if isinstance(task.get('ThoiGianKetThuc'), datetime):
+        task['ThoiGianKetThuc'] = task['ThoiGianKetThuc'].strftime('%Y-%m-%d %H:%M:%S')
+    return task
+
+def optimize_schedule(tasks, limit=None):
     """
     Sắp xếp danh sách nhiệm vụ dựa trên Điểm Ưu Tiên (DiemUuTien).
     tasks: Danh sách các dictionary.
+    limit: Chỉ lấy `limit` nhiệm vụ đầu tiên (dùng heap, O(n log k)).
+    """
+    if limit is not None:
+        # nsmallest ổn định như sorted(...)[:limit] nhưng không sắp xếp toàn bộ
+        return heapq.nsmallest(max(0, int(limit)), tasks, key=_priority_key)
+    # Sắp xếp giảm dần theo điểm: Điểm cao làm trước
+    sorted_tasks = sorted(tasks, key=_priority_key)
+    return sorted_tasks
+
+def iter_schedule(cursor, limit=None, presorted=False, batch_size=200):
+    """
+    Generator trả về nhiệm vụ theo thứ tự ưu tiên, đọc thẳng từ cursor.
+    - presorted=True: câu SQL đã có SCHEDULE_ORDER_BY -> yield ngay từng dòng,
+      không giữ cả danh sách trong bộ nhớ.
+    - presorted=False: gom dòng vào heap (có limit thì heap giới hạn k phần tử),
+      rồi lấy dần ra, không sắp xếp toàn bộ trước khi trả phần tử đầu tiên.
     """
-    # Sắp xếp giảm dần (reverse=True): Điểm cao làm trước
-    sorted_tasks = sorted(tasks, key=lambda x: x.get('DiemUuTien') or 0, reverse=True)
-    return sorted_tasks
\ No newline at end of file
+    columns = [column[0] for column in cursor.description]
+
+    def rows():
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            for row in batch:
+                yield row_to_task(columns, row)
+
+    if presorted:
+        for i, task in enumerate(rows()):
+            if limit is not None and i >= limit:
+                return
+            yield task
+        return
+
+    if limit is not None:
+        yield from optimize_schedule(rows(), limit=limit)
+        return
+
+    # Thứ tự chèn làm khóa phụ để giữ tính ổn định giống sorted()
+    heap = [(_priority_key(task), i, task) for i, task in enumerate(rows())]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[2]
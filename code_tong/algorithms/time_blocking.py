@@ -0,0 +1,214 @@
+import bisect
+from datetime import datetime, timedelta, time
+
+# ======================================================
+# XẾP LỊCH HỌC THEO KHUNG GIỜ (TIME-BLOCKING)
+# ======================================================
+# Thuật toán: Earliest-Deadline-First (EDF). Nhiệm vụ có hạn sớm nhất được
+# nhận khung giờ trống sớm nhất. Với một người làm một việc tại một thời điểm
+# và được phép chia nhỏ nhiệm vụ, EDF cho độ trễ tối đa nhỏ nhất.
+
+# Ước lượng khối lượng công việc (giờ) từ độ khó môn và độ quan trọng
+EFFORT_BASE_HOURS = 0.5
+EFFORT_PER_DIFFICULTY = 0.5   # mỗi điểm DiemKho (1-5)
+EFFORT_PER_IMPORTANCE = 0.25  # mỗi điểm MucDoQuanTrong (1-5)
+
+MIN_BLOCK_MINUTES = 15
+MAX_BLOCK_MINUTES = 120
+
+# Giới hạn đầu vào từ request: số ngày xếp lịch và số khung giờ
+MAX_HORIZON_DAYS = 180
+MAX_WINDOWS = 200
+
+# Khung giờ mặc định: buổi tối mỗi ngày (Thu: 0 = Thứ Hai ... 6 = Chủ Nhật)
+DEFAULT_WINDOWS = [{"Thu": d, "BatDau": "19:00", "KetThuc": "22:00"} for d in range(7)]
+
+def _parse_dt(value):
+    if isinstance(value, datetime) or value is None:
+        return value
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+def _parse_hm(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+def _task_deadline(task):
+    """Hạn của nhiệm vụ; None nếu không có hoặc sai định dạng (xếp như không có hạn)."""
+    try:
+        return _parse_dt(task.get('ThoiGianKetThuc'))
+    except (TypeError, ValueError):
+        return None
+
+def clamp_horizon_days(days):
+    """SoNgay từ request -> số nguyên trong [1, MAX_HORIZON_DAYS]; ValueError nếu không phải số."""
+    try:
+        return min(max(1, int(days)), MAX_HORIZON_DAYS)
+    except (TypeError, ValueError):
+        raise ValueError("SoNgay phải là số nguyên")
+
+def validate_windows(windows):
+    """
+    Kiểm tra KhungGio từ request trước khi xếp lịch; None = dùng DEFAULT_WINDOWS.
+    ValueError (kèm vị trí khung lỗi) nếu sai cấu trúc, sai định dạng giờ hoặc Thu ngoài 0-6.
+    """
+    if windows is None:
+        return None
+    if not isinstance(windows, list) or not windows:
+        raise ValueError("KhungGio phải là danh sách khung giờ")
+    if len(windows) > MAX_WINDOWS:
+        raise ValueError(f"KhungGio tối đa {MAX_WINDOWS} khung")
+    for i, w in enumerate(windows):
+        try:
+            if 'Thu' in w:
+                if int(w['Thu']) not in range(7):
+                    raise ValueError
+                _parse_hm(w['BatDau']), _parse_hm(w['KetThuc'])
+            elif _parse_dt(w['KetThuc']) <= _parse_dt(w['BatDau']):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise ValueError(f"KhungGio[{i}] không hợp lệ (cần Thu 0-6 + HH:MM, hoặc BatDau/KetThuc "
+                             "dạng YYYY-MM-DD HH:MM:SS)")
+    return windows
+
+def estimate_effort_minutes(diem_kho, muc_do_quan_trong):
+    """Số phút học ước tính cho một nhiệm vụ."""
+    hours = (EFFORT_BASE_HOURS
+             + float(diem_kho or 3) * EFFORT_PER_DIFFICULTY
+             + float(muc_do_quan_trong or 3) * EFFORT_PER_IMPORTANCE)
+    return int(round(hours * 60))
+
+def expand_windows(windows, start, days):
+    """
+    Trải khung giờ lặp theo tuần ra các khoảng (bắt đầu, kết thúc) cụ thể
+    trong [start, start + days). Chấp nhận thêm khung cụ thể dạng
+    {"BatDau": "YYYY-mm-dd HH:MM:SS", "KetThuc": "..."} (không có "Thu").
+    """
+    end = start + timedelta(days=days)
+    intervals = []
+    for w in windows:
+        if 'Thu' not in w:
+            s, e = _parse_dt(w['BatDau']), _parse_dt(w['KetThuc'])
+            if e > start and s < end:
+                intervals.append((max(s, start), min(e, end)))
+            continue
+        t_start, t_end = _parse_hm(w['BatDau']), _parse_hm(w['KetThuc'])
+        day = start.date()
+        while day < end.date() + timedelta(days=1):
+            if day.weekday() == int(w['Thu']):
+                s = datetime.combine(day, t_start)
+                # Khung qua nửa đêm (VD 22:00 - 01:00)
+                e = datetime.combine(day + timedelta(days=1) if t_end <= t_start else day, t_end)
+                if e > start and s < end:
+                    intervals.append((max(s, start), min(e, end)))
+            day += timedelta(days=1)
+    return intervals
+
+
+class FreeSlots:
+    """
+    Tập khoảng trống rời nhau, sắp theo thời gian bắt đầu.
+    Vì các khoảng không chồng lấn, danh sách sắp xếp + bisect đủ đóng vai trò
+    cây khoảng: tìm khoảng đầu tiên sau một mốc trong O(log n).
+    """
+
+    def __init__(self, intervals):
+        merged = []
+        for s, e in sorted(intervals):
+            if e <= s:
+                continue
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self._starts = [s for s, _ in merged]
+        self._slots = merged
+
+    def total_minutes(self):
+        return sum((e - s).total_seconds() for s, e in self._slots) / 60
+
+    def _find(self, moment):
+        """Chỉ số khoảng trống đầu tiên kết thúc sau `moment`, None nếu không còn."""
+        i = bisect.bisect_right(self._starts, moment) - 1
+        if i < 0 or self._slots[i][1] <= moment:
+            i += 1
+        return i if i < len(self._slots) else None
+
+    def take(self, minutes, not_before=None, max_block=MAX_BLOCK_MINUTES, min_block=MIN_BLOCK_MINUTES):
+        """
+        Lấy tối đa `minutes` phút trống sớm nhất (từ mốc not_before), chia thành
+        các khối <= max_block. Trả về danh sách (bắt đầu, kết thúc).
+        """
+        blocks = []
+        if not self._slots:
+            return blocks
+        cursor = not_before or self._slots[0][0]
+        while minutes > 0:
+            i = self._find(cursor)
+            if i is None:
+                break
+            slot_s, slot_e = self._slots[i]
+            s = max(slot_s, cursor)
+            available = (slot_e - s).total_seconds() / 60
+            # Bỏ qua khoảng quá ngắn, trừ khi chỉ còn thiếu ít hơn một khối tối thiểu
+            if available < min(min_block, minutes):
+                cursor = slot_e
+                continue
+            use = min(minutes, available, max_block)
+            block_end = s + timedelta(minutes=use)
+            blocks.append((s, block_end))
+            self._consume(i, s, block_end)
+            minutes -= use
+            cursor = block_end
+        return blocks
+
+    def _consume(self, i, s, e):
+        slot_s, slot_e = self._slots[i]
+        pieces = [p for p in ([slot_s, s], [e, slot_e]) if p[1] > p[0]]
+        self._slots[i:i + 1] = pieces
+        self._starts[i:i + 1] = [p[0] for p in pieces]
+
+
+def plan_study_blocks(tasks, windows=None, now=None, horizon_days=30,
+                      max_block=MAX_BLOCK_MINUTES, min_block=MIN_BLOCK_MINUTES):
+    """
+    Gán các khối học không chồng lấn cho từng nhiệm vụ.
+    tasks: dictionary có LichTrinhID, ThoiGianKetThuc, MucDoQuanTrong, DiemKho
+           (tùy chọn SoPhutUocTinh để ghi đè ước lượng, DiemUuTien để phá hòa).
+    windows: khung giờ rảnh (xem expand_windows), mặc định DEFAULT_WINDOWS.
+    Trả về {"Blocks": [...], "Tasks": [...]} với Blocks sắp theo thời gian.
+    """
+    now = now or datetime.now()
+    slots = FreeSlots(expand_windows(windows or DEFAULT_WINDOWS, now, horizon_days))
+    far_future = now + timedelta(days=horizon_days)
+
+    def edf_key(task):
+        deadline = _task_deadline(task) or far_future
+        return (deadline, -(task.get('DiemUuTien') or 0))
+
+    blocks, summary = [], []
+    for task in sorted(tasks, key=edf_key):
+        deadline = _task_deadline(task)
+        need = task.get('SoPhutUocTinh') or estimate_effort_minutes(task.get('DiemKho'), task.get('MucDoQuanTrong'))
+        assigned = slots.take(need, not_before=now, max_block=max_block, min_block=min_block)
+
+        scheduled = sum((e - s).total_seconds() for s, e in assigned) / 60
+        finish = assigned[-1][1] if assigned else None
+        for s, e in assigned:
+            blocks.append({
+                "LichTrinhID": task.get('LichTrinhID'),
+                "TieuDe": task.get('TieuDe'),
+                "MonHocID": task.get('MonHocID'),
+                "BatDau": s.strftime('%Y-%m-%d %H:%M:%S'),
+                "KetThuc": e.strftime('%Y-%m-%d %H:%M:%S'),
+                "SoPhut": int(round((e - s).total_seconds() / 60)),
+            })
+        summary.append({
+            "LichTrinhID": task.get('LichTrinhID'),
+            "SoPhutCan": int(need),
+            "SoPhutDaXep": int(round(scheduled)),
+            "HoanThanhLuc": finish.strftime('%Y-%m-%d %H:%M:%S') if finish else None,
+            # Trễ hạn: không đủ giờ trống hoặc xong sau hạn nộp
+            "TreHan": scheduled < need or (deadline is not None and finish is not None and finish > deadline),
+        })
+
+    blocks.sort(key=lambda b: b["BatDau"])
+    return {"Blocks": blocks, "Tasks": summary}
@@ -1,18 +1,35 @@
 ﻿import os
+import json
+import atexit
 import logging
-import requests
-import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+import time
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
 from flask_cors import CORS
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 # --- IMPORT MODULE ---
 try:
-    from database.db_connector import get_db_connection
+    from database.db_connector import get_db_connection, reset_pool, close_pool, get_pool_stats, backend
     from algorithms.priority_logic import calculate_priority_score
-    from algorithms.scheduling_logic import optimize_schedule
+    from algorithms.scheduling_logic import iter_schedule, row_to_task, SCHEDULE_ORDER_BY
+    from database.schedule_queries import build_schedule_page_query, clamp_page_size, encode_cursor, parse_flag
+    from algorithms.time_blocking import plan_study_blocks, clamp_horizon_days, validate_windows
+    from services.priority_refresher import PriorityRefresher
+    from services.cache import TTLCache
+    from services.search_client import GoogleSearchClient, CachedSearch
+    from member_c_logic import rank_material_trust, save_ranked_materials
+    from services.llm_backend import LLMRunner, LLMBusyError
+    from services.model_resolver import ModelProvider
+    from services.prompt_builder import select_context_rows, render_context, assemble_prompt
+    from services.session_store import create_session_store, new_session_id
+    from services.response_cache import ResponseCache
+    from services.bulk_import import parse_payload, import_deadlines, new_lich_trinh_id
+    from services.reference_cache import ReferenceCache
+    from services.job_queue import JobQueue, SQLiteJobStore
+    from services.deadline_notifier import DeadlineNotifier, log_event, post_webhook
+    from services.schedule_events import ScheduleEventBus, TooManySubscribersError
+    from services.metrics import (registry, timed, cache_collector, REQUEST_LATENCY,
+                                  RequestProfiler, PROFILE_ENABLED, PROFILE_HEADER, MultiProcessMetrics)
 except ImportError:
     print("⚠️ Cảnh báo: Thiếu file module logic/database.")
 
@@ -23,29 +40,54 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CX = os.getenv("GOOGLE_CX")
 PORT = 5001
+PRIORITY_REFRESH_INTERVAL = int(os.getenv("PRIORITY_REFRESH_INTERVAL", "300"))
+# Nhiều worker: chỉ worker giữ khóa file này làm mới điểm định kỳ (gunicorn.conf.py tự đặt khi workers > 1)
+PRIORITY_REFRESH_LOCK_FILE = os.getenv("PRIORITY_REFRESH_LOCK_FILE") or None
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "300"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()   # 'gemini' hoặc 'fake' (chạy offline)
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "3000"))
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "10"))          # số deadline điểm cao nhất đưa vào prompt
+CONTEXT_NEAREST_K = int(os.getenv("CONTEXT_NEAREST_K", "5"))   # + số deadline sắp đến hạn gần nhất
+CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory")   # 'memory' hoặc 'sqlite'
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "chat_sessions.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_STORE = os.getenv("JOB_STORE", "memory").lower()   # 'memory' hoặc 'sqlite' (bền, sống qua khởi động lại)
+JOB_DB = os.getenv("JOB_DB", "jobs.db")
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 86400)))   # giây giữ việc đã xong trong store bền
+SAVE_MATERIALS_LIMIT = int(os.getenv("SAVE_MATERIALS_LIMIT", "5"))   # số tài liệu đầu được lưu mỗi lần tìm
+CHAT_SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", "3600"))
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "600"))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "1"))   # >= 1: chỉ khớp chính xác; < 1: bật so gần đúng
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "10000"))   # số dòng tối đa mỗi lần nhập hàng loạt
+REF_CACHE_TTL = int(os.getenv("REF_CACHE_TTL", "600"))     # độ cũ tối đa của cache SinhVien/MonHoc
+REF_CACHE_WARM = os.getenv("REF_CACHE_WARM", "1") == "1"   # nạp trước bảng MonHoc khi khởi động worker
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "1") == "1"   # thông báo deadline sắp tới / quá hạn
+NOTIFY_LEAD_MINUTES = [int(m) for m in os.getenv("NOTIFY_LEAD_MINUTES", "1440,60,0").split(",") if m.strip()]
+NOTIFY_TICK = float(os.getenv("NOTIFY_TICK", "60"))   # độ phân giải (giây) của timer wheel
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL")   # nếu có: POST từng sự kiện qua hàng đợi việc nền
+# Nhiều worker: chỉ worker giữ khóa file này chạy notifier (gunicorn.conf.py tự đặt khi workers > 1)
+NOTIFY_LOCK_FILE = os.getenv("NOTIFY_LOCK_FILE") or None
+# Nhiều worker: mỗi worker ghi snapshot metrics vào thư mục này, /metrics gộp lại (gunicorn.conf.py tự đặt)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+# Mỗi kết nối SSE giữ một luồng worker -> giới hạn để còn luồng cho request thường
+# Bus sự kiện chỉ phát trong một tiến trình: nhiều worker gunicorn thì thay đổi ghi ở worker A
+# không tới client đang nghe ở worker B. Cần pub/sub dùng chung (vd. Redis) mới bật được
+# khi chạy nhiều worker; tắt thì /api/schedule/events trả 503 và script.js tải lại định kỳ.
+SCHEDULE_SSE_ENABLED = os.getenv("SCHEDULE_SSE_ENABLED", "1") == "1"
+SCHEDULE_SSE_MAX_SUBSCRIBERS = int(os.getenv("SCHEDULE_SSE_MAX_SUBSCRIBERS", "4"))
+SCHEDULE_SSE_MAX_DURATION = int(os.getenv("SCHEDULE_SSE_MAX_DURATION", "300"))   # giây, hết thì client tự kết nối lại
+SCHEDULE_SSE_KEEPALIVE = int(os.getenv("SCHEDULE_SSE_KEEPALIVE", "15"))
+CHAT_SV_ID = 'SV001' # Mặc định lấy của SV001
 
 # ======================================================
 # CẤU HÌNH GEMINI (TỰ ĐỘNG DÒ TÌM MODEL)
 # ======================================================
-model_gemini = None
-active_model_name = "Chưa kết nối"
-
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("--- 📡 Đang kết nối AI... ---")
-    try:
-        # Lấy danh sách model và chọn cái nào dùng được
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                if 'gemini' in m.name:
-                    model_gemini = genai.GenerativeModel(m.name)
-                    active_model_name = m.name
-                    print(f"--- ✅ ĐÃ KẾT NỐI: {active_model_name} ---")
-                    break
-        if not model_gemini:
-             print("--- ❌ Không tìm thấy model AI nào phù hợp ---")
-    except Exception as e:
-        print(f"--- ❌ Lỗi AI: {str(e)} ---")
+# Model được chọn ở lần chat đầu tiên (không gọi mạng lúc khởi động),
+# ưu tiên GEMINI_MODEL rồi tới file cache (xem services/model_resolver.py)
+gemini_provider = ModelProvider(GEMINI_API_KEY, backend=LLM_BACKEND)
 
 # ======================================================
 # FLASK SETUP
@@ -55,8 +97,165 @@ app = Flask(__name__, static_folder=base_dir, static_url_path='')
 CORS(app)
 logging.basicConfig(level=logging.INFO)
 
+# Luồng nền làm mới DiemUuTien (chỉ tính lại các dòng có điểm thay đổi)
+priority_refresher = PriorityRefresher(interval=PRIORITY_REFRESH_INTERVAL, lock_path=PRIORITY_REFRESH_LOCK_FILE)
+
+# Cache văn bản ngữ cảnh lịch trình theo SinhVienID (xóa khi LichTrinh thay đổi)
+schedule_context_cache = TTLCache(max_size=1000, ttl=CONTEXT_CACHE_TTL)
+
+# Cache câu trả lời chat cho câu hỏi lặp lại / gần giống trên cùng ngữ cảnh
+chat_response_cache = ResponseCache(ttl=CHAT_CACHE_TTL, similarity=CHAT_CACHE_SIMILARITY)
+
+# Cache tra cứu SinhVien tồn tại / MonHoc.DiemKho cho luồng tạo deadline
+reference_cache = ReferenceCache(ttl=REF_CACHE_TTL)
+
+# Chỉ mục deadline trong cửa sổ sắp tới + timer wheel bắn sự kiện ở các mốc báo trước
+deadline_notifier = DeadlineNotifier(lead_minutes=NOTIFY_LEAD_MINUTES, tick=NOTIFY_TICK, lock_path=NOTIFY_LOCK_FILE)
+deadline_notifier.add_listener(log_event)
+if NOTIFY_WEBHOOK_URL:
+    deadline_notifier.add_listener(lambda event: job_queue.enqueue('notify_webhook', event))
+
+# Pub/sub thay đổi LichTrinh theo sinh viên -> kênh SSE /api/schedule/events
+schedule_bus = ScheduleEventBus(max_subscribers=SCHEDULE_SSE_MAX_SUBSCRIBERS)
+
+def invalidate_schedule_context(sv_id):
+    schedule_context_cache.invalidate(sv_id)
+    chat_response_cache.invalidate(sv_id)
+
+def publish_rescored(changes):
+    """changes = [(LichTrinhID, SinhVienID, điểm mới)] -> một sự kiện 'rescored' mỗi sinh viên đang theo dõi."""
+    by_student = {}
+    for lt_id, sv_id, score in changes:
+        if schedule_bus.watched(sv_id):
+            by_student.setdefault(sv_id, []).append({"LichTrinhID": lt_id, "DiemUuTien": float(score)})
+    for sv_id, tasks in by_student.items():
+        schedule_bus.publish(sv_id, "rescored", tasks=tasks)
+
+# Điểm ưu tiên được làm mới -> ngữ cảnh của các sinh viên đó đã cũ, client đang mở nhận điểm mới
+priority_refresher.add_listener(
+    lambda changes: [invalidate_schedule_context(sv) for sv in {c[1] for c in changes}]
+)
+priority_refresher.add_listener(publish_rescored)
+
+def publish_deadline_event(event):
+    """Thông báo deadline sắp tới/quá hạn cũng được đẩy qua kênh SSE của sinh viên."""
+    fields = {k: v for k, v in event.items() if k not in ("type", "SinhVienID")}
+    schedule_bus.publish(event["SinhVienID"], "deadline", kind=event["type"], **fields)
+
+deadline_notifier.add_listener(publish_deadline_event)
+
+search_service = llm_runner = chat_sessions = job_queue = None
+
+def _create_process_resources():
+    """
+    Tài nguyên gắn với tiến trình (luồng, socket, file SQLite): không được dùng chung
+    qua fork nên mỗi worker phải tự tạo lại (xem init_worker).
+    """
+    global search_service, llm_runner, chat_sessions, job_queue
+    # Tìm kiếm tài liệu: cache theo truy vấn chuẩn hóa + gộp truy vấn trùng đồng thời
+    search_service = CachedSearch(GoogleSearchClient(GOOGLE_API_KEY, GOOGLE_CX), ttl=SEARCH_CACHE_TTL)
+
+    # Lời gọi LLM chạy trên pool riêng, giới hạn đồng thời để không chiếm hết worker Flask
+    llm_runner = LLMRunner(max_workers=LLM_MAX_WORKERS, timeout=LLM_TIMEOUT)
+
+    # Lịch sử chat lưu phía server theo session_id, client chỉ gửi tin nhắn mới
+    chat_sessions = create_session_store(CHAT_SESSION_BACKEND, path=CHAT_SESSION_DB, idle_ttl=CHAT_SESSION_TTL)
+
+    # Việc chậm/không quan trọng (lưu tài liệu, tính lại điểm, chat bất đồng bộ) chạy nền
+    store = SQLiteJobStore(JOB_DB) if JOB_STORE == "sqlite" else None
+    job_queue = JobQueue(workers=JOB_WORKERS, store=store, retention=JOB_RETENTION)
+    job_queue.register('save_materials', lambda p: save_ranked_materials(
+        p['results'], limit=p.get('limit', SAVE_MATERIALS_LIMIT), raise_errors=True), concurrency=2)
+    job_queue.register('rescore', lambda p: len(priority_refresher.run_once()), concurrency=1, max_attempts=1)
+    job_queue.register('chat', lambda p: run_chat_job(p), concurrency=LLM_MAX_WORKERS)
+    job_queue.register('notify_webhook', lambda p: post_webhook(NOTIFY_WEBHOOK_URL, p), concurrency=2)
+
+_create_process_resources()
+
+# ======================================================
+# METRICS & PROFILE
+# ======================================================
+def _collect_app_metrics():
+    pool = get_pool_stats()
+    llm = llm_runner.stats()
+    samples = [
+        ("db_pool_connections", "gauge", "Kết nối trong pool", {"state": "in_use"}, pool["in_use"]),
+        ("db_pool_connections", "gauge", "Kết nối trong pool", {"state": "idle"}, pool["idle"]),
+        ("db_pool_waiters", "gauge", "Số luồng đang chờ mượn kết nối", {}, pool["waiters"]),
+        ("db_pool_timeouts_total", "counter", "Số lần hết thời gian chờ kết nối", {}, pool["timeouts"]),
+        ("llm_in_flight", "gauge", "Số lời gọi LLM đang chạy", {}, llm["in_flight"]),
+        ("llm_rejected_total", "counter", "Số lời gọi LLM bị từ chối vì quá tải", {}, llm["rejected"]),
+    ]
+    jobs = job_queue.stats()
+    samples += [("jobs_pending", "gauge", "Việc nền đang chờ", {"type": t}, n) for t, n in jobs["ready"].items()]
+    samples += [("jobs_running", "gauge", "Việc nền đang chạy", {"type": t}, n) for t, n in jobs["running"].items()]
+    samples += [
+        ("jobs_total", "counter", "Số việc nền đã kết thúc", {"result": "done"}, jobs["completed"]),
+        ("jobs_total", "counter", "Số việc nền đã kết thúc", {"result": "failed"}, jobs["failed"]),
+        ("jobs_retried_total", "counter", "Số lần thử lại việc nền", {}, jobs["retried"]),
+    ]
+    samples += [
+        ("deadline_timers", "gauge", "Số mốc thông báo deadline đang chờ", {}, deadline_notifier.size()),
+        ("deadline_events_total", "counter", "Số sự kiện deadline đã bắn", {}, deadline_notifier.stats["fired"]),
+    ]
+    bus = schedule_bus.stats()
+    samples += [
+        ("schedule_sse_subscribers", "gauge", "Số kết nối SSE theo dõi lịch trình", {}, bus["subscribers"]),
+        ("schedule_events_total", "counter", "Số sự kiện lịch trình đã phát", {}, bus["published"]),
+        ("schedule_events_dropped_total", "counter", "Số sự kiện bỏ vì client đọc chậm", {}, bus["dropped"]),
+    ]
+    chat = chat_response_cache.stats()
+    samples += [
+        ("cache_requests_total", "counter", "Số lần tra cache", {"cache": "chat_response", "result": "hit"}, chat["hits"] + chat["near_hits"]),
+        ("cache_requests_total", "counter", "Số lần tra cache", {"cache": "chat_response", "result": "miss"}, chat["misses"]),
+    ]
+    return samples
+
+registry.add_collector(_collect_app_metrics)
+registry.add_collector(cache_collector("schedule_context", schedule_context_cache.stats))
+registry.add_collector(cache_collector("search", lambda: search_service.stats()))
+registry.add_collector(cache_collector("ref_subjects", lambda: reference_cache.stats()["subjects"]))
+registry.add_collector(cache_collector("ref_students", lambda: reference_cache.stats()["students"]))
+multiprocess_metrics = MultiProcessMetrics(registry, METRICS_MULTIPROC_DIR) if METRICS_MULTIPROC_DIR else None
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILE_ENABLED and request.headers.get(PROFILE_HEADER):
+        profiler = RequestProfiler()
+        if profiler.start():
+            g.profiler = profiler
+
+@app.after_request
+def _record_request_latency(response):
+    # Với SSE, số đo là thời gian tới khi bắt đầu stream (không gồm thời gian stream)
+    start = g.pop('request_start', None)
+    if start is not None:
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route=rule,
+                                method=request.method, status=response.status_code)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = profiler.stop(request.path)
+        if path: response.headers['X-Profile-File'] = path
+    return response
+
+@app.teardown_request
+def _release_profiler(exc):
+    # Request lỗi không qua after_request: vẫn phải dừng profile để nhả khóa
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop(request.path)
+
+@app.route('/metrics')
+def metrics():
+    body = multiprocess_metrics.render() if multiprocess_metrics else registry.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 def generate_custom_id(prefix='LT'):
-    return f"{prefix}{uuid.uuid4().hex[-3:].upper()}"
+    # 3 ký tự hex trùng nhau sau vài nghìn dòng -> dùng ID 64 bit của module nhập hàng loạt
+    return new_lich_trinh_id(prefix)
 
 # --- ROUTES ---
 
@@ -70,6 +269,12 @@ def index():
 # ==========================================
 def get_schedule_context(sv_id):
     """Lấy danh sách deadline từ DB và chuyển thành văn bản để AI đọc hiểu"""
+    cached = schedule_context_cache.get(sv_id)
+    if cached is not None:
+        return cached
+    # Lấy generation trước khi đọc DB: nếu có lệnh ghi xóa cache trong lúc đọc thì không cache kết quả cũ
+    generation = schedule_context_cache.generation(sv_id)
+
     conn = None
     try:
         conn = get_db_connection()
@@ -83,18 +288,14 @@ def get_schedule_context(sv_id):
         cursor.execute(query, sv_id)
         rows = cursor.fetchall()
         
-        if not rows:
-            return "Hiện tại sinh viên chưa có lịch trình nào trong danh sách."
-            
-        # Biến dữ liệu SQL thành đoạn văn bản mô tả
-        context_text = "Danh sách lịch trình/deadline hiện tại của sinh viên:\n"
-        for row in rows:
-            # Format ngày giờ cho dễ đọc
-            time_str = row[2].strftime("%d/%m/%Y %H:%M") if row[2] else "Không rõ"
-            context_text += f"- Môn {row[1]}: {row[0]} (Hạn: {time_str}, Quan trọng: {row[3]}/5, Điểm ưu tiên: {row[4]:.1f})\n"
+        # Chỉ giữ top-K theo DiemUuTien + các deadline gần nhất để prompt không phình theo dữ liệu
+        selected, omitted = select_context_rows(rows, CONTEXT_TOP_K, CONTEXT_NEAREST_K)
+        context_text = render_context(selected, omitted)
             
+        schedule_context_cache.set(sv_id, context_text, generation=generation)
         return context_text
     except Exception as e:
+        # Không cache thông báo lỗi
         return f"Lỗi khi đọc dữ liệu: {str(e)}"
     finally:
         if conn: conn.close()
@@ -102,25 +303,26 @@ def get_schedule_context(sv_id):
 # ==========================================
 # API CHAT (ĐÃ NÂNG CẤP ĐỂ ĐỌC DATABASE)
 # ==========================================
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    if not model_gemini: 
-        return jsonify({"reply": f"Lỗi AI: Không tìm thấy model ({active_model_name})"}), 500
-    
-    data = request.json or {}
+def build_chat_turn(model, data, session_id=None):
+    """
+    Dựng phiên chat (kèm lịch sử) và prompt đã ghép ngữ cảnh từ DB,
+    giới hạn trong CHAT_TOKEN_BUDGET. Trả về (phiên chat, prompt, số token ước tính).
+    Lịch sử lấy từ kho phiên theo session_id; client cũ không có session_id
+    thì dùng 'history' gửi kèm.
+    """
     user_msg = data.get('message', '')
-    sv_id = 'SV001' # Mặc định lấy của SV001
+    sv_id = CHAT_SV_ID
+
+    # 1. Lấy dữ liệu deadline mới nhất từ DB
+    db_context = get_schedule_context(sv_id)
     
-    try:
-        # 1. Lấy dữ liệu deadline mới nhất từ DB
-        db_context = get_schedule_context(sv_id)
-        
-        # 2. Tạo "Prompt hệ thống" để AI biết nó là ai và đang nắm dữ liệu gì
-        system_instruction = (
+    # 2. Tạo "Prompt hệ thống" để AI biết nó là ai và đang nắm dữ liệu gì
+    def build_instruction(context_text):
+        return (
             f"Bạn là một trợ lý học tập thông minh.\n"
             f"Dưới đây là dữ liệu thực tế từ cơ sở dữ liệu của sinh viên:\n"
             f"---------------------\n"
-            f"{db_context}\n"
+            f"{context_text}\n"
             f"---------------------\n"
             f"Hãy trả lời câu hỏi của sinh viên dựa trên dữ liệu trên. "
             f"Nếu sinh viên hỏi về việc phải làm, hãy nhắc nhở dựa trên 'Điểm ưu tiên' và 'Hạn nộp'. "
@@ -128,37 +330,157 @@ def chat():
             f"Câu hỏi của sinh viên: {user_msg}"
         )
 
-        # 3. Xử lý lịch sử chat (History)
-        history = []
-        for m in data.get('history', []):
-            role = "user" if m.get('role') == "user" else "model"
-            content = m.get('content', '')
-            if content:
-                history.append({"role": role, "parts": [content]})
-        
-        # 4. Gửi tin nhắn đã ghép context cho AI
-        chat_session = model_gemini.start_chat(history=history)
-        
-        # Lưu ý: Chúng ta gửi system_instruction thay vì chỉ gửi user_msg đơn thuần
-        response = chat_session.send_message(system_instruction)
-        
-        return jsonify({"reply": response.text})
+    # 3. Xử lý lịch sử chat (History)
+    if session_id and not data.get('history'):
+        raw_history = chat_sessions.get_history(session_id)
+    else:
+        raw_history = data.get('history', [])
+    history = []
+    for m in raw_history:
+        role = "user" if m.get('role') == "user" else "model"
+        content = m.get('content', '')
+        if content:
+            history.append({"role": role, "parts": [content]})
+
+    # 4. Cắt ngữ cảnh/lịch sử cho vừa ngân sách token (lượt cũ được tóm tắt)
+    system_instruction, history, prompt_tokens = assemble_prompt(
+        build_instruction, db_context, history, CHAT_TOKEN_BUDGET)
+    logging.info(f"Chat prompt ~{prompt_tokens} tokens (budget {CHAT_TOKEN_BUDGET})")
+    
+    # 5. Tạo phiên chat; gửi system_instruction thay vì chỉ gửi user_msg đơn thuần
+    chat_session = model.start_chat(history=history)
+    return chat_session, system_instruction, prompt_tokens
+
+def answer_chat(data, session_id, queue=True):
+    """
+    Trả lời một lượt chat, dùng chung cho /api/chat và việc nền 'chat'.
+    Trả về (body, mã HTTP); LLMBusyError được ném ra để bên gọi tự xử lý.
+    queue=False (request đồng bộ): không xếp hàng chờ pool LLM, hết luồng rảnh thì bận ngay.
+    """
+    model = gemini_provider.get()
+    if not model:
+        return {"reply": f"Lỗi AI: Không tìm thấy model ({gemini_provider.name})"}, 500
+
+    cached, context_text = lookup_cached_reply(data, session_id)
+    if cached is not None:
+        remember_turn(session_id, data.get('message', ''), cached)
+        return {"reply": cached, "prompt_tokens": 0, "session_id": session_id, "cached": True}, 200
+
+    chat_session, system_instruction, prompt_tokens = build_chat_turn(model, data, session_id)
+    # Chạy trên pool LLM, quá tải thì báo LLMBusyError
+    reply = llm_runner.generate(chat_session, system_instruction, queue=queue)
+    remember_turn(session_id, data.get('message', ''), reply)
+    if context_text is not None:
+        chat_response_cache.store(CHAT_SV_ID, data.get('message', ''), context_text, reply)
+    return {"reply": reply, "prompt_tokens": prompt_tokens, "session_id": session_id}, 200
+
+def run_chat_job(payload):
+    """Việc nền 'chat': LLM quá tải hoặc lỗi thì ném lỗi để hàng đợi thử lại."""
+    body, status = answer_chat(payload, payload['session_id'])
+    if status != 200:
+        raise RuntimeError(body["reply"])
+    return body
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    data = request.json or {}
+    session_id = data.get('session_id') or new_session_id()
+
+    # "async": true -> xếp hàng việc nền, trả job_id ngay; lấy kết quả ở /api/jobs/<job_id>
+    if data.get('async'):
+        job_id = job_queue.enqueue('chat', {**data, 'session_id': session_id})
+        return jsonify({"status": "queued", "job_id": job_id, "session_id": session_id}), 202
+
+    # Đồng bộ: luồng request chờ tới khi có câu trả lời, nên không cho xếp hàng sau pool LLM.
+    # Không muốn giữ luồng thì dùng /api/chat/stream hoặc "async": true.
+    try:
+        body, status = answer_chat(data, session_id, queue=False)
+        return jsonify(body), status
+    except LLMBusyError as e:
+        return jsonify({"reply": f"Lỗi AI: {str(e)}"}), 503, {"Retry-After": "5"}
     except Exception as e:
         return jsonify({"reply": f"Lỗi AI: {str(e)}"}), 500
 
+def lookup_cached_reply(data, session_id):
+    """
+    Tìm câu trả lời đã cache cho câu hỏi đầu phiên (chưa có lịch sử).
+    Câu hỏi giữa hội thoại phụ thuộc lịch sử nên không dùng cache.
+    Trả về (reply hoặc None, ngữ cảnh đã dùng).
+    """
+    if data.get('history') or chat_sessions.get_history(session_id):
+        return None, None
+    context_text = get_schedule_context(CHAT_SV_ID)
+    return chat_response_cache.lookup(CHAT_SV_ID, data.get('message', ''), context_text), context_text
+
+def remember_turn(session_id, user_msg, reply):
+    """Lưu lượt hỏi/đáp (chỉ câu hỏi gốc, không kèm ngữ cảnh DB) vào kho phiên."""
+    chat_sessions.append(session_id, [
+        {"role": "user", "content": user_msg},
+        {"role": "model", "content": reply},
+    ])
+
+def sse_event(payload, event=None, event_id=None):
+    """Đóng gói một sự kiện Server-Sent Events (event_id: để client kết nối lại với Last-Event-ID)."""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    prefix += f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+# ==========================================
+# API CHAT STREAMING (SSE): trả từng đoạn ngay khi AI sinh ra
+# ==========================================
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    model = gemini_provider.get()
+    if not model:
+        return jsonify({"reply": f"Lỗi AI: Không tìm thấy model ({gemini_provider.name})"}), 500
+
+    data = request.json or {}
+    session_id = data.get('session_id') or new_session_id()
+    try:
+        cached, context_text = lookup_cached_reply(data, session_id)
+        if cached is not None:
+            remember_turn(session_id, data.get('message', ''), cached)
+            body = (sse_event({"delta": cached})
+                    + sse_event({"reply": cached, "prompt_tokens": 0, "session_id": session_id, "cached": True}, event="done"))
+            return Response(body, mimetype='text/event-stream')
+
+        chat_session, system_instruction, prompt_tokens = build_chat_turn(model, data, session_id)
+        chunks = llm_runner.stream(chat_session, system_instruction)
+    except LLMBusyError as e:
+        return jsonify({"reply": f"Lỗi AI: {str(e)}"}), 503
+    except Exception as e:
+        return jsonify({"reply": f"Lỗi AI: {str(e)}"}), 500
+
+    def generate():
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield sse_event({"delta": text})
+            reply = "".join(parts)
+            remember_turn(session_id, data.get('message', ''), reply)
+            if context_text is not None:
+                chat_response_cache.store(CHAT_SV_ID, data.get('message', ''), context_text, reply)
+            yield sse_event({"reply": reply, "prompt_tokens": prompt_tokens, "session_id": session_id}, event="done")
+        except Exception as e:
+            yield sse_event({"reply": f"Lỗi AI: {str(e)}"}, event="error")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # API 2: SEARCH
 @app.route('/api/search/material', methods=['POST'])
 def search_api():
     q = request.json.get('query', '')
+    pages = request.json.get('pages', 1)
     if not GOOGLE_API_KEY: return jsonify({"status":"error", "message":"Thiếu Key Search"}), 500
     try:
-        resp = requests.get("https://www.googleapis.com/customsearch/v1", params={'q':q, 'key':GOOGLE_API_KEY, 'cx':GOOGLE_CX}, timeout=5)
-        items = resp.json().get('items', []) or []
-        results = []
-        for i in items:
-            link = i.get('link','')
-            score = 85 if '.edu' in link else (90 if '.gov' in link else 50)
-            results.append({"TieuDe": i.get('title'), "URL": link, "DiemTinCay": score})
+        items = search_service.search(q, pages=pages)
+        results = [{"TieuDe": i.get('title'), "URL": i.get('link', '')} for i in items]
+        # Chấm điểm tin cậy theo bảng luật chung với Module C
+        results = rank_material_trust(results)
+        # Lưu tài liệu tốt nhất vào TaiLieu ở nền, không bắt người dùng chờ DB
+        if results: job_queue.enqueue('save_materials', {'results': results[:SAVE_MATERIALS_LIMIT]})
         return jsonify({"status":"success","results":results})
     except Exception as e: return jsonify({"status":"error","message":str(e)}), 500
 
@@ -177,22 +499,24 @@ def create_deadline():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Check SinhVien/MonHoc
-        cursor.execute("SELECT SinhVienID FROM SinhVien WHERE SinhVienID = ?", sv_id)
-        if not cursor.fetchone():
+        # Check SinhVien/MonHoc (qua cache, chỉ xuống DB khi chưa biết)
+        new_sv = not reference_cache.student_exists(cursor, sv_id)
+        if new_sv:
             cursor.execute("INSERT INTO SinhVien (SinhVienID, HoTen) VALUES (?, ?)", sv_id, f"SV {sv_id}")
         
-        cursor.execute("SELECT DiemKho FROM MonHoc WHERE MonHocID = ?", mh_id)
-        row = cursor.fetchone()
-        diem_kho = 3.0
-        if not row:
+        diem_kho = reference_cache.get_diem_kho(cursor, mh_id)
+        new_mh = diem_kho is None
+        if new_mh:
+            diem_kho = 3.0
             cursor.execute("INSERT INTO MonHoc (MonHocID, TenMonHoc, DiemKho) VALUES (?, ?, ?)", mh_id, f"Môn {mh_id}", 3.0)
-        else:
-            diem_kho = float(row[0])
-        conn.commit()
+        if new_sv or new_mh:
+            conn.commit()
+            if new_sv: reference_cache.note_student(sv_id)
+            if new_mh: reference_cache.note_subject(mh_id, diem_kho)
 
         # Tính điểm
-        diem_uu_tien = calculate_priority_score(thoi_gian_kt, do_quan_trong, diem_kho)
+        with timed('priority_score'):
+            diem_uu_tien = calculate_priority_score(thoi_gian_kt, do_quan_trong, diem_kho)
 
         # Lưu DB
         new_id = generate_custom_id()
@@ -201,6 +525,11 @@ def create_deadline():
             VALUES (?, ?, ?, ?, 'DEADLINE', GETDATE(), ?, ?, ?)
         """, new_id, sv_id, mh_id, tieu_de, thoi_gian_kt, do_quan_trong, diem_uu_tien)
         conn.commit()
+        invalidate_schedule_context(sv_id)
+        deadline_notifier.add(new_id, sv_id, tieu_de, thoi_gian_kt)
+        schedule_bus.publish(sv_id, "added", tasks=[{
+            "LichTrinhID": new_id, "TieuDe": tieu_de, "MonHocID": mh_id, "ThoiGianKetThuc": thoi_gian_kt,
+            "DiemUuTien": diem_uu_tien, "MucDoQuanTrong": do_quan_trong}])
 
         return jsonify({
             "status": "success",
@@ -213,50 +542,211 @@ def create_deadline():
     finally:
         if conn: conn.close()
 
+# ==========================================
+# API 3b: NHẬP DEADLINE HÀNG LOẠT (CSV / JSON)
+# ==========================================
+@app.route('/api/deadline/bulk', methods=['POST'])
+def bulk_create_deadlines():
+    conn = None
+    try:
+        # File CSV upload (multipart) hoặc body CSV/JSON
+        upload = request.files.get('file')
+        if upload is not None:
+            rows = parse_payload(upload.read(), 'text/csv')
+        elif 'csv' in (request.content_type or ''):
+            rows = parse_payload(request.get_data(), request.content_type)
+        else:
+            rows = parse_payload(request.get_json(silent=True), request.content_type)
+        if len(rows) > BULK_MAX_ROWS:
+            raise ValueError(f"Tối đa {BULK_MAX_ROWS} dòng mỗi lần nhập")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = get_db_connection()
+        summary = import_deadlines(conn, rows, ref_cache=reference_cache)
+        for sv_id in summary["SinhVienIDs"]:
+            invalidate_schedule_context(sv_id)
+        added = {}
+        for lt_id, sv_id, mh_id, tieu_de, thoi_gian_kt, do_quan_trong, diem in summary["created"]:
+            deadline_notifier.add(lt_id, sv_id, tieu_de, thoi_gian_kt)
+            if schedule_bus.watched(sv_id):
+                added.setdefault(sv_id, []).append({
+                    "LichTrinhID": lt_id, "TieuDe": tieu_de, "MonHocID": mh_id, "ThoiGianKetThuc": thoi_gian_kt,
+                    "DiemUuTien": diem, "MucDoQuanTrong": do_quan_trong})
+        for sv_id, tasks in added.items():
+            schedule_bus.publish(sv_id, "added", tasks=tasks)
+
+        return jsonify({
+            "status": "success",
+            "inserted": summary["inserted"],
+            "new_students": summary["new_students"],
+            "new_subjects": summary["new_subjects"],
+            "errors": [{"line": line, "error": msg} for line, msg in summary["errors"]]
+        })
+    except Exception as e:
+        print(f"Lỗi Bulk Import: {e}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
+
 # API 4: LẤY DANH SÁCH LỊCH TRÌNH (ĐÂY LÀ PHẦN BẠN ĐANG THIẾU)
 @app.route('/api/schedule/optimize', methods=['POST'])
 def get_optimized_schedule():
     data = request.json
     sv_id = data.get('SinhVienID', 'SV001')
+    # Giới hạn số nhiệm vụ trả về (tùy chọn) -> DB sắp xếp sẵn và chỉ trả K dòng đầu
+    limit = data.get('limit')
+    if limit not in (None, ''):
+        try:
+            limit = int(limit)
+            if limit < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({"error": "limit phải là số nguyên không âm"}), 400
+    else:
+        limit = None
+    # Chế độ xếp khối giờ học: kiểm tra đầu vào trước khi truy vấn
+    timeblock = data.get('mode') == 'timeblock'
+    if timeblock:
+        try:
+            windows = validate_windows(data.get('KhungGio'))
+            horizon_days = clamp_horizon_days(data.get('SoNgay', 30))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     
     conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Lấy dữ liệu từ DB
         query = """
-            SELECT LichTrinhID, TieuDe, MonHocID, ThoiGianKetThuc, DiemUuTien, MucDoQuanTrong
-            FROM LichTrinh
-            WHERE SinhVienID = ?
+            SELECT lt.LichTrinhID, lt.TieuDe, lt.MonHocID, lt.ThoiGianKetThuc, lt.DiemUuTien, lt.MucDoQuanTrong,
+                   COALESCE(mh.DiemKho, 3.0) AS DiemKho
+            FROM LichTrinh lt
+            LEFT JOIN MonHoc mh ON mh.MonHocID = lt.MonHocID
+            WHERE lt.SinhVienID = ?
         """
-        cursor.execute(query, sv_id)
+        params = [sv_id]
+        if limit is not None:
+            # Có limit: DB sắp xếp theo cùng thứ tự và chỉ trả K dòng, đọc thẳng từ cursor
+            query += f" {SCHEDULE_ORDER_BY} {backend.limit_clause}"
+            params.append(limit)
+
+        if limit == 0:
+            final_schedule = []   # SQL Server không nhận FETCH NEXT 0 ROWS
+        else:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, *params)
+            # Không có limit: gom vào heap rồi lấy dần theo thứ tự ưu tiên
+            with timed('optimize_schedule'):
+                final_schedule = list(iter_schedule(cursor, limit=limit, presorted=limit is not None))
         
+        result = {
+            "status": "success",
+            "SinhVienID": sv_id,
+            "OptimizedSchedule": final_schedule
+        }
+
+        # Chế độ tùy chọn: xếp khối giờ học cụ thể vào khung giờ rảnh (EDF)
+        if timeblock:
+            result["StudyPlan"] = plan_study_blocks(final_schedule, windows=windows, horizon_days=horizon_days)
+
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Lỗi Optimize: {e}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
+
+# ==========================================
+# API 4b: DANH SÁCH LỊCH TRÌNH PHÂN TRANG (KEYSET)
+# ==========================================
+@app.route('/api/schedule/list', methods=['POST'])
+def list_schedule():
+    data = request.json or {}
+    sv_id = data.get('SinhVienID', 'SV001')
+
+    conn = None
+    try:
+        page_size = clamp_page_size(data.get('page_size', 20))
+        query, params = build_schedule_page_query(
+            sv_id, page_size,
+            cursor=data.get('cursor'),
+            tu_ngay=data.get('TuNgay'),
+            den_ngay=data.get('DenNgay'),
+            mon_hoc_id=data.get('MonHocID'),
+            qua_han=parse_flag(data.get('QuaHan'), 'QuaHan'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
         columns = [column[0] for column in cursor.description]
-        tasks = []
-        for row in cursor.fetchall():
-            task = dict(zip(columns, row))
-            if task['DiemUuTien']: task['DiemUuTien'] = float(task['DiemUuTien'])
-            # Convert datetime to string for JSON
-            if isinstance(task['ThoiGianKetThuc'], datetime):
-                task['ThoiGianKetThuc'] = task['ThoiGianKetThuc'].strftime('%Y-%m-%d %H:%M:%S')
-            tasks.append(task)
-            
-        # Sắp xếp
-        final_schedule = optimize_schedule(tasks)
-        
+        rows = cursor.fetchall()
+
+        # Lấy dư 1 dòng: nếu có nghĩa là còn trang sau
+        items = [row_to_task(columns, row) for row in rows[:page_size]]
+        next_cursor = None
+        if len(rows) > page_size:
+            last = items[-1]
+            next_cursor = encode_cursor(last['DiemUuTien'], last['LichTrinhID'])
+
         return jsonify({
             "status": "success",
             "SinhVienID": sv_id,
-            "OptimizedSchedule": final_schedule
+            "Items": items,
+            "NextCursor": next_cursor
         })
 
     except Exception as e:
-        print(f"Lỗi Optimize: {e}")
+        print(f"Lỗi List Schedule: {e}")
         return jsonify({"error": str(e)}), 500
     finally:
         if conn: conn.close()
 
+# ==========================================
+# API 4c: KÊNH SSE THAY ĐỔI LỊCH TRÌNH (CHỈ GỬI PHẦN THAY ĐỔI)
+# ==========================================
+@app.route('/api/schedule/events', methods=['GET'])
+def stream_schedule_events():
+    """
+    EventSource theo SinhVienID. Sự kiện: added (tasks), removed (LichTrinhIDs),
+    rescored (tasks: LichTrinhID + DiemUuTien), deadline (thông báo sắp tới/quá hạn),
+    resync (lỡ sự kiện -> client tải lại toàn bộ danh sách một lần).
+    """
+    if not SCHEDULE_SSE_ENABLED:
+        return jsonify({"error": "Kênh SSE lịch trình đang tắt (nhiều worker), hãy tải lại định kỳ"}), 503
+    sv_id = request.args.get('SinhVienID', 'SV001')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        sub = schedule_bus.subscribe(sv_id, last_event_id=last_event_id)
+    except TooManySubscribersError as e:
+        return jsonify({"error": str(e)}), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            for seq, event in sub.backlog:
+                yield sse_event(event, event=event["type"], event_id=seq)
+            # Đóng sau một khoảng để trả luồng cho worker, EventSource tự kết nối lại và nhận bù
+            end = time.monotonic() + SCHEDULE_SSE_MAX_DURATION
+            while time.monotonic() < end:
+                item = sub.get(timeout=SCHEDULE_SSE_KEEPALIVE)
+                if item is None:
+                    yield ": ping\n\n"   # giữ kết nối qua proxy, phát hiện client đã đóng
+                    continue
+                seq, event = item
+                yield sse_event(event, event=event["type"], event_id=seq)
+        finally:
+            sub.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # ==========================================
 # API 5: XÓA DEADLINE (MỚI THÊM)
 # ==========================================
@@ -270,9 +760,17 @@ def delete_deadline():
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        # Lấy SinhVienID để xóa cache ngữ cảnh của đúng sinh viên đó
+        cursor.execute("SELECT SinhVienID FROM LichTrinh WHERE LichTrinhID = ?", id_can_xoa)
+        row = cursor.fetchone()
+
         # Thực hiện xóa trong DB
         cursor.execute("DELETE FROM LichTrinh WHERE LichTrinhID = ?", id_can_xoa)
         conn.commit()
+        deadline_notifier.remove(id_can_xoa)
+        if row:
+            invalidate_schedule_context(row[0])
+            schedule_bus.publish(row[0], "removed", LichTrinhIDs=[id_can_xoa])
         
         return jsonify({"status": "success", "message": "Đã xóa thành công!"})
     except Exception as e:
@@ -281,6 +779,72 @@ def delete_deadline():
     finally:
         if conn: conn.close()
 
+# ==========================================
+# API 6: VIỆC NỀN (TÍNH LẠI ĐIỂM, TRẠNG THÁI JOB)
+# ==========================================
+@app.route('/api/schedule/rescore', methods=['POST'])
+def enqueue_rescore():
+    job_id = job_queue.enqueue('rescore')
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Không tìm thấy job"}), 404
+    return jsonify(job)
+
+# ======================================================
+# VÒNG ĐỜI TIẾN TRÌNH (DÙNG VỚI GUNICORN, XEM gunicorn.conf.py / wsgi.py)
+# ======================================================
+def create_app():
+    """
+    App factory cho WSGI server. Không khởi động luồng nền ở đây để an toàn khi
+    server nạp app trước rồi mới fork (preload); việc đó thuộc về init_worker.
+    """
+    return app
+
+def init_worker(after_fork=False):
+    """
+    Khởi tạo tài nguyên riêng của một tiến trình worker.
+    after_fork=True: app đã được nạp ở tiến trình cha -> bỏ pool DB, model và
+    các tài nguyên kế thừa rồi tạo lại trong worker.
+    """
+    if after_fork:
+        reset_pool()
+        gemini_provider.reset()
+        _create_process_resources()
+        reference_cache.invalidate()
+    job_queue.start()
+    if REF_CACHE_WARM:
+        reference_cache.warm(get_db_connection)
+    if PRIORITY_REFRESH_INTERVAL > 0:
+        priority_refresher.start()
+    if NOTIFY_ENABLED:
+        deadline_notifier.start()
+    if multiprocess_metrics:
+        multiprocess_metrics.start()
+
+def shutdown_worker(timeout=30):
+    """Tắt êm: ngừng nhận lượt chat mới, chờ các lượt đang chạy xong rồi đóng tài nguyên."""
+    priority_refresher.stop()
+    deadline_notifier.stop()
+    if multiprocess_metrics:
+        multiprocess_metrics.stop()
+    # Việc nền trước (việc 'chat' còn cần pool LLM), ở chế độ bền việc chưa xong chạy lại lần sau
+    if not job_queue.drain(timeout):
+        logging.warning(f"Còn {job_queue.pending()} việc nền chưa xong sau {timeout}s")
+    if not llm_runner.drain(timeout):
+        logging.warning(f"Còn {llm_runner.in_flight} lượt chat chưa xong sau {timeout}s")
+    search_service.client.close()
+    close_pool()
+
 if __name__ == '__main__':
     print(f"🚀 Server đang khởi động tại: http://127.0.0.1:{PORT}")
+    # Reloader của Flask chạy 2 tiến trình, chỉ khởi động luồng nền ở tiến trình phục vụ
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_worker()
+        atexit.register(shutdown_worker, 5)
+
+    # Server phát triển; chạy production: gunicorn -c gunicorn.conf.py wsgi:app
     app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
@@ -0,0 +1,47 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# ======================================================
+# SERVER GIẢ LẬP GOOGLE CUSTOM SEARCH (CHẠY OFFLINE)
+# ======================================================
+# Trả về 10 kết quả cố định theo (q, start), trộn .edu/.gov/wikipedia/mạng xã hội
+# để rank_material_trust chạy đủ các luật. latency: giây trễ giả lập mỗi lời gọi.
+
+DOMAINS = ['hust.edu.vn', 'moet.gov.vn', 'vi.wikipedia.org', 'facebook.com', 'example.com']
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def do_GET(self):
+        qs = parse_qs(urlparse(self.path).query)
+        q = qs.get('q', [''])[0]
+        start = int(qs.get('start', ['1'])[0])
+        if self.latency:
+            threading.Event().wait(self.latency)
+        items = [
+            {'title': f"{q} - bài giảng {start + i}" if i % 3 == 0 else f"{q} {start + i}",
+             'link': f"https://{DOMAINS[i % len(DOMAINS)]}/{q.replace(' ', '-')}/{start + i}"}
+            for i in range(10)
+        ]
+        body = json.dumps({'items': items}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_search(latency=0.0, port=0):
+    """Chạy server trên luồng nền, trả về (server, url endpoint)."""
+    handler = type('FakeSearchHandler', (_Handler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/customsearch/v1"
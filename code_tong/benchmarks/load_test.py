@@ -0,0 +1,208 @@
+"""
+Load-test 5 endpoint chính, chạy hoàn toàn offline:
+SQLite nhúng + model Gemini giả lập + server Custom Search giả lập.
+
+    cd code_tong
+    python -m benchmarks.load_test --students 50 --deadlines 40 --requests 500 --concurrency 8
+    python -m benchmarks.load_test --json bench.json                 # lưu kết quả
+    python -m benchmarks.load_test --baseline bench.json             # báo lỗi nếu chậm đi > 25%
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.report import summarize_latencies, print_table, compare_baseline, write_json
+from benchmarks.fake_search import start_fake_search
+
+TOPICS = [
+    "cấu trúc dữ liệu", "giải tích 1", "xác suất thống kê", "mạng máy tính", "hệ điều hành",
+    "cơ sở dữ liệu", "trí tuệ nhân tạo", "học máy", "lập trình python", "kiến trúc máy tính",
+]
+WORDS = ["deadline", "môn", "ôn", "thi", "bài", "tập", "lịch", "tuần", "nào", "gấp",
+         "nhất", "học", "trước", "sau", "điểm", "nhóm", "báo", "cáo", "đồ", "án"]
+COLUMNS = ["requests", "errors", "throughput", "mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def configure_env(args):
+    """Đặt biến môi trường TRƯỚC khi import app (cấu hình được đọc lúc import)."""
+    os.environ.update({
+        "DB_BACKEND": "sqlite",
+        "DB_SQLITE_PATH": args.db,
+        "DB_POOL_MAX_SIZE": str(max(args.concurrency, 4)),
+        "LLM_BACKEND": "fake",
+        "FAKE_MODEL_LATENCY": str(args.llm_latency),
+        "FAKE_MODEL_CHUNK_DELAY": "0",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "offline",
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "offline",
+        "GOOGLE_CX": os.environ.get("GOOGLE_CX") or "offline",
+        "PRIORITY_REFRESH_INTERVAL": "0",
+        "CHAT_SESSION_BACKEND": "memory",
+    })
+
+
+def seed(n_students, m_deadlines, rng):
+    """Tạo N sinh viên x M deadline (SV001 luôn có vì /api/chat dùng CHAT_SV_ID)."""
+    from database.db_connector import get_db_connection
+    from services.bulk_import import import_deadlines
+
+    now = datetime.now()
+    student_ids = ["SV001"] + [f"SV{i:03d}" for i in range(2, n_students + 1)]
+    rows = [
+        {
+            "SinhVienID": sv_id,
+            "MonHocID": f"MH{rng.randint(1, 20):02d}",
+            "TieuDe": f"Bài tập {j}",
+            "ThoiGianKetThuc": (now + timedelta(hours=rng.uniform(-48, 24 * 30))).strftime('%Y-%m-%d %H:%M:%S'),
+            "MucDoQuanTrong": rng.randint(1, 5),
+        }
+        for sv_id in student_ids for j in range(m_deadlines)
+    ]
+    conn = get_db_connection()
+    try:
+        summary = import_deadlines(conn, rows)
+    finally:
+        conn.close()
+    return student_ids, summary["inserted"]
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # không in log từng request
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+_local = threading.local()
+
+
+def _session():
+    import requests
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def run_scenario(url, payloads, concurrency, on_response=None):
+    """Gửi toàn bộ payloads (POST JSON) với `concurrency` luồng; trả về số liệu."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(payload):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            resp = _session().post(url, json=payload, timeout=60)
+            ok = resp.status_code < 400
+            body = resp.json() if ok else None
+        except Exception:
+            ok, body = False, None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+        if ok and on_response:
+            on_response(body)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    return summarize_latencies(latencies, errors, time.perf_counter() - wall_start)
+
+
+def build_scenarios(args, student_ids, rng):
+    now = datetime.now()
+    n = args.requests
+
+    def deadline():
+        return (now + timedelta(hours=rng.uniform(1, 24 * 14))).strftime('%Y-%m-%d %H:%M:%S')
+
+    create = [{"SinhVienID": rng.choice(student_ids), "MonHocID": f"MH{rng.randint(1, 20):02d}",
+               "TieuDe": f"Load test {i}", "ThoiGianKetThuc": deadline(),
+               "MucDoQuanTrong": rng.randint(1, 5)} for i in range(n)]
+    optimize = [{"SinhVienID": rng.choice(student_ids)} for _ in range(n)]
+    # Truy vấn lặp lại trong một tập nhỏ -> đo được cả hiệu quả cache tìm kiếm
+    search = [{"query": rng.choice(TOPICS)} for _ in range(n)]
+    # Câu hỏi ngẫu nhiên để không trúng cache câu trả lời
+    chat = [{"message": " ".join(rng.choice(WORDS) for _ in range(8)) + f" #{i}"}
+            for i in range(args.chat_requests)]
+    return create, optimize, search, chat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test offline các endpoint Flask")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--deadlines", type=int, default=40, help="số deadline mỗi sinh viên")
+    parser.add_argument("--requests", type=int, default=300, help="số request mỗi endpoint")
+    parser.add_argument("--chat-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="giây trễ của model giả lập")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="giây trễ của search giả lập")
+    parser.add_argument("--db", default=None, help="file SQLite (mặc định: file tạm, xóa sau khi chạy)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="lưu kết quả ra file JSON")
+    parser.add_argument("--baseline", help="file JSON lần chạy trước để so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    if not args.db:
+        tmp_dir = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp_dir.name, "bench.db")
+
+    rng = random.Random(args.seed)
+    search_server, search_url = start_fake_search(latency=args.search_latency)
+    os.environ["SEARCH_ENDPOINT"] = search_url
+    configure_env(args)
+
+    import app as app_module
+    student_ids, seeded = seed(args.students, args.deadlines, rng)
+    server, base_url = start_server(app_module.create_app())
+    print(f"Seed: {len(student_ids)} sinh viên x {args.deadlines} deadline = {seeded} dòng | server {base_url}")
+
+    create, optimize, search, chat = build_scenarios(args, student_ids, rng)
+    created_ids = []
+    results = {}
+    try:
+        results["/api/deadline/create"] = run_scenario(
+            base_url + "/api/deadline/create", create, args.concurrency,
+            on_response=lambda body: created_ids.append(body["LichTrinhID_created"]))
+        results["/api/schedule/optimize"] = run_scenario(
+            base_url + "/api/schedule/optimize", optimize, args.concurrency)
+        results["/api/search/material"] = run_scenario(
+            base_url + "/api/search/material", search, args.concurrency)
+        results["/api/chat"] = run_scenario(
+            base_url + "/api/chat", chat, args.concurrency)
+        results["/api/deadline/delete"] = run_scenario(
+            base_url + "/api/deadline/delete", [{"LichTrinhID": i} for i in created_ids], args.concurrency)
+    finally:
+        server.shutdown()
+        search_server.shutdown()
+        app_module.shutdown_worker(timeout=5)
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    print_table("Endpoint (ms, req/s)", results, COLUMNS)
+    if args.json:
+        write_json(results, args.json)
+    if args.baseline:
+        regressions = compare_baseline(results, args.baseline, args.tolerance,
+                                       higher_is_worse=("p95_ms", "p99_ms"),
+                                       lower_is_worse=("throughput",))
+        if regressions:
+            print("\n❌ Chậm đi so với baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\n✅ Không có endpoint nào chậm đi quá ngưỡng.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Microbenchmark các hàm thuật toán nóng (không cần DB/mạng).
+
+    cd code_tong
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --json micro.json
+    python -m benchmarks.microbench --baseline micro.json   # báo lỗi nếu chậm đi > 25%
+"""
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.report import print_table, compare_baseline, write_json
+from algorithms.priority_logic import calculate_priority_score, calculate_priority_scores_batch, np
+from algorithms.scheduling_logic import optimize_schedule
+from member_c_logic import rank_material_trust
+
+COLUMNS = ["size", "loops", "us_per_call", "ns_per_item"]
+
+
+def bench(fn, size, min_time=0.2):
+    """Lặp fn() tới khi đủ min_time giây, lấy lần đo tốt nhất trong 3 lượt."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time / 3:
+            break
+        loops *= 2
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return {
+        "size": size,
+        "loops": loops,
+        "us_per_call": round(best * 1e6, 3),
+        "ns_per_item": round(best * 1e9 / size, 1),
+    }
+
+
+def make_inputs(n, rng):
+    now = datetime.now()
+    deadlines = [(now + timedelta(hours=rng.uniform(-48, 24 * 30))).strftime('%Y-%m-%d %H:%M:%S')
+                 for _ in range(n)]
+    importance = [rng.randint(1, 5) for _ in range(n)]
+    difficulty = [rng.uniform(1, 5) for _ in range(n)]
+    tasks = [
+        {"LichTrinhID": f"LT{i}", "TieuDe": f"Task {i}", "ThoiGianKetThuc": d,
+         "DiemUuTien": round(rng.uniform(0, 100), 2), "MucDoQuanTrong": imp}
+        for i, (d, imp) in enumerate(zip(deadlines, importance))
+    ]
+    domains = ["hust.edu.vn", "moet.gov.vn", "vi.wikipedia.org", "facebook.com", "example.com", "tiktok.com"]
+    results = [
+        {"TieuDe": rng.choice(["Giáo trình", "Bài giảng PDF", "Tutorial", "Review", "Tin tức"]) + f" {i}",
+         "URL": f"https://{rng.choice(domains)}/page/{i}"}
+        for i in range(n)
+    ]
+    return deadlines, importance, difficulty, tasks, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark thuật toán")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="lưu kết quả ra file JSON")
+    parser.add_argument("--baseline", help="file JSON lần chạy trước để so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {}
+    for n in [int(s) for s in args.sizes.split(",")]:
+        deadlines, importance, difficulty, tasks, search_results = make_inputs(n, rng)
+
+        results[f"calculate_priority_score[{n}]"] = bench(
+            lambda: [calculate_priority_score(d, i, k) for d, i, k in zip(deadlines, importance, difficulty)], n)
+        if np is not None:
+            results[f"calculate_priority_scores_batch[{n}]"] = bench(
+                lambda: calculate_priority_scores_batch(deadlines, importance, difficulty), n)
+        results[f"optimize_schedule[{n}]"] = bench(lambda: optimize_schedule(list(tasks)), n)
+        results[f"optimize_schedule_top20[{n}]"] = bench(lambda: optimize_schedule(list(tasks), limit=20), n)
+        results[f"rank_material_trust[{n}]"] = bench(
+            lambda: rank_material_trust([dict(r) for r in search_results]), n)
+
+    print_table("Microbenchmark", results, COLUMNS)
+    if args.json:
+        write_json(results, args.json)
+    if args.baseline:
+        regressions = compare_baseline(results, args.baseline, args.tolerance,
+                                       higher_is_worse=("us_per_call",))
+        if regressions:
+            print("\n❌ Chậm đi so với baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\n✅ Không có hàm nào chậm đi quá ngưỡng.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
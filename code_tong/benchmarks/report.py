@@ -0,0 +1,63 @@
+import json
+
+
+def percentile(sorted_values, p):
+    """Phân vị p (0-100) theo nội suy tuyến tính trên danh sách đã sắp xếp."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize_latencies(latencies, errors, wall_time):
+    """latencies tính bằng giây -> dict số liệu (ms, req/s)."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput": round(count / wall_time, 2) if wall_time > 0 else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def print_table(title, rows, columns):
+    """rows: {tên: {cột: giá trị}} -> in bảng căn cột."""
+    print(f"\n== {title} ==")
+    name_width = max([len(n) for n in rows] + [8])
+    header = "name".ljust(name_width) + "".join(c.rjust(14) for c in columns)
+    print(header)
+    print("-" * len(header))
+    for name, stats in rows.items():
+        print(name.ljust(name_width) + "".join(str(stats.get(c, "")).rjust(14) for c in columns))
+
+
+def compare_baseline(results, baseline_path, tolerance, higher_is_worse, lower_is_worse=()):
+    """
+    So với lần chạy trước (file JSON cùng cấu trúc). Trả về danh sách mô tả các chỉ số
+    xấu đi quá `tolerance` (tỉ lệ, 0.25 = 25%).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in higher_is_worse:
+            if old.get(key) and stats.get(key, 0) > old[key] * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {old[key]} -> {stats[key]}")
+        for key in lower_is_worse:
+            if old.get(key) and stats.get(key, 0) < old[key] * (1 - tolerance):
+                regressions.append(f"{name}.{key}: {old[key]} -> {stats[key]}")
+    return regressions
+
+
+def write_json(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
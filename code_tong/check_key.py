@@ -1,7 +1,8 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
+from services.model_resolver import list_generate_models, resolve_model_name, MODEL_CACHE_PATH
+
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
@@ -10,17 +11,18 @@ if not API_KEY:
     print("❌ Lỗi: Chưa tìm thấy GEMINI_API_KEY trong file .env")
 else:
     print(f"🔑 Đang kiểm tra Key: {API_KEY[:5]}...{API_KEY[-5:]}")
-    genai.configure(api_key=API_KEY)
     
     print("\n📋 Danh sách các Model mà Key này được phép dùng:")
     try:
-        found = False
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                print(f"   - {m.name}")
-                found = True
+        names = list_generate_models(API_KEY)
+        for name in names:
+            print(f"   - {name}")
         
-        if not found:
+        if not names:
             print("⚠️ Key đúng nhưng không có model nào hỗ trợ 'generateContent'.")
+        else:
+            # Làm mới cache model để app.py khởi động không cần dò lại qua mạng
+            chosen = resolve_model_name(API_KEY, force_refresh=True, names=names)
+            print(f"\n💾 Model app sẽ dùng: {chosen} (cache: {MODEL_CACHE_PATH})")
     except Exception as e:
         print(f"❌ Lỗi kết nối Google: {e}")
\ No newline at end of file
@@ -1,24 +1,7 @@
-﻿import os
-import pyodbc
-from dotenv import load_dotenv
+﻿from database.db_connector import get_db_connection
 
-load_dotenv()
-
-# Cấu hình Database
-# Lưu ý: 'Trusted_Connection=yes' chỉ chạy trên Windows với SQL Server local.
-# Nếu chạy Docker hoặc Linux, cần dùng User ID và Password.
-DB_SERVER = 'Quiet'      # Tên server SQL của bạn
-DB_NAME = 'DatabaseAI'   # Tên database
-
-CONN_STR = (
-    f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-    f'SERVER={DB_SERVER};'
-    f'DATABASE={DB_NAME};'
-    f'Trusted_Connection=yes;'
-)
-
-def get_db_connection():
-    return pyodbc.connect(CONN_STR)
+# Cấu hình Database dùng chung database/db_connector.py (đọc DB_SERVER/DB_DATABASE từ .env),
+# không hard-code tên server riêng ở đây nữa.
 
 def rank_material_trust(search_results):
     for result in search_results:
@@ -42,4 +42,31 @@ CREATE TABLE LichTrinh (
     FOREIGN KEY (SinhVienID) REFERENCES SinhVien(SinhVienID),
     FOREIGN KEY (MonHocID) REFERENCES MonHoc(MonHocID)
 );
+GO
+
+-- 5. Index cho danh sách lịch trình phân trang (/api/schedule/list)
+--    Keyset: WHERE SinhVienID = ? ORDER BY DiemUuTien DESC, LichTrinhID
+--    INCLUDE các cột trả về để không phải tra ngược lại bảng (key lookup)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_LichTrinh_SinhVien_DiemUuTien')
+CREATE INDEX IX_LichTrinh_SinhVien_DiemUuTien
+    ON LichTrinh (SinhVienID, DiemUuTien DESC, LichTrinhID)
+    INCLUDE (TieuDe, MonHocID, ThoiGianKetThuc, MucDoQuanTrong);
+GO
+
+-- 6. Tạo bảng TaiLieu (tài liệu tìm được, đã chấm DiemTinCay)
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='TaiLieu' and xtype='U')
+CREATE TABLE TaiLieu (
+    TaiLieuID INT IDENTITY(1,1) PRIMARY KEY,
+    TieuDe NVARCHAR(200),
+    URL NVARCHAR(450) UNIQUE, -- 450 ký tự: giới hạn độ dài khóa của index UNIQUE
+    DiemTinCay FLOAT
+);
+GO
+
+-- 7. Index cho chỉ mục thông báo deadline (services/deadline_notifier.py)
+--    Keyset: WHERE ThoiGianKetThuc trong cửa sổ ORDER BY ThoiGianKetThuc, LichTrinhID
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_LichTrinh_ThoiGianKetThuc')
+CREATE INDEX IX_LichTrinh_ThoiGianKetThuc
+    ON LichTrinh (ThoiGianKetThuc, LichTrinhID)
+    INCLUDE (SinhVienID, TieuDe);
 GO
\ No newline at end of file
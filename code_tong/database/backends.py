@@ -0,0 +1,250 @@
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+# ======================================================
+# BACKEND LƯU TRỮ
+# ======================================================
+# Mỗi backend biết: mở kết nối, chuyển câu SQL (viết theo T-SQL) sang phương ngữ
+# của mình, cú pháp giới hạn số dòng và DDL khởi tạo schema.
+# Thêm backend mới: viết lớp cùng giao diện rồi register_backend('ten', Lop).
+
+
+class SQLServerBackend:
+    """SQL Server qua pyodbc. Dùng user/password nếu có DB_USER, ngược lại Trusted_Connection."""
+
+    name = 'mssql'
+    limit_clause = "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"   # cần có ORDER BY phía trước
+
+    def __init__(self, server=None, database=None, driver=None, user=None, password=None):
+        self.server = server or os.getenv('DB_SERVER')
+        self.database = database or os.getenv('DB_DATABASE')
+        self.driver = driver or os.getenv('DB_DRIVER', 'ODBC Driver 17 for SQL Server')
+        self.user = user or os.getenv('DB_USER')
+        self.password = password or os.getenv('DB_PASSWORD')
+
+    @property
+    def conn_str(self):
+        auth = (f'UID={self.user};PWD={self.password};' if self.user
+                else 'Trusted_Connection=yes;')
+        return (
+            f'DRIVER={{{self.driver}}};'
+            f'SERVER={self.server};'
+            f'DATABASE={self.database};'
+            f'{auth}'
+        )
+
+    def connect(self):
+        if pyodbc is None:
+            raise RuntimeError("Chưa cài pyodbc, không thể kết nối SQL Server")
+        return pyodbc.connect(self.conn_str)
+
+    def translate(self, sql):
+        return sql
+
+    def schema_statements(self):
+        return MSSQL_SCHEMA
+
+
+class SQLiteBackend:
+    """
+    SQLite nhúng cho triển khai một máy / chạy thử / benchmark:
+    - WAL: người đọc không chặn người ghi, nhiều worker dùng chung một file.
+    - synchronous=NORMAL: an toàn với WAL, commit nhanh hơn FULL.
+    - Cache câu lệnh đã biên dịch (prepared statement) theo từng kết nối.
+    """
+
+    name = 'sqlite'
+    limit_clause = "LIMIT ?"
+
+    def __init__(self, path=None, busy_timeout=5.0, cached_statements=256):
+        self.path = path or os.getenv('DB_SQLITE_PATH', 'DatabaseAI.db')
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return _SQLiteConnection(conn, self)
+
+    def translate(self, sql):
+        return _translate_tsql(sql)
+
+    def schema_statements(self):
+        return SQLITE_SCHEMA
+
+
+# --- T-SQL -> SQLite ---
+_TSQL_REWRITES = [
+    (re.compile(r"\bGETDATE\(\)", re.IGNORECASE), "datetime('now', 'localtime')"),
+]
+
+
+@lru_cache(maxsize=512)
+def _translate_tsql(sql):
+    for pattern, repl in _TSQL_REWRITES:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+class _SQLiteCursor:
+    """Cho phép gọi cursor.execute(sql, a, b) giống pyodbc; SQL được chuyển phương ngữ trước."""
+
+    def __init__(self, cursor, backend):
+        self._cursor = cursor
+        self._backend = backend
+        self.fast_executemany = False  # pyodbc có thuộc tính này, sqlite bỏ qua
+
+    @staticmethod
+    def _params(params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            return tuple(params[0])
+        return params
+
+    def execute(self, sql, *params):
+        self._cursor.execute(self._backend.translate(sql), self._params(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(self._backend.translate(sql), seq_of_params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _SQLiteConnection:
+    def __init__(self, conn, backend):
+        self._conn = conn
+        self._backend = backend
+
+    def cursor(self):
+        return _SQLiteCursor(self._conn.cursor(), self._backend)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ======================================================
+# SCHEMA (giống database/SQLQuery1.sql, không gồm CREATE DATABASE)
+# ======================================================
+MSSQL_SCHEMA = [
+    """IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='SinhVien' and xtype='U')
+    CREATE TABLE SinhVien (
+        SinhVienID VARCHAR(20) PRIMARY KEY,
+        HoTen NVARCHAR(100)
+    )""",
+    """IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='MonHoc' and xtype='U')
+    CREATE TABLE MonHoc (
+        MonHocID VARCHAR(20) PRIMARY KEY,
+        TenMonHoc NVARCHAR(100),
+        DiemKho FLOAT DEFAULT 3.0
+    )""",
+    """IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='LichTrinh' and xtype='U')
+    CREATE TABLE LichTrinh (
+        LichTrinhID VARCHAR(20) PRIMARY KEY,
+        SinhVienID VARCHAR(20),
+        MonHocID VARCHAR(20),
+        TieuDe NVARCHAR(200),
+        LoaiSuKien VARCHAR(50),
+        ThoiGianBatDau DATETIME,
+        ThoiGianKetThuc DATETIME,
+        MucDoQuanTrong INT,
+        DiemUuTien FLOAT,
+        FOREIGN KEY (SinhVienID) REFERENCES SinhVien(SinhVienID),
+        FOREIGN KEY (MonHocID) REFERENCES MonHoc(MonHocID)
+    )""",
+    """IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_LichTrinh_SinhVien_DiemUuTien')
+    CREATE INDEX IX_LichTrinh_SinhVien_DiemUuTien
+        ON LichTrinh (SinhVienID, DiemUuTien DESC, LichTrinhID)
+        INCLUDE (TieuDe, MonHocID, ThoiGianKetThuc, MucDoQuanTrong)""",
+    """IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_LichTrinh_ThoiGianKetThuc')
+    CREATE INDEX IX_LichTrinh_ThoiGianKetThuc
+        ON LichTrinh (ThoiGianKetThuc, LichTrinhID)
+        INCLUDE (SinhVienID, TieuDe)""",
+    """IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='TaiLieu' and xtype='U')
+    CREATE TABLE TaiLieu (
+        TaiLieuID INT IDENTITY(1,1) PRIMARY KEY,
+        TieuDe NVARCHAR(200),
+        URL NVARCHAR(450) UNIQUE,
+        DiemTinCay FLOAT
+    )""",
+]
+
+SQLITE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS SinhVien (
+        SinhVienID TEXT PRIMARY KEY,
+        HoTen TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS MonHoc (
+        MonHocID TEXT PRIMARY KEY,
+        TenMonHoc TEXT,
+        DiemKho REAL DEFAULT 3.0
+    )""",
+    # Thời gian lưu dạng chuỗi 'YYYY-MM-DD HH:MM:SS' -> so sánh chuỗi đúng thứ tự thời gian
+    """CREATE TABLE IF NOT EXISTS LichTrinh (
+        LichTrinhID TEXT PRIMARY KEY,
+        SinhVienID TEXT REFERENCES SinhVien(SinhVienID),
+        MonHocID TEXT REFERENCES MonHoc(MonHocID),
+        TieuDe TEXT,
+        LoaiSuKien TEXT,
+        ThoiGianBatDau TEXT,
+        ThoiGianKetThuc TEXT,
+        MucDoQuanTrong INTEGER,
+        DiemUuTien REAL
+    )""",
+    """CREATE INDEX IF NOT EXISTS IX_LichTrinh_SinhVien_DiemUuTien
+        ON LichTrinh (SinhVienID, DiemUuTien DESC, LichTrinhID)""",
+    """CREATE INDEX IF NOT EXISTS IX_LichTrinh_ThoiGianKetThuc
+        ON LichTrinh (ThoiGianKetThuc, LichTrinhID)""",
+    """CREATE TABLE IF NOT EXISTS TaiLieu (
+        TaiLieuID INTEGER PRIMARY KEY AUTOINCREMENT,
+        TieuDe TEXT,
+        URL TEXT UNIQUE,
+        DiemTinCay REAL
+    )""",
+]
+
+
+# ======================================================
+# ĐĂNG KÝ / CHỌN BACKEND
+# ======================================================
+BACKENDS = {
+    'mssql': SQLServerBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+def register_backend(name, backend_cls):
+    BACKENDS[name.lower()] = backend_cls
+
+
+def create_backend(name=None, **kwargs):
+    """Tạo backend theo tên (mặc định biến môi trường DB_BACKEND, 'mssql')."""
+    name = (name or os.getenv('DB_BACKEND', 'mssql')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"DB_BACKEND không hợp lệ: {name} (hỗ trợ: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+
+def bootstrap_schema(backend, conn=None):
+    """Tạo các bảng SinhVien/MonHoc/LichTrinh/TaiLieu nếu chưa có (chạy lại nhiều lần vẫn an toàn)."""
+    own = conn is None
+    conn = conn or backend.connect()
+    try:
+        cursor = conn.cursor()
+        for statement in backend.schema_statements():
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
@@ -1,25 +1,314 @@
-import pyodbc
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Lấy cấu hình từ file .env
-SERVER = os.getenv('DB_SERVER')
-DATABASE = os.getenv('DB_DATABASE')
+from database.backends import create_backend, bootstrap_schema
+from services.metrics import timed
+
+# Backend: 'mssql' (mặc định) hoặc 'sqlite' (nhúng, chạy một máy/local không cần SQL Server).
+# Cấu hình kết nối của từng backend xem database/backends.py
+backend = create_backend()
+DB_BACKEND = backend.name
+
+# Tự tạo schema khi mở pool lần đầu (mặc định bật cho sqlite, tắt cho SQL Server)
+DB_BOOTSTRAP = os.getenv('DB_BOOTSTRAP', '1' if DB_BACKEND == 'sqlite' else '0') == '1'
+
+# Cấu hình Pool
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))          # giây chờ mượn kết nối
+POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))      # giây nhàn rỗi tối đa trước khi đóng
+POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', '30')) # nhàn rỗi quá lâu thì kiểm tra "SELECT 1"
+
+
+class PoolTimeoutError(Exception):
+    """Hết thời gian chờ mượn kết nối từ pool."""
+
+
+def create_raw_connection():
+    """Mở một kết nối mới (không qua pool) theo DB_BACKEND."""
+    return backend.connect()
+
+
+# ======================================================
+# CONNECTION POOL
+# ======================================================
+class TimedCursor:
+    """Bọc cursor để đo thời gian mỗi lần execute/executemany (metrics op=db_execute)."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *params):
+        with timed('db_execute'):
+            self._cursor.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        with timed('db_executemany'):
+            self._cursor.executemany(sql, seq_of_params)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __setattr__(self, name, value):
+        if name == '_cursor':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)   # vd: cursor.fast_executemany = True
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class PooledConnection:
+    """Bọc kết nối thật; close() trả kết nối về pool thay vì đóng hẳn."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._raw)
+
+    def cursor(self):
+        if self._closed:
+            raise RuntimeError("Kết nối đã được trả về pool")
+        return TimedCursor(self._raw.cursor())
+
+    def __getattr__(self, name):
+        if self._closed:
+            raise RuntimeError("Kết nối đã được trả về pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool kết nối giới hạn kích thước, an toàn đa luồng.
+    - Mượn kết nối có timeout (PoolTimeoutError).
+    - Kết nối nhàn rỗi quá max_idle giây sẽ bị đóng.
+    - Kết nối nhàn rỗi quá check_after giây được kiểm tra sống bằng "SELECT 1".
+    """
+
+    def __init__(self, factory, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 max_idle=POOL_MAX_IDLE, check_after=POOL_CHECK_AFTER):
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+
+        self._cond = threading.Condition()
+        self._idle = []   # [(raw_conn, thời điểm trả về)], LIFO để kết nối "nóng" được dùng lại
+        self._size = 0    # tổng số kết nối đang mở (idle + in-use)
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+
+        # Thống kê
+        self._created = 0
+        self._evicted = 0
+        self._timeouts = 0
+        self._acquired = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    # --- nội bộ ---
+    def _evict_idle(self, now):
+        keep = []
+        expired = []
+        for raw, since in self._idle:
+            if now - since > self.max_idle:
+                expired.append(raw)
+            else:
+                keep.append((raw, since))
+        self._idle = keep
+        self._size -= len(expired)
+        self._evicted += len(expired)
+        return expired
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            return True
+        except Exception:
+            return False
+
+    # --- public ---
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            raw, since, create = None, None, False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Pool đã đóng")
+                expired = self._evict_idle(time.monotonic())
+                if self._idle:
+                    raw, since = self._idle.pop()
+                    self._in_use += 1
+                elif self._size < self.max_size:
+                    self._size += 1
+                    self._in_use += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Không mượn được kết nối sau {timeout:.1f}s "
+                            f"(đang dùng {self._in_use}/{self.max_size})")
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            for old in expired:
+                self._close_quietly(old)
+
+            if create:
+                try:
+                    raw = self._factory()
+                except Exception:
+                    self._discard(None)
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif raw is not None and time.monotonic() - since > self.check_after:
+                if not self._is_alive(raw):
+                    self._discard(raw)
+                    continue
+
+            if raw is not None:
+                waited = time.monotonic() - start
+                with self._cond:
+                    self._acquired += 1
+                    self._wait_time += waited
+                    self._max_wait = max(self._max_wait, waited)
+                return PooledConnection(self, raw)
+
+    def release(self, raw):
+        try:
+            # Không để transaction dở dang lọt sang request sau
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(raw)
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, raw):
+        if raw is not None:
+            self._close_quietly(raw)
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "created": self._created,
+                "evicted": self._evicted,
+                "timeouts": self._timeouts,
+                "acquired": self._acquired,
+                "total_wait_time": round(self._wait_time, 6),
+                "avg_wait_time": round(self._wait_time / self._acquired, 6) if self._acquired else 0.0,
+                "max_wait_time": round(self._max_wait, 6),
+            }
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DB_BOOTSTRAP:
+                    bootstrap_schema(backend)
+                _pool = ConnectionPool(create_raw_connection)
+    return _pool
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def reset_pool():
+    """
+    Bỏ pool hiện tại mà không đóng kết nối (dùng ngay sau fork: kết nối kế thừa
+    từ tiến trình cha dùng chung socket, đóng ở tiến trình con sẽ làm hỏng bên cha).
+    """
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def close_pool():
+    """Đóng mọi kết nối nhàn rỗi khi tắt tiến trình."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
 
-# Chuỗi kết nối
-CONN_STR = (
-    f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-    f'SERVER={SERVER};'
-    f'DATABASE={DATABASE};'
-    f'Trusted_Connection=yes;'
-)
 
 def get_db_connection():
+    """Mượn một kết nối từ pool. Gọi conn.close() để trả lại."""
     try:
-        conn = pyodbc.connect(CONN_STR)
-        return conn
-    except pyodbc.Error as e:
+        with timed('db_connect'):
+            return get_pool().acquire()
+    except PoolTimeoutError as e:
+        print(f"❌ Pool Database quá tải: {e}")
+        raise e
+    except Exception as e:
         print(f"❌ Lỗi kết nối Database: {e}")
-        raise e
\ No newline at end of file
+        raise e
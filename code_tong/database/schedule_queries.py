@@ -0,0 +1,107 @@
+import json
+import base64
+from datetime import datetime
+
+from database.db_connector import backend
+
+# ======================================================
+# PHÂN TRANG LỊCH TRÌNH THEO KEYSET (CON TRỎ)
+# ======================================================
+# Thứ tự: DiemUuTien DESC, LichTrinhID ASC. Trang sau bắt đầu ngay sau dòng cuối
+# của trang trước (không dùng OFFSET), nên chi phí mỗi trang không tăng theo số
+# trang. Được hỗ trợ bởi index IX_LichTrinh_SinhVien_DiemUuTien (database/SQLQuery1.sql).
+# Dòng có DiemUuTien NULL không xuất hiện trong danh sách phân trang.
+
+MAX_PAGE_SIZE = 100
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'   # cùng định dạng chuỗi với cột ThoiGianKetThuc
+
+PAGE_COLUMNS = "LichTrinhID, TieuDe, MonHocID, ThoiGianKetThuc, DiemUuTien, MucDoQuanTrong"
+
+
+def encode_cursor(score, lich_trinh_id):
+    raw = json.dumps([score, lich_trinh_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Trả về (DiemUuTien, LichTrinhID); ValueError nếu con trỏ hỏng."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, lich_trinh_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(score), str(lich_trinh_id)
+    except Exception:
+        raise ValueError("Cursor không hợp lệ")
+
+
+def clamp_page_size(page_size):
+    try:
+        return min(max(1, int(page_size)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("page_size phải là số nguyên")
+
+
+def parse_flag(value, name):
+    """Cờ từ JSON: true/false, 0/1 hoặc chuỗi 'true'/'false'/'1'/'0' (bool('false') là True)."""
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('', '0', 'false', '1', 'true'):
+        return value.strip().lower() in ('1', 'true')
+    raise ValueError(f"{name} phải là true/false")
+
+
+def normalize_date_filter(value, name, end_of_day=False):
+    """
+    Chuẩn hóa TuNgay/DenNgay về DATETIME_FORMAT để so sánh đúng với ThoiGianKetThuc.
+    Nhận 'YYYY-MM-DD HH:MM:SS' hoặc 'YYYY-MM-DD' (đầu ngày, hay cuối ngày nếu end_of_day);
+    ValueError nếu sai định dạng.
+    """
+    if isinstance(value, str):
+        for fmt in (DATETIME_FORMAT, '%Y-%m-%d'):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if fmt == '%Y-%m-%d' and end_of_day:
+                parsed = parsed.replace(hour=23, minute=59, second=59)
+            return parsed.strftime(DATETIME_FORMAT)
+    raise ValueError(f"{name} không hợp lệ (cần YYYY-MM-DD hoặc YYYY-MM-DD HH:MM:SS)")
+
+
+def build_schedule_page_query(sv_id, page_size, cursor=None, tu_ngay=None, den_ngay=None,
+                              mon_hoc_id=None, qua_han=False, now=None):
+    """
+    Dựng câu SELECT cho một trang (lấy dư 1 dòng để biết còn trang sau hay không).
+    Trả về (sql, params).
+    """
+    where = ["SinhVienID = ?", "DiemUuTien IS NOT NULL"]
+    params = [sv_id]
+
+    if cursor:
+        score, last_id = decode_cursor(cursor)
+        where.append("(DiemUuTien < ? OR (DiemUuTien = ? AND LichTrinhID > ?))")
+        params += [score, score, last_id]
+    if tu_ngay:
+        where.append("ThoiGianKetThuc >= ?")
+        params.append(normalize_date_filter(tu_ngay, "TuNgay"))
+    if den_ngay:
+        where.append("ThoiGianKetThuc <= ?")
+        params.append(normalize_date_filter(den_ngay, "DenNgay", end_of_day=True))
+    if mon_hoc_id:
+        where.append("MonHocID = ?")
+        params.append(mon_hoc_id)
+    if qua_han:
+        where.append("ThoiGianKetThuc < ?")
+        params.append((now or datetime.now()).strftime(DATETIME_FORMAT))
+
+    fetch = clamp_page_size(page_size) + 1
+    limit_sql = backend.limit_clause
+    params.append(fetch)
+
+    sql = (
+        f"SELECT {PAGE_COLUMNS} FROM LichTrinh "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY DiemUuTien DESC, LichTrinhID ASC {limit_sql}"
+    )
+    return sql, params
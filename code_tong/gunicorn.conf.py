@@ -0,0 +1,65 @@
+import os
+import multiprocessing
+
+# ======================================================
+# CẤU HÌNH GUNICORN (nhiều tiến trình x nhiều luồng)
+# ======================================================
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# gthread: mỗi worker có nhiều luồng, hợp với các request chờ I/O (DB, Gemini, Search, SSE)
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# preload: nạp app một lần ở tiến trình cha rồi fork (tiết kiệm RAM, khởi động nhanh)
+preload_app = os.getenv("PRELOAD_APP", "false").lower() == "true"
+# Tái tạo worker định kỳ để tránh rò rỉ bộ nhớ tích lũy
+max_requests = int(os.getenv("MAX_REQUESTS", "5000"))
+max_requests_jitter = 500
+
+# Nhiều worker = nhiều tiến trình, trạng thái trong bộ nhớ KHÔNG dùng chung:
+# - Phiên chat 'memory': lượt sau rơi vào worker khác là mất lịch sử -> mặc định 'sqlite'
+#   (một file trên máy, các worker cùng đọc/ghi).
+# - Cache ngữ cảnh lịch trình / câu trả lời chat chỉ bị xóa ở worker xử lý lệnh ghi,
+#   worker khác có thể trả dữ liệu cũ tới hết TTL -> rút TTL mặc định xuống 30s.
+# Đặt biến môi trường tương ứng để ghi đè (setdefault không ghi đè giá trị đã có).
+if workers > 1:
+    os.environ.setdefault("CHAT_SESSION_BACKEND", "sqlite")
+    os.environ.setdefault("CONTEXT_CACHE_TTL", "30")
+    os.environ.setdefault("CHAT_CACHE_TTL", "30")
+    # Thông báo deadline: chỉ một worker (giữ khóa file) chạy, tránh báo N lần
+    os.environ.setdefault("NOTIFY_LOCK_FILE", os.path.abspath("deadline_notifier.lock"))
+    # Làm mới DiemUuTien: chỉ một worker quét + ghi định kỳ, tránh N lần quét toàn bảng lúc khởi động
+    # và N lô UPDATE trùng nhau mỗi chu kỳ
+    os.environ.setdefault("PRIORITY_REFRESH_LOCK_FILE", os.path.abspath("priority_refresher.lock"))
+    # /metrics: gộp số liệu mọi worker qua file snapshot (xem services/metrics.py)
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.abspath("metrics_multiproc"))
+    # SSE lịch trình: bus sự kiện nằm trong từng tiến trình, client ở worker khác không nhận
+    # được thay đổi -> tắt, client tải lại định kỳ. Chỉ bật lại khi có pub/sub dùng chung.
+    os.environ.setdefault("SCHEDULE_SSE_ENABLED", "0")
+
+
+def on_starting(server):
+    # Khởi động lại cả server: xóa snapshot cũ, counter bắt đầu lại từ 0 (Prometheus hiểu là reset)
+    path = os.environ.get("METRICS_MULTIPROC_DIR")
+    if path and os.path.isdir(path):
+        for name in os.listdir(path):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(path, name))
+
+
+def post_worker_init(worker):
+    # Chạy trong worker sau khi app đã được nạp: tạo pool DB, model, luồng nền riêng
+    import app as app_module
+    if workers > 1 and app_module.CHAT_SESSION_BACKEND == "memory":
+        worker.log.warning(
+            f"CHAT_SESSION_BACKEND=memory với {workers} worker: lịch sử chat sẽ mất khi lượt hỏi "
+            "rơi vào worker khác. Dùng CHAT_SESSION_BACKEND=sqlite hoặc WEB_CONCURRENCY=1.")
+    app_module.init_worker(after_fork=preload_app)
+
+
+def worker_exit(server, worker):
+    # Tắt êm: chờ các lượt chat đang stream xong trong graceful_timeout
+    import app as app_module
+    app_module.shutdown_worker(timeout=graceful_timeout)
@@ -1,71 +1,92 @@
-﻿import os
-import pyodbc
-from dotenv import load_dotenv
+﻿from database.db_connector import get_db_connection
+from algorithms.trust_ranking import default_ranker
 
-load_dotenv()
+# Số URL tối đa trong một câu IN (...) - SQL Server giới hạn 2100 tham số
+EXISTS_CHUNK_SIZE = 1000
 
-# Cấu hình Database
-# Lưu ý: 'Trusted_Connection=yes' chỉ chạy trên Windows với SQL Server local.
-# Nếu chạy Docker hoặc Linux, cần dùng User ID và Password.
-DB_SERVER = 'Quiet'      # Tên server SQL của bạn
-DB_NAME = 'DatabaseAI'   # Tên database
-
-CONN_STR = (
-    f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-    f'SERVER={DB_SERVER};'
-    f'DATABASE={DB_NAME};'
-    f'Trusted_Connection=yes;'
-)
+def rank_material_trust(search_results):
+    """Chấm DiemTinCay theo bảng luật chung (algorithms/trust_ranking.py) và sắp xếp giảm dần."""
+    return default_ranker.rank(search_results)
 
-def get_db_connection():
-    return pyodbc.connect(CONN_STR)
+def _dedupe_by_url(items):
+    """Bỏ URL trùng, giữ bản xuất hiện đầu tiên (xếp hạng cao hơn)."""
+    seen = set()
+    unique = []
+    for item in items:
+        url = item.get('URL') or ''
+        if url and url not in seen:
+            seen.add(url)
+            unique.append(item)
+    return unique
 
-def rank_material_trust(search_results):
-    for result in search_results:
-        score = 5.0
-        url = (result.get("URL") or "").lower()
-        title = (result.get("TieuDe") or "").lower()
-        
-        if '.edu' in url: score += 5.0
-        elif '.gov' in url: score += 4.5
-        
-        if any(k in title for k in ['giáo trình', 'bài giảng', 'lecture', 'tutorial', 'pdf']): score += 3.0
-        
-        if 'wikipedia' in url: score += 1.5
-        
-        if 'facebook.com' in url or 'tiktok.com' in url: score -= 2.0
+def _existing_urls(cursor, urls):
+    """Kiểm tra URL đã có trong TaiLieu bằng các câu IN (...) theo lô."""
+    existing = set()
+    for i in range(0, len(urls), EXISTS_CHUNK_SIZE):
+        chunk = urls[i:i + EXISTS_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"SELECT URL FROM TaiLieu WHERE URL IN ({placeholders})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
 
-        final_score = round((score / 15.0) * 100, 1)
-        # Giới hạn điểm từ 1 đến 99
-        final_score = max(1.0, min(final_score, 99.0))
-        
-        result["DiemTinCay"] = final_score
-        
-    return sorted(search_results, key=lambda x: x.get("DiemTinCay", 0), reverse=True)
+def _count_urls(cursor, urls):
+    """Đếm số URL đang có trong TaiLieu, theo lô IN (...) như _existing_urls."""
+    total = 0
+    for i in range(0, len(urls), EXISTS_CHUNK_SIZE):
+        chunk = urls[i:i + EXISTS_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"SELECT COUNT(*) FROM TaiLieu WHERE URL IN ({placeholders})", chunk)
+        total += cursor.fetchone()[0]
+    return total
 
-def save_ranked_materials(ranked_list):
-    if not ranked_list: return
+def save_ranked_materials(ranked_list, limit=5, raise_errors=False):
+    """
+    Lưu tài liệu đã xếp hạng vào TaiLieu, bỏ qua URL đã tồn tại.
+    limit: số tài liệu đầu danh sách được lưu (None = lưu tất cả).
+    raise_errors: ném lỗi ra ngoài thay vì chỉ in (để hàng đợi việc nền thử lại).
+    Trả về {"inserted": số dòng thêm mới, "skipped": số dòng bỏ qua}.
+    """
+    result = {"inserted": 0, "skipped": 0}
+    if not ranked_list: return result
 
+    items = ranked_list if limit is None else ranked_list[:limit]
+    unique = _dedupe_by_url(items)
+    conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
-        for item in ranked_list[:5]:
-            check_sql = "SELECT COUNT(*) FROM TaiLieu WHERE URL = ?"
-            cursor.execute(check_sql, (item.get('URL', ''),))
-            if cursor.fetchone()[0] == 0:
-                insert_sql = """
-                    INSERT INTO TaiLieu (TieuDe, URL, DiemTinCay)
-                    VALUES (?, ?, ?)
-                """
-                cursor.execute(insert_sql, (
-                    item.get('TieuDe', '')[:200], 
-                    item.get('URL', ''), 
-                    item.get('DiemTinCay', 0)
-                ))
-        
+
+        existing = _existing_urls(cursor, [item['URL'] for item in unique])
+        new_rows = [
+            ((item.get('TieuDe') or '')[:200], item['URL'], item.get('DiemTinCay', 0), item['URL'])
+            for item in unique if item['URL'] not in existing
+        ]
+
+        inserted = 0
+        if new_rows:
+            # WHERE NOT EXISTS chặn trùng nếu request khác vừa chèn cùng URL
+            insert_sql = """
+                INSERT INTO TaiLieu (TieuDe, URL, DiemTinCay)
+                SELECT ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM TaiLieu WHERE URL = ?)
+            """
+            # rowcount của executemany không đáng tin giữa các driver: đếm các URL mới
+            # trước/sau lệnh chèn trong cùng transaction, dòng bị NOT EXISTS chặn không được tính
+            new_urls = [row[1] for row in new_rows]
+            before = _count_urls(cursor, new_urls)
+            cursor.fast_executemany = True
+            cursor.executemany(insert_sql, new_rows)
+            inserted = _count_urls(cursor, new_urls) - before
         conn.commit()
-        conn.close()
+
+        result["inserted"] = inserted
+        result["skipped"] = len(items) - inserted
+        return result
     except Exception as e:
+        if conn: conn.rollback()
         # Chỉ in lỗi, không làm crash app chính
-        print(f"⚠️ Lỗi lưu Database (Module C): {e}")
\ No newline at end of file
+        print(f"⚠️ Lỗi lưu Database (Module C): {e}")
+        if raise_errors: raise
+        return result
+    finally:
+        if conn: conn.close()
@@ -1,6 +1,6 @@
 ﻿// --- CẤU HÌNH ---
 const API_BASE = 'http://127.0.0.1:5001';
-let chatHistory = [];
+let chatSessionId = null; // Lịch sử chat lưu ở server, chỉ cần gửi session_id
 let isChatOpen = true;
 
 // 1. CHUYỂN TAB
@@ -13,7 +13,7 @@ function switchTab(tabId) {
     if (tabId === 'search') buttons[0].classList.add('active');
     else {
         buttons[1].classList.add('active');
-        loadSchedule(); // Tự động tải danh sách khi mở tab
+        openSchedule(); // Tải danh sách một lần + mở kênh SSE nhận thay đổi
     }
 }
 
@@ -63,17 +63,80 @@ async function saveDeadline(e) {
         if (data.status === 'success') {
             document.getElementById('dl-result').style.display = 'block';
             document.getElementById('res-score').innerText = data.DiemUuTien;
-            loadSchedule(); // Tải lại danh sách ngay
+            // Thêm ngay vào danh sách đang hiện (kênh SSE cũng gửi 'added', cập nhật trùng không sao)
+            if (payload.SinhVienID === scheduleSvID) {
+                applyScheduleEvent({ type: 'added', tasks: [{ ...payload, LichTrinhID: data.LichTrinhID_created, DiemUuTien: parseFloat(data.DiemUuTien) }] });
+            } else if (scheduleSvID) {
+                openSchedule(); // Đổi sang sinh viên khác -> chuyển kênh và tải danh sách của sinh viên đó
+            }
         } else alert('Lỗi: ' + data.error);
     } catch (e) { alert('Lỗi kết nối Server.'); }
 }
 
 // 4. HIỂN THỊ DANH SÁCH (CÓ NÚT XÓA)
-async function loadSchedule() {
-    const listDiv = document.getElementById('schedule-list');
+// Tải toàn bộ một lần khi mở tab / đổi sinh viên, sau đó chỉ nhận phần thay đổi qua SSE
+let scheduleTasks = new Map();   // LichTrinhID -> task
+let scheduleSvID = null;
+let scheduleSource = null;
+let pendingEvents = null;        // sự kiện đến trong lúc đang tải toàn bộ -> áp dụng sau
+let schedulePoll = null;         // khi server từ chối SSE (503: đủ kết nối / tắt SSE) -> tải lại định kỳ
+const SCHEDULE_POLL_MS = 30000;
+
+function openSchedule() {
     const svID = document.getElementById('svID').value || 'SV001';
+    if (svID === scheduleSvID && scheduleSource) return;
+    if (scheduleSource) scheduleSource.close();
+    stopSchedulePolling(); // Mở lại tab / đổi sinh viên -> thử SSE lại
+    scheduleSvID = svID;
+    scheduleTasks = new Map();
+
+    const source = new EventSource(`${API_BASE}/api/schedule/events?SinhVienID=${encodeURIComponent(svID)}`);
+    scheduleSource = source;
+    source.addEventListener('error', () => {
+        // Lỗi mạng: trình duyệt tự kết nối lại (CONNECTING). Server trả 503 / không phải
+        // text/event-stream: kết nối bị đóng hẳn (CLOSED) -> chuyển sang tải lại định kỳ.
+        if (source.readyState !== EventSource.CLOSED || scheduleSource !== source) return;
+        scheduleSource = null;
+        startSchedulePolling();
+    });
+    ['added', 'removed', 'rescored', 'resync'].forEach(type =>
+        scheduleSource.addEventListener(type, ev => applyScheduleEvent(JSON.parse(ev.data))));
+    scheduleSource.addEventListener('deadline', ev => {
+        const d = JSON.parse(ev.data);
+        console.log(`🔔 ${d.kind}: ${d.TieuDe} (hạn ${d.ThoiGianKetThuc})`);
+    });
+    loadSchedule();
+}
+
+function startSchedulePolling() {
+    if (schedulePoll) return;
+    console.warn('Không mở được kênh SSE lịch trình, tải lại định kỳ mỗi', SCHEDULE_POLL_MS / 1000, 'giây');
+    schedulePoll = setInterval(() => loadSchedule(true), SCHEDULE_POLL_MS);
+}
+
+function stopSchedulePolling() {
+    if (schedulePoll) clearInterval(schedulePoll);
+    schedulePoll = null;
+}
+
+function applyScheduleEvent(ev) {
+    if (pendingEvents) { pendingEvents.push(ev); return; }
+    if (ev.type === 'resync') { loadSchedule(); return; }
+    if (ev.type === 'added') ev.tasks.forEach(t => scheduleTasks.set(t.LichTrinhID, t));
+    else if (ev.type === 'removed') ev.LichTrinhIDs.forEach(id => scheduleTasks.delete(id));
+    else if (ev.type === 'rescored') ev.tasks.forEach(t => {
+        const task = scheduleTasks.get(t.LichTrinhID);
+        if (task) task.DiemUuTien = t.DiemUuTien;
+    });
+    renderSchedule();
+}
+
+async function loadSchedule(quiet = false) {
+    const listDiv = document.getElementById('schedule-list');
+    const svID = scheduleSvID || 'SV001';
     
-    listDiv.innerHTML = '<div style="padding:20px; text-align:center;">⏳ Đang tải...</div>';
+    if (!quiet) listDiv.innerHTML = '<div style="padding:20px; text-align:center;">⏳ Đang tải...</div>';
+    pendingEvents = [];
 
     try {
         const resp = await fetch(`${API_BASE}/api/schedule/optimize`, {
@@ -83,40 +146,52 @@ async function loadSchedule() {
         const data = await resp.json();
 
         if (data.status === 'success') {
-            const tasks = data.OptimizedSchedule;
-            if (tasks.length === 0) {
-                listDiv.innerHTML = '<div style="padding:20px; text-align:center; color:#718096;">Chưa có deadline nào.</div>';
-                return;
-            }
-
-            listDiv.innerHTML = tasks.map((task, index) => {
-                let color = task.DiemUuTien > 80 ? '#e53e3e' : (task.DiemUuTien > 50 ? '#d69e2e' : '#4a5568');
-                const timeShow = task.ThoiGianKetThuc.replace('T', ' ').slice(0, 16);
-
-                return `
-                <div style="padding:15px; border-bottom:1px solid #edf2f7; display:flex; justify-content:space-between; align-items:center; background:#fff;">
-                    <div style="flex: 1;">
-                        <div style="font-weight:600; color:#2d3748;">
-                            <span style="color:#718096; font-size:0.8rem; margin-right:5px;">#${index+1}</span>
-                            ${task.TieuDe} 
-                            <span style="font-size:0.8rem; background:#edf2f7; padding:2px 6px; border-radius:4px;">${task.MonHocID}</span>
-                        </div>
-                        <div style="font-size:0.85rem; color:#718096;">📅 Hạn: ${timeShow}</div>
-                    </div>
-                    
-                    <div style="text-align:right; display:flex; align-items:center; gap: 15px;">
-                        <div>
-                            <div style="font-size:1.1rem; font-weight:bold; color:${color};">${parseFloat(task.DiemUuTien).toFixed(1)}</div>
-                            <div style="font-size:0.7rem; color:#a0aec0;">Điểm</div>
-                        </div>
-                        <button onclick="deleteDeadline('${task.LichTrinhID}')" style="background:#fee2e2; border:none; border-radius:50%; width:30px; height:30px; cursor:pointer; display:flex; align-items:center; justify-content:center; color:#c53030; font-size:1rem;">
-                            🗑️
-                        </button>
-                    </div>
-                </div>`;
-            }).join('');
+            scheduleTasks = new Map(data.OptimizedSchedule.map(t => [t.LichTrinhID, t]));
+            const queued = pendingEvents;
+            pendingEvents = null;
+            queued.filter(ev => ev.type !== 'resync').forEach(applyScheduleEvent);
+            renderSchedule();
         }
     } catch (e) { listDiv.innerHTML = '<div style="text-align:center; color:red;">Lỗi tải dữ liệu.</div>'; }
+    pendingEvents = null;
+}
+
+function renderSchedule() {
+    const listDiv = document.getElementById('schedule-list');
+    // Cùng thứ tự với server: điểm cao trước, cùng điểm thì hạn sớm trước
+    const tasks = [...scheduleTasks.values()].sort((a, b) =>
+        (b.DiemUuTien || 0) - (a.DiemUuTien || 0) || String(a.ThoiGianKetThuc || '').localeCompare(String(b.ThoiGianKetThuc || '')));
+    if (tasks.length === 0) {
+        listDiv.innerHTML = '<div style="padding:20px; text-align:center; color:#718096;">Chưa có deadline nào.</div>';
+        return;
+    }
+
+    listDiv.innerHTML = tasks.map((task, index) => {
+        let color = task.DiemUuTien > 80 ? '#e53e3e' : (task.DiemUuTien > 50 ? '#d69e2e' : '#4a5568');
+        const timeShow = task.ThoiGianKetThuc.replace('T', ' ').slice(0, 16);
+
+        return `
+        <div style="padding:15px; border-bottom:1px solid #edf2f7; display:flex; justify-content:space-between; align-items:center; background:#fff;">
+            <div style="flex: 1;">
+                <div style="font-weight:600; color:#2d3748;">
+                    <span style="color:#718096; font-size:0.8rem; margin-right:5px;">#${index+1}</span>
+                    ${task.TieuDe} 
+                    <span style="font-size:0.8rem; background:#edf2f7; padding:2px 6px; border-radius:4px;">${task.MonHocID}</span>
+                </div>
+                <div style="font-size:0.85rem; color:#718096;">📅 Hạn: ${timeShow}</div>
+            </div>
+            
+            <div style="text-align:right; display:flex; align-items:center; gap: 15px;">
+                <div>
+                    <div style="font-size:1.1rem; font-weight:bold; color:${color};">${parseFloat(task.DiemUuTien).toFixed(1)}</div>
+                    <div style="font-size:0.7rem; color:#a0aec0;">Điểm</div>
+                </div>
+                <button onclick="deleteDeadline('${task.LichTrinhID}')" style="background:#fee2e2; border:none; border-radius:50%; width:30px; height:30px; cursor:pointer; display:flex; align-items:center; justify-content:center; color:#c53030; font-size:1rem;">
+                    🗑️
+                </button>
+            </div>
+        </div>`;
+    }).join('');
 }
 
 // 5. HÀM XỬ LÝ XÓA
@@ -132,8 +207,8 @@ async function deleteDeadline(id) {
         const data = await resp.json();
         
         if (data.status === 'success') {
-            // Xóa thành công thì load lại danh sách
-            loadSchedule();
+            // Xóa thành công thì bỏ khỏi danh sách đang hiện, không tải lại toàn bộ
+            applyScheduleEvent({ type: 'removed', LichTrinhIDs: [id] });
         } else {
             alert("Lỗi xóa: " + (data.error || "Unknown"));
         }
@@ -159,17 +234,38 @@ async function sendChat() {
     
     box.innerHTML += `<div class="msg user">${msg}</div>`;
     input.value = '';
-    chatHistory.push({role:'user', content:msg});
     box.scrollTop = box.scrollHeight;
     
     const load = document.createElement('div'); load.className='msg bot'; load.innerText='...'; box.appendChild(load);
     try {
-        const res = await fetch(`${API_BASE}/api/chat`, { method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({message:msg, history:chatHistory}) });
-        const data = await res.json();
-        load.remove();
-        const reply = (data.reply||'Lỗi AI').replace(/\n/g, '<br>');
-        box.innerHTML += `<div class="msg bot">${reply}</div>`;
-        chatHistory.push({role:'model', content:data.reply});
+        // Nhận câu trả lời dạng stream (Server-Sent Events), hiện dần từng đoạn
+        const res = await fetch(`${API_BASE}/api/chat/stream`, { method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({message:msg, session_id:chatSessionId}) });
+        if (!res.ok || !res.body) {
+            const data = await res.json();
+            load.innerHTML = (data.reply||'Lỗi AI').replace(/\n/g, '<br>');
+            return;
+        }
+        let reply = '';
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buf = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buf += decoder.decode(value, { stream: true });
+            const events = buf.split('\n\n');
+            buf = events.pop();
+            for (const ev of events) {
+                const dataLine = ev.split('\n').find(l => l.startsWith('data: '));
+                if (!dataLine) continue;
+                const payload = JSON.parse(dataLine.slice(6));
+                if (payload.delta) reply += payload.delta;
+                else if (payload.reply) reply = payload.reply;
+                if (payload.session_id) chatSessionId = payload.session_id;
+                load.innerHTML = reply.replace(/\n/g, '<br>');
+                box.scrollTop = box.scrollHeight;
+            }
+        }
     } catch(e) { load.remove(); box.innerHTML+=`<div class="msg bot" style="color:red">Lỗi mạng.</div>`; }
     box.scrollTop = box.scrollHeight;
 }
\ No newline at end of file
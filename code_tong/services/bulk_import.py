@@ -0,0 +1,215 @@
+import csv
+import io
+import uuid
+from datetime import datetime
+
+from algorithms.priority_logic import calculate_priority_score
+from services.metrics import timed
+
+try:
+    from algorithms.priority_logic import calculate_priority_scores_batch
+    import numpy  # noqa: F401  (batch cần numpy)
+except ImportError:
+    calculate_priority_scores_batch = None
+
+# ======================================================
+# NHẬP DEADLINE HÀNG LOẠT (CSV / JSON)
+# ======================================================
+# Một lượt: kiểm tra dữ liệu -> tra SinhVien/MonHoc theo lô IN (...) -> tính điểm cả lô
+# -> chèn SinhVien/MonHoc còn thiếu -> executemany LichTrinh. Tất cả trong MỘT transaction.
+
+IN_CHUNK_SIZE = 1000   # SQL Server giới hạn 2100 tham số mỗi câu lệnh
+DEFAULT_DIEM_KHO = 3.0
+REQUIRED_FIELDS = ('SinhVienID', 'MonHocID', 'TieuDe', 'ThoiGianKetThuc')
+DEADLINE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Dạng khác được chấp nhận rồi ghi lại theo DEADLINE_FORMAT (VD: giá trị của <input type="datetime-local">)
+DEADLINE_INPUT_FORMATS = (DEADLINE_FORMAT, '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M')
+
+
+def new_lich_trinh_id(prefix='LT'):
+    """ID 18 ký tự (vừa VARCHAR(20)): 64 bit ngẫu nhiên, không đụng nhau trong thực tế."""
+    return f"{prefix}{uuid.uuid4().hex[:16].upper()}"
+
+
+def parse_payload(body, content_type):
+    """
+    Đọc danh sách deadline từ request.
+    - JSON: [ {...}, ... ] hoặc {"deadlines": [...]}
+    - CSV: dòng đầu là tên cột (SinhVienID,MonHocID,TieuDe,ThoiGianKetThuc,MucDoQuanTrong)
+    """
+    if 'csv' in (content_type or ''):
+        text = body.decode('utf-8-sig') if isinstance(body, bytes) else body
+        return list(csv.DictReader(io.StringIO(text)))
+    if isinstance(body, dict):
+        body = body.get('deadlines')
+    if not isinstance(body, list):
+        raise ValueError("Dữ liệu phải là danh sách deadline hoặc {\"deadlines\": [...]}")
+    return body
+
+
+def normalize_deadline(value):
+    """
+    Chuẩn hóa ThoiGianKetThuc về '%Y-%m-%d %H:%M:%S' (dạng mọi nơi khác đọc/so sánh chuỗi).
+    Raise ValueError nếu không khớp dạng nào trong DEADLINE_INPUT_FORMATS.
+    """
+    for fmt in DEADLINE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime(DEADLINE_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def validate_rows(rows):
+    """Tách dòng hợp lệ (đã chuẩn hóa) và dòng lỗi [(số dòng, lý do)]."""
+    valid, errors = [], []
+    for i, raw in enumerate(rows, start=1):
+        if not isinstance(raw, dict):
+            errors.append((i, "Dòng không phải object"))
+            continue
+        row = {k: (str(raw.get(k) or '').strip()) for k in REQUIRED_FIELDS}
+        missing = [k for k in REQUIRED_FIELDS if not row[k]]
+        if missing:
+            errors.append((i, f"Thiếu {', '.join(missing)}"))
+            continue
+        try:
+            row['MucDoQuanTrong'] = int(raw.get('MucDoQuanTrong') or 3)
+        except (TypeError, ValueError):
+            errors.append((i, "MucDoQuanTrong không phải số nguyên"))
+            continue
+        try:
+            row['ThoiGianKetThuc'] = normalize_deadline(row['ThoiGianKetThuc'])
+        except ValueError:
+            errors.append((i, "ThoiGianKetThuc không hợp lệ (cần YYYY-MM-DD HH:MM:SS)"))
+            continue
+        row['TieuDe'] = row['TieuDe'][:200]
+        row['_line'] = i
+        valid.append(row)
+    return valid, errors
+
+
+def _select_in(cursor, sql_prefix, ids):
+    """Chạy 'sql_prefix IN (...)' theo lô, trả về toàn bộ các dòng."""
+    ids = list(ids)
+    found = []
+    for i in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = ids[i:i + IN_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"{sql_prefix} IN ({placeholders})", chunk)
+        found.extend(cursor.fetchall())
+    return found
+
+
+def lookup_references(cursor, rows, ref_cache=None):
+    """
+    Tra SinhVien/MonHoc đã có bằng các câu IN (...) theo lô.
+    ref_cache (ReferenceCache, tùy chọn): chỉ xuống DB với các ID cache chưa biết.
+    Trả về (tập SinhVienID đã có, diem_kho theo MonHocID đã có).
+    """
+    sv_ids = {r['SinhVienID'] for r in rows}
+    mh_ids = {r['MonHocID'] for r in rows}
+    existing_sv, diem_kho = set(), {}
+    if ref_cache is not None:
+        version = ref_cache.version
+        existing_sv = ref_cache.cached_students(sv_ids)
+        diem_kho = ref_cache.cached_subjects(mh_ids)
+
+    found_sv = {row[0] for row in _select_in(
+        cursor, "SELECT SinhVienID FROM SinhVien WHERE SinhVienID", sv_ids - existing_sv)}
+    found_mh = {
+        row[0]: float(row[1]) if row[1] is not None else DEFAULT_DIEM_KHO
+        for row in _select_in(cursor, "SELECT MonHocID, DiemKho FROM MonHoc WHERE MonHocID", mh_ids - set(diem_kho))
+    }
+    if ref_cache is not None:
+        ref_cache.fill_many(version, students=found_sv, subjects=found_mh)
+    return existing_sv | found_sv, {**diem_kho, **found_mh}
+
+
+def insert_missing_references(cursor, new_sv, new_mh):
+    """Chèn SinhVien/MonHoc còn thiếu bằng executemany (MonHoc mới có DiemKho mặc định)."""
+    cursor.fast_executemany = True
+    if new_sv:
+        cursor.executemany("INSERT INTO SinhVien (SinhVienID, HoTen) VALUES (?, ?)",
+                           [(s, f"SV {s}") for s in new_sv])
+    if new_mh:
+        cursor.executemany("INSERT INTO MonHoc (MonHocID, TenMonHoc, DiemKho) VALUES (?, ?, ?)",
+                           [(m, f"Môn {m}", DEFAULT_DIEM_KHO) for m in new_mh])
+
+
+def score_rows(rows, diem_kho, now=None):
+    """Tính DiemUuTien cho cả lô; trả về (scores, error_mask) dạng list."""
+    deadlines = [r['ThoiGianKetThuc'] for r in rows]
+    importance = [r['MucDoQuanTrong'] for r in rows]
+    difficulty = [diem_kho.get(r['MonHocID'], DEFAULT_DIEM_KHO) for r in rows]
+    if calculate_priority_scores_batch is not None:
+        scores, mask = calculate_priority_scores_batch(deadlines, importance, difficulty, now=now)
+        return scores.tolist(), mask.tolist()
+    # Không có numpy: tính từng dòng; calculate_priority_score nuốt lỗi (trả 0.0)
+    # nên tự đánh dấu dòng lỗi để báo lại giống bản batch
+    scores, error_mask = [], []
+    for d, i, k in zip(deadlines, importance, difficulty):
+        try:
+            datetime.strptime(d, DEADLINE_FORMAT)
+            float(i), float(k)
+        except (TypeError, ValueError):
+            scores.append(0.0)
+            error_mask.append(True)
+            continue
+        scores.append(calculate_priority_score(d, i, k, now=now))
+        error_mask.append(False)
+    return scores, error_mask
+
+
+def import_deadlines(conn, raw_rows, now=None, ref_cache=None):
+    """
+    Nhập toàn bộ deadline trong một transaction. Dòng lỗi bị bỏ qua và được báo lại.
+    Trả về dict tóm tắt; "SinhVienIDs" là các sinh viên bị ảnh hưởng (để xóa cache),
+    "created" là các tuple (LichTrinhID, SinhVienID, MonHocID, TieuDe, ThoiGianKetThuc,
+    MucDoQuanTrong, DiemUuTien) đã chèn.
+    """
+    rows, errors = validate_rows(raw_rows)
+    summary = {"inserted": 0, "new_students": 0, "new_subjects": 0,
+               "errors": errors, "SinhVienIDs": [], "created": []}
+    if not rows:
+        return summary
+
+    cursor = conn.cursor()
+    try:
+        existing_sv, diem_kho = lookup_references(cursor, rows, ref_cache)
+        with timed('priority_score_batch'):
+            scores, error_mask = score_rows(rows, diem_kho, now=now)
+
+        params = []
+        for row, score, bad in zip(rows, scores, error_mask):
+            if bad:
+                errors.append((row['_line'], "ThoiGianKetThuc không hợp lệ"))
+                continue
+            params.append((new_lich_trinh_id(), row['SinhVienID'], row['MonHocID'], row['TieuDe'],
+                           row['ThoiGianKetThuc'], row['MucDoQuanTrong'], float(score)))
+
+        # Chỉ tạo SinhVien/MonHoc cho các dòng thực sự được chèn
+        new_sv = sorted({p[1] for p in params} - existing_sv)
+        new_mh = sorted({p[2] for p in params} - set(diem_kho))
+        insert_missing_references(cursor, new_sv, new_mh)
+        summary["new_students"], summary["new_subjects"] = len(new_sv), len(new_mh)
+
+        if params:
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                INSERT INTO LichTrinh (LichTrinhID, SinhVienID, MonHocID, TieuDe, LoaiSuKien, ThoiGianBatDau, ThoiGianKetThuc, MucDoQuanTrong, DiemUuTien)
+                VALUES (?, ?, ?, ?, 'DEADLINE', GETDATE(), ?, ?, ?)
+            """, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if ref_cache is not None:
+        for sv_id in new_sv: ref_cache.note_student(sv_id)
+        for mh_id in new_mh: ref_cache.note_subject(mh_id, DEFAULT_DIEM_KHO)
+
+    errors.sort()
+    summary["inserted"] = len(params)
+    summary["SinhVienIDs"] = sorted({p[1] for p in params})
+    summary["created"] = params
+    return summary
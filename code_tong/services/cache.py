@@ -0,0 +1,132 @@
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache trong bộ nhớ, an toàn đa luồng:
+    - Giới hạn số phần tử, đầy thì bỏ phần tử ít dùng gần đây nhất (LRU).
+    - Mỗi phần tử hết hạn sau `ttl` giây (ttl=None: không hết hạn).
+    - Đếm hit/miss/eviction để theo dõi hiệu quả.
+    - Chống ghi đè dữ liệu cũ: đọc generation(key) TRƯỚC khi truy vấn nguồn rồi truyền vào
+      set(..., generation=...); nếu key bị invalidate trong lúc truy vấn thì bỏ qua lần ghi.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (value, thời điểm hết hạn)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._generations = {}   # key -> số lần bị invalidate
+        self._epoch = 0          # tăng khi clear()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def generation(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, value, ttl=_MISSING, generation=None):
+        """Ghi key; trả về False (không ghi) nếu key đã bị invalidate kể từ `generation`."""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > 4 * self.max_size:
+                # Giữ bảng generation có giới hạn: đổi epoch = coi mọi lượt đọc đang chạy là cũ
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi đồng thời cùng key thành một lời gọi thật duy nhất;
+    các luồng đến sau chờ và dùng chung kết quả (hoặc lỗi) của luồng đầu.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0  # số lần được dùng chung kết quả
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,374 @@
+import math
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from database.db_connector import get_db_connection, backend
+from services.leader_lock import LeaderLock
+
+# ======================================================
+# TIMER WHEEL PHÂN CẤP
+# ======================================================
+# Mỗi tầng là một vòng các ô; tầng i có mỗi ô dài bằng cả vòng của tầng i-1.
+# Thêm/hủy: O(1). Mỗi tick chỉ xử lý một ô của tầng 0, và khi tầng dưới quay hết
+# một vòng thì "đổ" một ô của tầng trên xuống (mỗi phần tử đổ tối đa số tầng - 1 lần),
+# nên chi phí trung bình mỗi tick là O(1) dù có hàng trăm nghìn deadline.
+# Mốc ngoài tầm của cả bánh xe nằm trong heap tràn, được đưa vào dần.
+
+
+class _TimerEntry:
+    __slots__ = ("key", "expire", "payload", "cancelled")
+
+    def __init__(self, key, expire, payload):
+        self.key = key
+        self.expire = expire        # số tick tuyệt đối
+        self.payload = payload
+        self.cancelled = False
+
+
+class TimerWheel:
+    """
+    tick: độ dài một tick (giây). levels: số ô mỗi tầng, mặc định
+    60 x 24 x 32 với tick 60s = phút / giờ / ngày, tầm xa 32 ngày.
+    """
+
+    def __init__(self, tick=60.0, levels=(60, 24, 32), now=None):
+        self.tick = tick
+        self.sizes = tuple(levels)
+        self.spans = [math.prod(self.sizes[:i]) for i in range(len(self.sizes))]
+        self.horizon = math.prod(self.sizes)
+        self._wheels = [[[] for _ in range(n)] for n in self.sizes]
+        self._overflow = []   # heap (expire, seq, entry)
+        self._due = []        # đã quá hạn lúc thêm -> bắn ở lần advance kế tiếp
+        self._seq = 0
+        self.current = self.to_tick(now if now is not None else time.time())
+        self.size = 0
+
+    def to_tick(self, ts):
+        return int(ts // self.tick)
+
+    def add(self, key, fire_at, payload):
+        """fire_at: epoch giây. Trả về entry (dùng để hủy)."""
+        entry = _TimerEntry(key, math.ceil(fire_at / self.tick), payload)
+        self._place(entry)
+        self.size += 1
+        return entry
+
+    def cancel(self, entry):
+        # Hủy lười: đánh dấu, bỏ qua khi tới ô
+        if not entry.cancelled:
+            entry.cancelled = True
+            self.size -= 1
+
+    def _place(self, entry):
+        delta = entry.expire - self.current
+        if delta <= 0:
+            self._due.append(entry)
+            return
+        for level, span in enumerate(self.spans):
+            if delta < span * self.sizes[level]:
+                slot = (entry.expire // span) % self.sizes[level]
+                self._wheels[level][slot].append(entry)
+                return
+        self._seq += 1
+        heapq.heappush(self._overflow, (entry.expire, self._seq, entry))
+
+    def advance(self, now):
+        """Chạy tới thời điểm `now` (epoch giây), trả về danh sách payload tới hạn."""
+        fired = [e for e in self._due if not e.cancelled]
+        self._due = []
+        target = self.to_tick(now)
+        top = len(self.sizes) - 1
+        while self.current < target:
+            self.current += 1
+            t = self.current
+            # Đưa dần mốc tràn vào bánh xe mỗi khi tầng trên cùng sang ô mới
+            if t % self.spans[top] == 0:
+                while self._overflow and self._overflow[0][0] - t < self.horizon:
+                    self._place(heapq.heappop(self._overflow)[2])
+            # Đổ các ô tầng trên xuống, từ tầng cao tới thấp
+            for level in range(top, 0, -1):
+                span = self.spans[level]
+                if t % span == 0:
+                    slot = (t // span) % self.sizes[level]
+                    bucket, self._wheels[level][slot] = self._wheels[level][slot], []
+                    for entry in bucket:
+                        if not entry.cancelled:
+                            self._place(entry)
+            slot = t % self.sizes[0]
+            bucket, self._wheels[0][slot] = self._wheels[0][slot], []
+            fired.extend(e for e in bucket if not e.cancelled)
+            fired.extend(e for e in self._due if not e.cancelled)
+            self._due = []
+        self.size -= len(fired)
+        for entry in fired:
+            entry.cancelled = True   # đã bắn, hủy sau đó là no-op
+        return [e.payload for e in fired]
+
+
+# ======================================================
+# CHỈ MỤC DEADLINE SẮP TỚI / QUÁ HẠN
+# ======================================================
+def _parse_deadline(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.strptime(text[:19], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return datetime.fromisoformat(text)
+
+
+LOAD_SQL = f"""
+    SELECT LichTrinhID, SinhVienID, TieuDe, ThoiGianKetThuc FROM LichTrinh
+    WHERE (ThoiGianKetThuc > ? OR (ThoiGianKetThuc = ? AND LichTrinhID > ?)) AND ThoiGianKetThuc <= ?
+    ORDER BY ThoiGianKetThuc, LichTrinhID {backend.limit_clause}
+"""
+
+
+class DeadlineNotifier:
+    """
+    Giữ trong bộ nhớ các deadline trong cửa sổ [bây giờ, bây giờ + horizon] và bắn sự kiện
+    ở các mốc báo trước (lead_minutes, 0 = vừa quá hạn).
+    - Nạp tăng dần: mỗi lần refresh chỉ đọc thêm phần cửa sổ mới (keyset theo
+      ThoiGianKetThuc, LichTrinhID), không quét lại cả bảng.
+    - Đồng bộ: route tạo/xóa gọi add()/remove().
+    - Sự kiện: listener(event) được gọi trên luồng ticker, event gồm
+      type ('deadline_upcoming' | 'deadline_overdue'), id, LichTrinhID, SinhVienID,
+      TieuDe, ThoiGianKetThuc, lead_minutes.
+    - Nhiều tiến trình (lock_path): chỉ tiến trình giữ khóa file chạy (các tiến trình khác
+      thử lại mỗi tick, tiếp quản khi tiến trình giữ khóa thoát). Vì tạo/xóa ở tiến trình
+      khác không tới được đây, mỗi lần refresh đọc lại cả cửa sổ và trước khi bắn kiểm tra
+      dòng còn trong DB.
+    """
+
+    def __init__(self, lead_minutes=(1440, 60, 0), tick=60.0, horizon=None, refresh_interval=600,
+                 batch_size=5000, connection_factory=get_db_connection, lock_path=None):
+        self.lead_minutes = sorted(set(int(m) for m in lead_minutes), reverse=True)
+        self.tick = tick
+        # Cửa sổ phải dài hơn mốc báo trước xa nhất, để deadline vào cửa sổ trước mốc đầu tiên
+        self.horizon = horizon or timedelta(minutes=self.lead_minutes[0]) + timedelta(days=1)
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._connection_factory = connection_factory
+        self.lock_path = lock_path
+        self._leader = LeaderLock(lock_path)
+        self._refreshed_at = None   # mốc lần refresh trước (mốc báo sau mốc này chưa bị bỏ lỡ)
+
+        self._wheel = TimerWheel(tick=tick)
+        self._entries = {}    # LichTrinhID -> [entry theo từng mốc]
+        # Chế độ nhiều tiến trình: (LichTrinhID, ThoiGianKetThuc) -> các mốc đã bắn. refresh đọc
+        # lại cả cửa sổ từ lần refresh trước nên không được lên lịch lại mốc đã bắn; giữ tới khi
+        # deadline cũ hơn mốc cắt (không còn mốc nào của nó được đọc lại).
+        self._fired = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._loaded_until = None
+        self._last_refresh = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {"loaded": 0, "fired": 0, "last_error": None}
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # --- đồng bộ với LichTrinh ---
+    def add(self, lt_id, sv_id, tieu_de, deadline, now=None):
+        """Lên lịch các mốc của một deadline (bỏ qua nếu ngoài cửa sổ đã nạp, lần refresh sau sẽ nạp)."""
+        if self._loaded_until is None:
+            return
+        try:
+            deadline = _parse_deadline(deadline)
+        except (TypeError, ValueError):
+            return   # ThoiGianKetThuc sai định dạng: không có mốc nào để báo
+        now = now or datetime.now()
+        with self._lock:
+            if deadline > self._loaded_until:
+                return
+            self._cancel_locked(lt_id)
+            self._schedule_locked(lt_id, sv_id, tieu_de, deadline, now, fire_overdue=True)
+
+    def remove(self, lt_id):
+        with self._lock:
+            self._cancel_locked(lt_id)
+
+    def _cancel_locked(self, lt_id):
+        for entry in self._entries.pop(lt_id, ()):
+            self._wheel.cancel(entry)
+
+    def _schedule_locked(self, lt_id, sv_id, tieu_de, deadline, now, fire_overdue=False):
+        entries = []
+        deadline_text = deadline.strftime('%Y-%m-%d %H:%M:%S')
+        fired = self._fired.get((lt_id, deadline_text), ())
+        for lead in self.lead_minutes:
+            fire_at = deadline - timedelta(minutes=lead)
+            # Mốc đã qua: bỏ, trừ khi deadline vừa được tạo ở trạng thái quá hạn
+            if fire_at < now and not (lead == 0 and fire_overdue):
+                continue
+            if lead in fired:
+                continue
+            event = {
+                "type": "deadline_overdue" if lead == 0 else "deadline_upcoming",
+                "id": f"{lt_id}:{lead}",
+                "LichTrinhID": lt_id,
+                "SinhVienID": sv_id,
+                "TieuDe": tieu_de,
+                "ThoiGianKetThuc": deadline_text,
+                "lead_minutes": lead,
+            }
+            entries.append(self._wheel.add(lt_id, fire_at.timestamp(), event))
+        if entries:
+            self._entries[lt_id] = entries
+
+    # --- nạp từ DB ---
+    def refresh(self, now=None):
+        """
+        Nạp phần cửa sổ mới (loaded_until, now + horizon] theo từng lô.
+        Chế độ nhiều tiến trình: đọc lại cả [now, now + horizon] để thấy deadline do tiến trình
+        khác tạo; mốc báo đã qua từ lần refresh trước vẫn được bắn (trễ tối đa refresh_interval).
+        """
+        now = now or datetime.now()
+        shared = self.lock_path is not None
+        cutoff = (self._refreshed_at or now) if shared else now
+        lower = cutoff if shared else (self._loaded_until or now)
+        upper = now + self.horizon
+        if upper <= lower:
+            return 0
+        fmt = '%Y-%m-%d %H:%M:%S'
+        last_time, last_id = lower.strftime(fmt), ''
+        loaded = 0
+        if shared:
+            with self._lock:
+                self._prune_fired_locked(cutoff)
+        conn = None
+        try:
+            conn = self._connection_factory()
+            cursor = conn.cursor()
+            while True:
+                cursor.execute(LOAD_SQL, last_time, last_time, last_id, upper.strftime(fmt), self.batch_size)
+                rows = cursor.fetchall()
+                with self._lock:
+                    for lt_id, sv_id, tieu_de, deadline in rows:
+                        if lt_id not in self._entries:
+                            self._schedule_locked(lt_id, sv_id, tieu_de, _parse_deadline(deadline), cutoff)
+                loaded += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+                last_id = rows[-1][0]
+                last_time = _parse_deadline(rows[-1][3]).strftime(fmt)
+            with self._lock:
+                self._loaded_until = upper
+            self._refreshed_at = now
+            self.stats["loaded"] += loaded
+            self.stats["last_error"] = None
+        except Exception as e:
+            self.stats["last_error"] = str(e)
+            print(f"⚠️ Lỗi nạp chỉ mục deadline: {e}")
+        finally:
+            if conn: conn.close()
+        return loaded
+
+    def _prune_fired_locked(self, cutoff):
+        cutoff_text = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+        for key in [k for k in self._fired if k[1] < cutoff_text]:
+            del self._fired[key]
+
+    # --- bắn sự kiện ---
+    def advance(self, now=None):
+        now_ts = (now or datetime.now()).timestamp()
+        with self._lock:
+            events = self._wheel.advance(now_ts)
+            for event in events:
+                entries = self._entries.get(event["LichTrinhID"])
+                if entries:
+                    remaining = [e for e in entries if not e.cancelled]
+                    if remaining:
+                        self._entries[event["LichTrinhID"]] = remaining
+                    else:
+                        del self._entries[event["LichTrinhID"]]
+                if self.lock_path is not None:
+                    self._fired.setdefault((event["LichTrinhID"], event["ThoiGianKetThuc"]),
+                                           set()).add(event["lead_minutes"])
+        if events and self.lock_path is not None:
+            events = self._drop_deleted(events)
+        self.stats["fired"] += len(events)
+        for event in events:
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️ Lỗi listener thông báo deadline: {e}")
+        return events
+
+    def _drop_deleted(self, events):
+        """Bỏ sự kiện của deadline đã bị xóa (lệnh xóa có thể chạy ở tiến trình khác)."""
+        ids = list({e["LichTrinhID"] for e in events})
+        conn = None
+        try:
+            conn = self._connection_factory()
+            cursor = conn.cursor()
+            present = set()
+            for i in range(0, len(ids), 1000):
+                chunk = ids[i:i + 1000]
+                cursor.execute(f"SELECT LichTrinhID FROM LichTrinh WHERE LichTrinhID IN ({', '.join('?' * len(chunk))})",
+                               chunk)
+                present.update(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            # Không kiểm tra được: bắn như bình thường, thà báo thừa còn hơn mất thông báo
+            print(f"⚠️ Lỗi kiểm tra deadline trước khi báo: {e}")
+            return events
+        finally:
+            if conn: conn.close()
+        return [e for e in events if e["LichTrinhID"] in present]
+
+    def is_leader(self):
+        return self._leader.is_held()
+
+    def size(self):
+        with self._lock:
+            return self._wheel.size
+
+    # --- luồng nền ---
+    def _loop(self):
+        while not self._stop_event.is_set():
+            if not self._leader.acquire():
+                self._stop_event.wait(self.tick)
+                continue
+            if self._loaded_until is None or time.monotonic() - self._last_refresh >= self.refresh_interval:
+                self._last_refresh = time.monotonic()
+                self.refresh()
+            self.advance()
+            # Ngủ tới đầu tick kế tiếp
+            self._stop_event.wait(self.tick - (time.time() % self.tick) + 0.01)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        if self._leader.acquire():
+            self._last_refresh = time.monotonic()
+            self.refresh()
+        self._thread = threading.Thread(target=self._loop, name="deadline-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._leader.release()   # nhả khóa cho worker khác tiếp quản
+
+
+def log_event(event):
+    """Listener mặc định: ghi log."""
+    logging.info(f"🔔 {event['type']} {event['LichTrinhID']} ({event['SinhVienID']}): "
+                 f"'{event['TieuDe']}' hạn {event['ThoiGianKetThuc']}, báo trước {event['lead_minutes']} phút")
+
+
+def post_webhook(url, event, timeout=5):
+    """Gửi sự kiện tới webhook (chạy trong job nền, lỗi -> raise để hàng đợi thử lại)."""
+    import requests
+    resp = requests.post(url, json=event, timeout=timeout)
+    resp.raise_for_status()
+    return resp.status_code
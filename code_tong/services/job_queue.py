@@ -0,0 +1,353 @@
+import json
+import time
+import heapq
+import random
+import sqlite3
+import logging
+import threading
+import uuid
+from collections import deque
+
+# ======================================================
+# HÀNG ĐỢI VIỆC NỀN TRONG TIẾN TRÌNH
+# ======================================================
+# Route chỉ enqueue rồi trả về ngay; pool luồng worker chạy việc ở phía sau.
+# - Giới hạn số việc chạy đồng thời theo từng loại (vd: LLM tối đa 8, lưu tài liệu 2).
+# - Lỗi thì thử lại với backoff lũy thừa có jitter, quá max_attempts thì đánh dấu failed.
+# - Chế độ bền (SQLiteJobStore): việc được ghi xuống đĩa, tiến trình chết giữa chừng
+#   thì lần khởi động sau chạy lại các việc còn dở (payload phải là JSON).
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class UnknownJobTypeError(Exception):
+    """Enqueue loại việc chưa đăng ký handler."""
+
+
+class Job:
+    __slots__ = ("id", "type", "payload", "status", "attempts", "max_attempts",
+                 "run_at", "result", "error", "created", "finished")
+
+    def __init__(self, job_type, payload, max_attempts, run_at, job_id=None, attempts=0, status=QUEUED):
+        self.id = job_id or uuid.uuid4().hex
+        self.type = job_type
+        self.payload = payload
+        self.status = status
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.run_at = run_at
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class SQLiteJobStore:
+    """
+    Lưu việc xuống SQLite (WAL) để sống qua khởi động lại. Nhiều worker gunicorn có thể
+    dùng chung file: việc được "nhận" bằng UPDATE ... WHERE Status='queued' (chỉ một
+    tiến trình thắng), việc đang chạy có hạn thuê (lease) để phục hồi khi tiến trình chết.
+    """
+
+    def __init__(self, path="jobs.db", lease=300):
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS Job (
+                JobID TEXT PRIMARY KEY,
+                Type TEXT NOT NULL,
+                Payload TEXT,
+                Status TEXT NOT NULL,
+                Attempts INTEGER NOT NULL DEFAULT 0,
+                MaxAttempts INTEGER NOT NULL,
+                RunAt REAL NOT NULL,
+                LeaseUntil REAL,
+                Result TEXT,
+                Error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS IX_Job_Status_RunAt ON Job(Status, RunAt)")
+
+    def add(self, job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO Job (JobID, Type, Payload, Status, Attempts, MaxAttempts, RunAt) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.type, json.dumps(job.payload, ensure_ascii=False), job.status,
+                 job.attempts, job.max_attempts, job.run_at))
+
+    def claim(self, job):
+        """Đánh dấu running; False nếu tiến trình khác đã nhận việc này."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE Job SET Status = ?, LeaseUntil = ? WHERE JobID = ? AND Status = ?",
+                (RUNNING, time.time() + self.lease, job.id, QUEUED))
+            return cur.rowcount == 1
+
+    def update(self, job):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE Job SET Status = ?, Attempts = ?, RunAt = ?, LeaseUntil = NULL, Result = ?, Error = ? WHERE JobID = ?",
+                (job.status, job.attempts, job.run_at,
+                 json.dumps(job.result, ensure_ascii=False, default=str), job.error, job.id))
+
+    def recover(self):
+        """Trả lại hàng đợi các việc chạy dở đã hết lease, rồi nạp mọi việc đang chờ."""
+        with self._lock:
+            self._conn.execute("UPDATE Job SET Status = ?, LeaseUntil = NULL WHERE Status = ? AND LeaseUntil < ?",
+                               (QUEUED, RUNNING, time.time()))
+            rows = self._conn.execute(
+                "SELECT JobID, Type, Payload, Attempts, MaxAttempts, RunAt FROM Job WHERE Status = ? ORDER BY RunAt",
+                (QUEUED,)).fetchall()
+        return [Job(t, json.loads(p) if p else None, m, r, job_id=i, attempts=a)
+                for i, t, p, a, m, r in rows]
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT JobID, Type, Status, Attempts, Result, Error FROM Job WHERE JobID = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {"job_id": row[0], "type": row[1], "status": row[2], "attempts": row[3],
+                "result": json.loads(row[4]) if row[4] else None, "error": row[5]}
+
+    def purge(self, older_than):
+        """Xóa việc đã xong/thất bại có RunAt cũ hơn older_than (epoch giây)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM Job WHERE Status IN (?, ?) AND RunAt < ?", (DONE, FAILED, older_than))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Hàng đợi việc nền với pool luồng worker.
+    register(loại, hàm, concurrency) rồi enqueue(loại, payload) -> job_id; hàm nhận payload.
+    Luồng worker được khởi động ở lần enqueue đầu tiên (hoặc start()).
+    """
+
+    def __init__(self, workers=4, store=None, max_attempts=3, backoff=1.0, max_backoff=60.0,
+                 keep_finished=1000, retention=7 * 86400, purge_interval=3600):
+        self.workers = workers
+        self.store = store
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keep_finished = keep_finished
+        self.retention = retention              # giây giữ việc đã xong/thất bại trong store; None = giữ mãi
+        self.purge_interval = purge_interval
+
+        self._handlers = {}      # loại -> (hàm, giới hạn đồng thời, max_attempts)
+        self._ready = {}         # loại -> deque các Job đến hạn
+        self._delayed = []       # heap (run_at, seq, Job) chờ tới hạn (thử lại / trì hoãn)
+        self._running = {}       # loại -> số việc đang chạy
+        self._jobs = {}          # job_id -> Job (gồm cả việc đã xong gần đây)
+        self._finished_ids = deque()   # thứ tự việc xong, để giữ tối đa keep_finished việc
+        self._cond = threading.Condition()
+        self._threads = []
+        self._seq = 0
+        self._started = False
+        self._stopping = False
+        self._next_purge = 0.0
+
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    # --- đăng ký / enqueue ---
+    def register(self, job_type, fn, concurrency=None, max_attempts=None):
+        with self._cond:
+            self._handlers[job_type] = (fn, concurrency or self.workers, max_attempts or self.max_attempts)
+            self._ready.setdefault(job_type, deque())
+            self._running.setdefault(job_type, 0)
+
+    def enqueue(self, job_type, payload=None, delay=0):
+        if job_type not in self._handlers:
+            raise UnknownJobTypeError(f"Chưa đăng ký loại việc '{job_type}'")
+        # Khởi động (và phục hồi việc cũ từ store) trước khi ghi việc mới, tránh nạp trùng
+        self._ensure_started()
+        job = Job(job_type, payload, self._handlers[job_type][2], time.time() + delay)
+        if self.store is not None:
+            self.store.add(job)
+        with self._cond:
+            self._jobs[job.id] = job
+            self._schedule(job)
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        return self.store.get(job_id) if self.store is not None else None
+
+    # --- nội bộ ---
+    def _schedule(self, job):
+        if job.run_at <= time.time():
+            self._ready[job.type].append(job)
+        else:
+            self._seq += 1
+            heapq.heappush(self._delayed, (job.run_at, self._seq, job))
+
+    def _next_job(self):
+        """Gọi khi đang giữ _cond. Trả về Job chạy được, hoặc số giây nên chờ."""
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            job = heapq.heappop(self._delayed)[2]
+            self._ready[job.type].append(job)
+        for job_type, ready in self._ready.items():
+            if ready and self._running[job_type] < self._handlers[job_type][1]:
+                self._running[job_type] += 1
+                return ready.popleft()
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    item = self._next_job()
+                    if isinstance(item, Job):
+                        break
+                    self._cond.wait(item)
+            self._run(item)
+            self._maybe_purge()
+
+    def _run(self, job):
+        if self.store is not None and not self.store.claim(job):
+            self._finish(job, None)   # tiến trình khác đã nhận
+            return
+        fn = self._handlers[job.type][0]
+        job.status = RUNNING
+        job.attempts += 1
+        try:
+            job.result = fn(job.payload)
+            job.status = DONE
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            if job.attempts < job.max_attempts:
+                delay = min(self.max_backoff, self.backoff * (2 ** (job.attempts - 1)))
+                job.run_at = time.time() + random.uniform(delay / 2, delay)
+                job.status = QUEUED
+                logging.warning(f"Việc {job.type} {job.id} lỗi lần {job.attempts}, thử lại sau: {job.error}")
+            else:
+                job.status = FAILED
+                logging.error(f"Việc {job.type} {job.id} thất bại sau {job.attempts} lần: {job.error}")
+        if self.store is not None:
+            try:
+                self.store.update(job)
+            except Exception as e:
+                logging.error(f"Không lưu được trạng thái việc {job.id}: {e}")
+        self._finish(job, job.status)
+
+    def _finish(self, job, status):
+        with self._cond:
+            self._running[job.type] -= 1
+            if status is None:
+                self._jobs.pop(job.id, None)
+            elif status == QUEUED:
+                self.retried += 1
+                self._schedule(job)
+            elif status in (DONE, FAILED):
+                job.finished = time.time()
+                if status == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._finished_ids.append(job.id)
+                while len(self._finished_ids) > self.keep_finished:
+                    self._jobs.pop(self._finished_ids.popleft(), None)
+            self._cond.notify_all()
+
+    def _maybe_purge(self):
+        """Xóa định kỳ việc đã xong/thất bại quá `retention` giây khỏi store (chỉ một luồng làm)."""
+        if self.store is None or self.retention is None:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        try:
+            self.store.purge(time.time() - self.retention)
+        except Exception as e:
+            logging.error(f"Không dọn được việc cũ trong store: {e}")
+
+    def _ensure_started(self):
+        if not self._started:
+            self.start()
+
+    # --- vòng đời ---
+    def start(self):
+        """Khởi động worker; ở chế độ bền thì nạp lại các việc còn dở từ lần chạy trước."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+        if self.store is not None:
+            self._maybe_purge()
+            for job in self.store.recover():
+                if job.type not in self._handlers:
+                    logging.warning(f"Bỏ qua việc {job.id}: chưa đăng ký loại '{job.type}'")
+                    continue
+                with self._cond:
+                    if job.id in self._jobs:
+                        continue
+                    self._jobs[job.id] = job
+                    self._schedule(job)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def pending(self):
+        with self._cond:
+            return (sum(len(q) for q in self._ready.values()) + len(self._delayed)
+                    + sum(self._running.values()))
+
+    def drain(self, timeout=30):
+        """Chờ hết việc đang chờ/đang chạy (tối đa timeout giây) rồi dừng worker."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._started:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (not self._delayed and not any(self._ready.values())
+                                      and not any(self._running.values())):
+                    break
+                self._cond.wait(min(remaining, 0.5))
+            drained = self.pending() == 0 if self._started else True
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+        self._started = False
+        return drained
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "ready": {t: len(q) for t, q in self._ready.items()},
+                "running": dict(self._running),
+                "delayed": len(self._delayed),
+                "completed": self.completed,
+                "failed": self.failed,
+                "retried": self.retried,
+            }
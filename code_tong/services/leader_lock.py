@@ -0,0 +1,36 @@
+class LeaderLock:
+    """
+    Bầu "leader" giữa các worker gunicorn trên cùng máy bằng khóa file (flock, không chặn).
+    Tiến trình giữ khóa làm việc nền; khi nó thoát (kể cả bị kill) hệ điều hành nhả khóa
+    và worker khác gọi acquire() lần sau sẽ tiếp quản.
+    path=None: không dùng khóa, tiến trình luôn là leader (chạy một worker).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """True nếu tiến trình này là leader (không dùng khóa, đã giữ hoặc vừa lấy được khóa)."""
+        if self.path is None or self._file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True   # Windows: không chạy gunicorn nhiều worker
+        f = open(self.path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def is_held(self):
+        return self.path is None or self._file is not None
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()   # nhả khóa cho worker khác tiếp quản
+            self._file = None
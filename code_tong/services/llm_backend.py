@@ -0,0 +1,202 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import timed, UPSTREAM_ERRORS
+
+# ======================================================
+# MODEL GIẢ LẬP (CHẠY OFFLINE / LOAD-TEST)
+# ======================================================
+# Cùng giao diện với google.generativeai.GenerativeModel ở phần app dùng:
+# model.start_chat(history=...).send_message(text, stream=...)
+
+FAKE_MODEL_LATENCY = float(os.getenv("FAKE_MODEL_LATENCY", "0.5"))   # giây trước chunk đầu
+FAKE_MODEL_CHUNK_DELAY = float(os.getenv("FAKE_MODEL_CHUNK_DELAY", "0.05"))
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeResponse:
+    def __init__(self, chunks, stream):
+        self._chunks = chunks
+        self._stream = stream
+
+    def __iter__(self):
+        for i, text in enumerate(self._chunks):
+            if self._stream and i:
+                time.sleep(FAKE_MODEL_CHUNK_DELAY)
+            yield _FakeChunk(text)
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+
+class FakeChatSession:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False):
+        time.sleep(self.model.latency)
+        question = content.rsplit("Câu hỏi của sinh viên:", 1)[-1].strip()
+        words = f"[fake] Đã nhận câu hỏi: {question}".split(" ")
+        chunks = [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+        if not stream:
+            time.sleep(FAKE_MODEL_CHUNK_DELAY * max(0, len(chunks) - 1))
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": ["".join(chunks)]})
+        return _FakeResponse(chunks, stream)
+
+
+class FakeModel:
+    def __init__(self, name="models/fake-gemini", latency=FAKE_MODEL_LATENCY):
+        self.model_name = name
+        self.latency = latency
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+
+# ======================================================
+# CHẠY LỜI GỌI LLM TRÊN POOL LUỒNG RIÊNG
+# ======================================================
+class LLMBusyError(Exception):
+    """Quá nhiều lời gọi LLM đang chờ, từ chối ngay thay vì giữ worker."""
+
+
+_DONE = object()
+
+
+class LLMRunner:
+    """
+    Chạy send_message trên pool luồng riêng, giới hạn số lời gọi đồng thời
+    (max_workers) và số lời gọi được xếp hàng (max_pending). Vượt giới hạn thì
+    báo LLMBusyError để route trả 503 ngay, không để các request chậm chiếm hết worker.
+    Lưu ý: generate() vẫn giữ luồng gọi tới khi có câu trả lời (chỉ stream() và việc nền
+    'chat' là không chặn). Với request đồng bộ, gọi generate(queue=False): không còn luồng
+    pool rảnh thì báo bận ngay thay vì giữ luồng request chờ trong hàng đợi.
+    """
+
+    def __init__(self, max_workers=8, max_pending=32, timeout=60):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Condition()
+        self._closing = False
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _acquire(self, queue=True):
+        """queue=False: chỉ nhận khi còn luồng pool rảnh (không xếp hàng)."""
+        if self._closing:
+            raise LLMBusyError("Máy chủ đang tắt, vui lòng thử lại sau")
+        with self._lock:
+            if (not queue and self.in_flight >= self.max_workers) or not self._slots.acquire(blocking=False):
+                self.rejected += 1
+                raise LLMBusyError("Hệ thống AI đang quá tải, vui lòng thử lại sau")
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._lock.notify_all()
+        self._slots.release()
+
+    @staticmethod
+    def _send(chat_session, message):
+        try:
+            with timed('llm_send_message'):
+                return chat_session.send_message(message).text
+        except Exception:
+            UPSTREAM_ERRORS.inc(service='gemini')
+            raise
+
+    def generate(self, chat_session, message, queue=True):
+        """
+        Gửi tin nhắn và chờ toàn bộ câu trả lời (tối đa timeout giây) - chặn luồng gọi.
+        queue=False: báo LLMBusyError ngay nếu mọi luồng pool đang bận.
+        """
+        self._acquire(queue)
+        try:
+            future = self._executor.submit(self._send, chat_session, message)
+        except Exception:
+            self._release()
+            raise
+        # Trả slot khi lời gọi thực sự xong, kể cả khi bên gọi đã hết thời gian chờ
+        future.add_done_callback(lambda _: self._release())
+        return future.result(timeout=self.timeout)
+
+    def stream(self, chat_session, message):
+        """
+        Bắt đầu sinh câu trả lời (stream=True) và trả về generator các đoạn văn bản.
+        Luồng trong pool đọc response và đẩy vào hàng đợi; generator đọc ra.
+        Việc chiếm slot diễn ra ngay khi gọi, nên LLMBusyError được báo trước khi stream.
+        """
+        self._acquire()
+        chunks = queue.Queue()
+
+        def produce():
+            try:
+                # Đo từ lúc gửi đến khi nhận xong đoạn cuối
+                with timed('llm_send_message_stream'):
+                    for chunk in chat_session.send_message(message, stream=True):
+                        text = getattr(chunk, "text", "")
+                        if text:
+                            chunks.put(text)
+            except Exception as e:
+                UPSTREAM_ERRORS.inc(service='gemini')
+                chunks.put(e)
+            finally:
+                chunks.put(_DONE)
+                self._release()
+
+        try:
+            self._executor.submit(produce)
+        except Exception:
+            self._release()
+            raise
+        return self._drain(chunks)
+
+    def _drain(self, chunks):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                item = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError("AI phản hồi quá lâu")
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "rejected": self.rejected}
+
+    def drain(self, timeout=30):
+        """
+        Ngừng nhận lời gọi mới và chờ các lời gọi đang chạy (kể cả stream) xong,
+        tối đa timeout giây. Trả về True nếu đã xong hết.
+        """
+        self._closing = True
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.in_flight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            drained = self.in_flight == 0
+        self._executor.shutdown(wait=False)
+        return drained
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
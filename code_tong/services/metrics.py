@@ -0,0 +1,435 @@
+import io
+import os
+import json
+import time
+import bisect
+import pstats
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+
+# ======================================================
+# METRICS DẠNG PROMETHEUS (KHÔNG CẦN THƯ VIỆN NGOÀI)
+# ======================================================
+# Chi phí mỗi lần ghi: một bisect + một lock ngắn. Số liệu có sẵn ở nơi khác
+# (cache, pool, LLM runner...) được đọc qua collector lúc render, không tốn gì trên hot path.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_str(labelnames, values):
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(k, "") for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            series = [[list(k), v] for k, v in self._values.items()]
+        return {"type": "counter", "name": self.name, "help": self.help,
+                "labelnames": list(self.labelnames), "series": series}
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return _render_counter(self.name, self.help, self.labelnames, items)
+
+
+def _render_counter(name, help_text, labelnames, items):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for key, value in items:
+        lines.append(f"{name}{_label_str(labelnames, key)} {value}")
+    return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # nhãn -> [đếm theo bucket..., +Inf], tổng, số lần
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(k, "") for k in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            series = [[list(k), list(s[0]), s[1], s[2]] for k, s in self._series.items()]
+        return {"type": "histogram", "name": self.name, "help": self.help,
+                "labelnames": list(self.labelnames), "buckets": list(self.buckets), "series": series}
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        return _render_histogram(self.name, self.help, self.labelnames, self.buckets, items)
+
+
+def _render_histogram(name, help_text, labelnames, buckets, items):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, (counts, total, count) in items:
+        cumulative = 0
+        for bound, c in zip(tuple(buckets) + (float("inf"),), counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _label_str(tuple(labelnames) + ("le",), tuple(key) + (le,))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _label_str(labelnames, key)
+        lines.append(f"{name}_sum{labels} {total:.6f}")
+        lines.append(f"{name}_count{labels} {count}")
+    return lines
+
+
+def _render_samples(grouped):
+    """grouped: {(tên, kiểu, help): [({nhãn}, giá trị)]}"""
+    lines = []
+    for (name, kind, help_text), samples in grouped.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_label_str(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []   # hàm trả về [(tên, kiểu, help, {nhãn}, giá trị)]
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """fn() trả về danh sách (tên, 'gauge'|'counter', help, {nhãn}, giá trị), gọi lúc render."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def collect(self):
+        """Gọi các collector, trả về [(tên, kiểu, help, {nhãn}, giá trị)]."""
+        with self._lock:
+            collectors = list(self._collectors)
+        samples = []
+        for fn in collectors:
+            try:
+                samples.extend(fn())
+            except Exception as e:
+                logging.warning(f"Collector metrics lỗi: {e}")
+        return samples
+
+    def snapshot(self):
+        """Toàn bộ số liệu của tiến trình dạng JSON được (để gộp nhiều tiến trình)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return {
+            "pid": os.getpid(),
+            "metrics": [m.snapshot() for m in metrics],
+            "samples": [[name, kind, help_text, list(labels.items()), value]
+                        for name, kind, help_text, labels, value in self.collect()],
+        }
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        grouped = {}
+        for name, kind, help_text, labels, value in self.collect():
+            grouped.setdefault((name, kind, help_text), []).append((labels, value))
+        lines.extend(_render_samples(grouped))
+        return "\n".join(lines) + "\n"
+
+
+# ======================================================
+# GỘP SỐ LIỆU NHIỀU TIẾN TRÌNH (GUNICORN NHIỀU WORKER)
+# ======================================================
+# Mỗi worker giữ số liệu riêng; mỗi lần scrape rơi vào một worker ngẫu nhiên nên counter
+# "nhảy lùi". Giống chế độ multiprocess của prometheus_client: mỗi worker ghi snapshot ra
+# <thư mục>/metrics-<pid>.json (định kỳ + ngay lúc scrape), /metrics đọc và gộp tất cả:
+# - counter / histogram: cộng mọi file, kể cả worker đã thoát (để không giảm).
+# - gauge: chỉ cộng các worker còn sống.
+# File của worker đã thoát được dồn vào metrics-archive.json (chỉ giữ counter/histogram).
+
+ARCHIVE_FILE = "metrics-archive.json"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class _Merged:
+    def __init__(self):
+        self.metrics = {}   # tên -> dict mô tả + series gộp
+        self.samples = {}   # (tên, kiểu, help) -> {nhãn (tuple cặp): giá trị}
+
+    def add(self, snapshot, include_gauges=True):
+        for m in snapshot.get("metrics", []):
+            merged = self.metrics.setdefault(m["name"], {**m, "series": {}})
+            for item in m["series"]:
+                key = tuple(item[0])
+                if m["type"] == "counter":
+                    merged["series"][key] = merged["series"].get(key, 0) + item[1]
+                else:
+                    old = merged["series"].get(key)
+                    if old is None:
+                        merged["series"][key] = [list(item[1]), item[2], item[3]]
+                    else:
+                        old[0] = [a + b for a, b in zip(old[0], item[1])]
+                        old[1] += item[2]
+                        old[2] += item[3]
+        for name, kind, help_text, labels, value in snapshot.get("samples", []):
+            if kind == "gauge" and not include_gauges:
+                continue
+            series = self.samples.setdefault((name, kind, help_text), {})
+            key = tuple(tuple(p) for p in labels)
+            series[key] = series.get(key, 0) + value
+
+    def to_snapshot(self):
+        """Dạng snapshot (không gauge) để lưu vào file archive."""
+        metrics = []
+        for m in self.metrics.values():
+            if m["type"] == "counter":
+                series = [[list(k), v] for k, v in m["series"].items()]
+            else:
+                series = [[list(k)] + s for k, s in m["series"].items()]
+            metrics.append({**m, "series": series})
+        samples = [[name, kind, help_text, [list(p) for p in key], value]
+                   for (name, kind, help_text), series in self.samples.items() if kind != "gauge"
+                   for key, value in series.items()]
+        return {"pid": 0, "metrics": metrics, "samples": samples}
+
+    def render(self):
+        lines = []
+        for m in self.metrics.values():
+            items = sorted(m["series"].items())
+            if m["type"] == "counter":
+                lines.extend(_render_counter(m["name"], m["help"], m["labelnames"], items))
+            else:
+                lines.extend(_render_histogram(m["name"], m["help"], m["labelnames"], m["buckets"],
+                                               [(k, tuple(s)) for k, s in items]))
+        grouped = {group: [(dict(key), value) for key, value in series.items()]
+                   for group, series in self.samples.items()}
+        lines.extend(_render_samples(grouped))
+        return "\n".join(lines) + "\n"
+
+
+class MultiProcessMetrics:
+    def __init__(self, registry, path, interval=5.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, pid):
+        return os.path.join(self.path, f"metrics-{pid}.json")
+
+    def write(self):
+        """Ghi snapshot của tiến trình hiện tại (ghi file tạm rồi rename, người đọc không thấy file dở)."""
+        snapshot = self.registry.snapshot()
+        target = self._file(snapshot["pid"])
+        tmp = f"{target}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, target)
+
+    def _read(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def render(self):
+        self.write()
+        with self._dir_lock():
+            archive_path = os.path.join(self.path, ARCHIVE_FILE)
+            archive = _Merged()
+            archive.add(self._read(archive_path) or {}, include_gauges=False)
+            live, dead = [], []
+            for name in os.listdir(self.path):
+                if not (name.startswith("metrics-") and name.endswith(".json")) or name == ARCHIVE_FILE:
+                    continue
+                pid = int(name[len("metrics-"):-len(".json")])
+                (live if _pid_alive(pid) else dead).append(name)
+            if dead:
+                for name in dead:
+                    archive.add(self._read(os.path.join(self.path, name)) or {}, include_gauges=False)
+                tmp = f"{archive_path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(archive.to_snapshot(), f)
+                os.replace(tmp, archive_path)
+                for name in dead:
+                    os.remove(os.path.join(self.path, name))
+            merged = archive
+            for name in live:
+                merged.add(self._read(os.path.join(self.path, name)) or {})
+        return merged.render()
+
+    @contextmanager
+    def _dir_lock(self):
+        # Nhiều worker scrape cùng lúc: chỉ một worker dồn file vào archive tại một thời điểm
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logging.warning(f"Không ghi được snapshot metrics: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.interval)
+        try:
+            self.write()   # số liệu cuối của worker trước khi thoát
+        except OSError:
+            pass
+
+
+# --- Registry và các metric dùng chung ---
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Thời gian xử lý request theo route",
+    ("route", "method", "status"))
+OPERATION_LATENCY = registry.histogram(
+    "operation_duration_seconds", "Thời gian các thao tác nóng (DB, tính điểm, LLM, tìm kiếm)",
+    ("op",))
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total", "Số lỗi từ dịch vụ bên ngoài", ("service",))
+
+
+def timed(op):
+    """Đo thời gian một khối lệnh: with timed('db_execute'): ..."""
+    return OPERATION_LATENCY.time(op=op)
+
+
+def cache_collector(name, stats_fn):
+    """Collector cho các cache có stats() kiểu TTLCache (hits/misses/size)."""
+    def collect():
+        stats = stats_fn()
+        return [
+            ("cache_requests_total", "counter", "Số lần tra cache", {"cache": name, "result": "hit"}, stats.get("hits", 0)),
+            ("cache_requests_total", "counter", "Số lần tra cache", {"cache": name, "result": "miss"}, stats.get("misses", 0)),
+            ("cache_size", "gauge", "Số phần tử trong cache", {"cache": name}, stats.get("size", 0)),
+        ]
+    return collect
+
+
+# ======================================================
+# PROFILE THEO REQUEST (BẬT BẰNG HEADER)
+# ======================================================
+PROFILE_HEADER = "X-Profile"
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"   # tắt mặc định ở production
+PROFILE_DIR = os.getenv("PROFILE_DIR")                        # lưu file .prof nếu có
+PROFILE_TOP_N = 30
+
+_profile_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    cProfile cho một request. Chỉ một request được profile tại một thời điểm
+    (cProfile chỉ theo dõi luồng hiện tại, và profile chồng nhau làm sai số liệu).
+    """
+
+    def __init__(self):
+        self._profile = None
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def stop(self, label):
+        """Dừng profile, ghi log top hàm theo thời gian tích lũy và trả về đường dẫn file (nếu có)."""
+        try:
+            self._profile.disable()
+            out = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            logging.info(f"Profile {label}:\n{out.getvalue()}")
+            if PROFILE_DIR:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                safe = label.strip("/").replace("/", "_") or "root"
+                path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{safe}.prof")
+                stats.dump_stats(path)
+                return path
+            return None
+        finally:
+            self._profile = None
+            _profile_lock.release()
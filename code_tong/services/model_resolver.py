@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from services.llm_backend import FakeModel
+
+# ======================================================
+# CHỌN MODEL GEMINI: LƯỜI (LAZY) + CACHE RA FILE
+# ======================================================
+# Không gọi genai.list_models() lúc import nữa. Thứ tự ưu tiên:
+#   1. Biến môi trường GEMINI_MODEL (không gọi mạng)
+#   2. File cache còn hạn (MODEL_CACHE_PATH, MODEL_CACHE_TTL giây)
+#   3. Dò danh sách model qua mạng rồi ghi lại cache
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL")
+MODEL_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gemini_model_cache.json"))
+MODEL_CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", str(24 * 3600)))
+
+_configured_key = None
+_configure_lock = threading.Lock()
+
+
+def _genai():
+    """Import SDK Gemini khi thật sự cần: chạy offline (LLM_BACKEND=fake) không cần cài SDK."""
+    import google.generativeai as genai
+    return genai
+
+
+def _key_hint(api_key):
+    """Hash ngắn của key để cache không bị dùng nhầm khi đổi key (không lưu key thật)."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+
+
+def _configure(api_key):
+    global _configured_key
+    with _configure_lock:
+        if _configured_key != api_key:
+            _genai().configure(api_key=api_key)
+            _configured_key = api_key
+
+
+def list_generate_models(api_key):
+    """Danh sách tên model hỗ trợ 'generateContent' (gọi mạng)."""
+    _configure(api_key)
+    return [m.name for m in _genai().list_models() if 'generateContent' in m.supported_generation_methods]
+
+
+def _read_cache(api_key, path, ttl):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("key") != _key_hint(api_key) or time.time() - data.get("resolved_at", 0) > ttl:
+        return None
+    return data.get("model")
+
+
+def _write_cache(api_key, model_name, path):
+    try:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": model_name, "key": _key_hint(api_key), "resolved_at": time.time()}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Không ghi được cache model: {e}")
+
+
+def resolve_model_name(api_key, force_refresh=False, path=MODEL_CACHE_PATH, ttl=MODEL_CACHE_TTL, names=None):
+    """
+    Tên model Gemini dùng cho chat, None nếu không tìm thấy.
+    names: danh sách từ list_generate_models() nếu đã có sẵn (khỏi dò lại qua mạng).
+    """
+    if GEMINI_MODEL:
+        return GEMINI_MODEL
+    if not force_refresh:
+        cached = _read_cache(api_key, path, ttl)
+        if cached:
+            return cached
+    for name in (names if names is not None else list_generate_models(api_key)):
+        if 'gemini' in name:
+            _write_cache(api_key, name, path)
+            return name
+    return None
+
+
+class ModelProvider:
+    """
+    Giữ model dùng chung cho cả tiến trình, chỉ khởi tạo ở lần dùng đầu tiên.
+    Dò model lỗi (mất mạng / không có model phù hợp) thì trả None ngay trong `retry_after`
+    giây rồi mới thử lại: không để mọi request chat lần lượt chờ timeout mạng sau khóa.
+    """
+
+    def __init__(self, api_key, backend="gemini", retry_after=30.0):
+        self.api_key = api_key
+        self.backend = backend
+        self.retry_after = retry_after
+        self.name = "Chưa kết nối"
+        self._model = None
+        self._failed_until = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._model is not None:
+            return self._model
+        if time.monotonic() < self._failed_until:
+            return None
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            if time.monotonic() < self._failed_until:
+                return None
+            if self.backend == 'fake':
+                self._model = FakeModel()
+                self.name = self._model.model_name
+                print(f"--- 🧪 Dùng model giả lập: {self.name} ---")
+                return self._model
+            if not self.api_key:
+                return None
+            try:
+                name = resolve_model_name(self.api_key)
+                if not name:
+                    print("--- ❌ Không tìm thấy model AI nào phù hợp ---")
+                    self._failed_until = time.monotonic() + self.retry_after
+                    return None
+                _configure(self.api_key)
+                self._model = _genai().GenerativeModel(name)
+                self.name = name
+                print(f"--- ✅ ĐÃ KẾT NỐI: {self.name} ---")
+            except Exception as e:
+                self.name = f"Lỗi AI: {str(e)}"
+                print(f"--- ❌ Lỗi AI: {str(e)} ---")
+                self._failed_until = time.monotonic() + self.retry_after
+            return self._model
+
+    def reset(self):
+        with self._lock:
+            self._model = None
+            self._failed_until = 0.0
+            self.name = "Chưa kết nối"
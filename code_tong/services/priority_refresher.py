@@ -0,0 +1,144 @@
+import threading
+from datetime import datetime, timedelta
+
+from database.db_connector import get_db_connection
+from services.leader_lock import LeaderLock
+from services.metrics import timed
+from algorithms.priority_logic import (
+    calculate_priority_score, calculate_priority_scores_batch, LINEAR_BAND_HOURS, np,
+)
+
+# ======================================================
+# LÀM MỚI DiemUuTien THEO KIỂU TĂNG DẦN (INCREMENTAL)
+# ======================================================
+# Điểm ưu tiên chỉ thay đổi theo thời gian khi deadline nằm trong dải
+# tuyến tính (0h-72h) hoặc vừa vượt qua một mốc (72h -> vào dải, 0h -> quá hạn).
+# Các dòng còn >= 72h hoặc đã quá hạn từ lần chạy trước có điểm không đổi
+# nên không cần đọc lại.
+
+SELECT_FULL_SQL = """
+    SELECT lt.LichTrinhID, lt.SinhVienID, lt.ThoiGianKetThuc, lt.MucDoQuanTrong,
+           COALESCE(mh.DiemKho, 3.0), lt.DiemUuTien
+    FROM LichTrinh lt
+    LEFT JOIN MonHoc mh ON mh.MonHocID = lt.MonHocID
+"""
+
+SELECT_WINDOW_SQL = SELECT_FULL_SQL + """
+    WHERE lt.ThoiGianKetThuc > ? AND lt.ThoiGianKetThuc <= ?
+"""
+
+UPDATE_SQL = "UPDATE LichTrinh SET DiemUuTien = ? WHERE LichTrinhID = ?"
+
+
+class PriorityRefresher:
+    """
+    Định kỳ tính lại DiemUuTien cho những dòng có điểm thực sự thay đổi.
+    - Lần chạy đầu: tính lại toàn bộ (không biết điểm cũ được tính lúc nào).
+    - Các lần sau: chỉ lấy deadline trong (lần chạy trước, bây giờ + 72h],
+      tức là dải tuyến tính cộng với các dòng vừa chuyển sang quá hạn.
+    - Ghi lại bằng executemany theo lô, bỏ qua dòng có điểm không đổi.
+    - run_once() giữ _run_lock suốt lần chạy: luồng nền và việc 'rescore' (job queue)
+      không chạy chồng nhau, _last_run/stats chỉ được sửa bên trong khóa.
+    - Nhiều tiến trình (lock_path): chỉ tiến trình giữ khóa file chạy luồng nền định kỳ,
+      các tiến trình khác thử lại mỗi interval và tiếp quản khi tiến trình giữ khóa thoát.
+    """
+
+    def __init__(self, interval=300, batch_size=500, connection_factory=get_db_connection, lock_path=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._connection_factory = connection_factory
+        self._last_run = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._run_lock = threading.Lock()   # luồng nền và việc 'rescore' không chạy chồng nhau
+        self._leader = LeaderLock(lock_path)
+        self.stats = {"runs": 0, "scanned": 0, "updated": 0, "last_error": None}
+
+    def add_listener(self, callback):
+        """callback(changes) được gọi sau mỗi lần ghi, changes = [(LichTrinhID, SinhVienID, điểm mới)]."""
+        self._listeners.append(callback)
+
+    def run_once(self, now=None):
+        with self._run_lock:
+            return self._run_once(now)
+
+    def _run_once(self, now=None):
+        now = now or datetime.now()
+        conn = None
+        try:
+            conn = self._connection_factory()
+            cursor = conn.cursor()
+            if self._last_run is None:
+                cursor.execute(SELECT_FULL_SQL)
+            else:
+                upper = now + timedelta(hours=LINEAR_BAND_HOURS)
+                cursor.execute(SELECT_WINDOW_SQL, self._last_run, upper)
+            rows = cursor.fetchall()
+
+            with timed('priority_score_batch'):
+                scores = self._score_rows(rows, now)
+            changes = []
+            for (lt_id, sv_id, _, _, _, old_score), new_score in zip(rows, scores):
+                if new_score is None:
+                    continue
+                if old_score is None or abs(float(old_score) - new_score) >= 0.01:
+                    changes.append((new_score, lt_id, sv_id))
+
+            if changes:
+                cursor.fast_executemany = True
+                for i in range(0, len(changes), self.batch_size):
+                    cursor.executemany(UPDATE_SQL, [c[:2] for c in changes[i:i + self.batch_size]])
+                conn.commit()
+
+            self._last_run = now
+            self.stats["runs"] += 1
+            self.stats["scanned"] += len(rows)
+            self.stats["updated"] += len(changes)
+            self.stats["last_error"] = None
+        except Exception as e:
+            if conn: conn.rollback()
+            self.stats["last_error"] = str(e)
+            print(f"⚠️ Lỗi làm mới điểm ưu tiên: {e}")
+            return []
+        finally:
+            if conn: conn.close()
+
+        result = [(lt_id, sv_id, score) for score, lt_id, sv_id in changes]
+        for callback in self._listeners:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"⚠️ Lỗi listener làm mới điểm: {e}")
+        return result
+
+    @staticmethod
+    def _score_rows(rows, now):
+        """Tính điểm mới cho các dòng; None với dòng không có deadline hoặc lỗi."""
+        if not rows:
+            return []
+        if np is not None:
+            scores, errors = calculate_priority_scores_batch(
+                [r[2] for r in rows], [r[3] or 3 for r in rows], [r[4] for r in rows], now=now)
+            return [None if err else float(s) for s, err in zip(scores, errors)]
+        return [calculate_priority_score(r[2], r[3] or 3, r[4], now=now) if r[2] is not None else None
+                for r in rows]
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            if self._leader.acquire():
+                self.run_once()
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="priority-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._leader.release()
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime
+
+# ======================================================
+# DỰNG PROMPT THEO NGÂN SÁCH TOKEN
+# ======================================================
+# Ước lượng token đơn giản (không cần tokenizer của Gemini): trung bình
+# khoảng 3.5 ký tự / token với tiếng Việt có dấu lẫn tiếng Anh.
+CHARS_PER_TOKEN = 3.5
+
+# Tỉ lệ ngân sách tối đa dành cho ngữ cảnh lịch trình; phần còn lại cho lịch sử
+CONTEXT_SHARE = 0.5
+SUMMARY_ITEM_CHARS = 80
+TRIM_MARKER = "(...đã lược bớt)\n"
+SUMMARY_ACK = "Đã ghi nhận."
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def _as_datetime(value):
+    if isinstance(value, datetime) or value is None:
+        return value
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+def select_context_rows(rows, top_k=10, nearest_k=5, now=None):
+    """
+    Chọn các deadline đưa vào prompt.
+    rows: (TieuDe, MonHocID, ThoiGianKetThuc, MucDoQuanTrong, DiemUuTien), đã sắp theo DiemUuTien giảm dần.
+    Giữ top_k dòng điểm cao nhất + nearest_k dòng sắp đến hạn gần nhất (chưa có trong top).
+    Trả về (các dòng được chọn, số dòng bị lược bớt).
+    """
+    now = now or datetime.now()
+    top = list(rows[:top_k])
+    rest = [r for r in rows[top_k:] if (_as_datetime(r[2]) or datetime.min) >= now]
+    nearest = sorted(rest, key=lambda r: _as_datetime(r[2]))[:nearest_k]
+    return top + nearest, len(rows) - len(top) - len(nearest)
+
+def render_context(rows, omitted=0):
+    """Biến dữ liệu SQL thành đoạn văn bản mô tả cho AI."""
+    if not rows:
+        return "Hiện tại sinh viên chưa có lịch trình nào trong danh sách."
+    lines = ["Danh sách lịch trình/deadline hiện tại của sinh viên:\n"]
+    for row in rows:
+        # Format ngày giờ cho dễ đọc
+        deadline = _as_datetime(row[2])
+        time_str = deadline.strftime("%d/%m/%Y %H:%M") if deadline else "Không rõ"
+        lines.append(f"- Môn {row[1]}: {row[0]} (Hạn: {time_str}, Quan trọng: {row[3]}/5, Điểm ưu tiên: {float(row[4] or 0):.1f})\n")
+    if omitted > 0:
+        lines.append(f"(Còn {omitted} deadline khác ít ưu tiên hơn đã được lược bớt.)\n")
+    return "".join(lines)
+
+def trim_to_tokens(text, max_tokens):
+    """Cắt bớt các dòng cuối cho vừa max_tokens (tính cả dòng đánh dấu đã lược bớt)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRIM_MARKER)
+    kept, used = [], 0
+    for line in text.splitlines(keepends=True):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "".join(kept) + TRIM_MARKER if kept else ""
+
+def fit_history(history, max_tokens):
+    """
+    Giữ các lượt chat gần nhất vừa ngân sách; các lượt cũ hơn được gộp thành
+    một lượt tóm tắt ngắn (các câu hỏi cũ, mỗi câu cắt còn SUMMARY_ITEM_CHARS ký tự).
+    history: [{"role": ..., "parts": [text]}], cũ -> mới.
+    """
+    kept, used = [], 0
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = estimate_tokens(history[i]["parts"][0])
+        if used + cost > max_tokens:
+            break
+        kept.append(history[i])
+        used += cost
+        cut = i
+    kept.reverse()
+
+    older = history[:cut]
+    if not older:
+        return kept, used
+
+    questions = [m["parts"][0][:SUMMARY_ITEM_CHARS] for m in older if m["role"] == "user"]
+    summary = "Tóm tắt các lượt trước, sinh viên đã hỏi: " + "; ".join(questions) if questions else ""
+    # Gemini yêu cầu lịch sử xen kẽ user/model: lượt tóm tắt là user, nên cần thêm lượt model
+    # ngắn trừ khi lượt giữ lại đầu tiên đã là model. Phần đó cũng tính vào ngân sách.
+    summary_turns = [{"role": "user", "parts": [summary]}]
+    if not kept or kept[0]["role"] == "user":
+        summary_turns.append({"role": "model", "parts": [SUMMARY_ACK]})
+    remaining = max_tokens - used - sum(estimate_tokens(m["parts"][0]) for m in summary_turns[1:])
+    # Cắt theo ký tự; nếu ngân sách còn quá ít thì bỏ hẳn phần tóm tắt
+    remaining_chars = int(max(0, remaining) * CHARS_PER_TOKEN)
+    summary = summary[:remaining_chars] if remaining_chars >= SUMMARY_ITEM_CHARS else ""
+    if summary:
+        summary_turns[0]["parts"] = [summary]
+        kept = summary_turns + kept
+        used += sum(estimate_tokens(m["parts"][0]) for m in summary_turns)
+    return kept, used
+
+def assemble_prompt(build_instruction, context_text, history, budget):
+    """
+    Ghép prompt trong giới hạn `budget` token.
+    build_instruction(context_text) -> prompt hoàn chỉnh (có câu hỏi).
+    Ngữ cảnh bị cắt nếu vượt CONTEXT_SHARE ngân sách; lịch sử dùng phần còn lại.
+    Trả về (prompt, history, số token ước tính).
+    """
+    context_text = trim_to_tokens(context_text, int(budget * CONTEXT_SHARE))
+    prompt = build_instruction(context_text)
+    prompt_tokens = estimate_tokens(prompt)
+    history, history_tokens = fit_history(history, max(0, budget - prompt_tokens))
+    return prompt, history, prompt_tokens + history_tokens
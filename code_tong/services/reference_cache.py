@@ -0,0 +1,136 @@
+import threading
+
+from services.cache import TTLCache
+
+_MISSING = object()
+
+
+class ReferenceCache:
+    """
+    Cache đọc-xuyên (read-through) cho dữ liệu tham chiếu ít thay đổi:
+    - MonHoc.DiemKho theo MonHocID.
+    - Sự tồn tại của SinhVienID (chỉ nhớ kết quả "có", vì app không xóa SinhVien).
+
+    Vô hiệu hóa theo version: mỗi lần ghi (note_*/invalidate) tăng version. Một lượt đọc
+    DB bắt đầu trước đó sẽ không được ghi vào cache, tránh giá trị cũ đè lên giá trị mới.
+    ttl giới hạn độ cũ khi bảng bị sửa từ bên ngoài app (hoặc từ worker khác).
+    """
+
+    def __init__(self, max_size=10000, ttl=600):
+        self._subjects = TTLCache(max_size=max_size, ttl=ttl)
+        self._students = TTLCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.db_reads = 0
+
+    # --- version ---
+    def _bump(self):
+        with self._lock:
+            self.version += 1
+
+    def _fill(self, cache, key, value, version):
+        with self._lock:
+            if version == self.version:
+                cache.set(key, value)
+
+    # --- MonHoc ---
+    def get_diem_kho(self, cursor, mh_id):
+        """DiemKho của môn học, None nếu môn chưa tồn tại."""
+        value = self._subjects.get(mh_id, _MISSING)
+        if value is not _MISSING:
+            return value
+        version = self.version
+        cursor.execute("SELECT DiemKho FROM MonHoc WHERE MonHocID = ?", mh_id)
+        row = cursor.fetchone()
+        self.db_reads += 1
+        if not row:
+            return None
+        diem_kho = float(row[0]) if row[0] is not None else 3.0
+        self._fill(self._subjects, mh_id, diem_kho, version)
+        return diem_kho
+
+    def note_subject(self, mh_id, diem_kho):
+        """Gọi sau khi đã commit MonHoc mới/sửa DiemKho."""
+        self._bump()
+        self._subjects.set(mh_id, float(diem_kho))
+
+    # --- SinhVien ---
+    def student_exists(self, cursor, sv_id):
+        if self._students.get(sv_id, False):
+            return True
+        version = self.version
+        cursor.execute("SELECT SinhVienID FROM SinhVien WHERE SinhVienID = ?", sv_id)
+        exists = cursor.fetchone() is not None
+        self.db_reads += 1
+        if exists:
+            self._fill(self._students, sv_id, True, version)
+        return exists
+
+    def note_student(self, sv_id):
+        """Gọi sau khi đã commit SinhVien mới."""
+        self._bump()
+        self._students.set(sv_id, True)
+
+    # --- tra hàng loạt (dùng cho nhập deadline hàng loạt) ---
+    def cached_subjects(self, mh_ids):
+        """Trả về {MonHocID: DiemKho} cho các môn đang có trong cache."""
+        found = {}
+        for mh_id in mh_ids:
+            value = self._subjects.get(mh_id, _MISSING)
+            if value is not _MISSING:
+                found[mh_id] = value
+        return found
+
+    def cached_students(self, sv_ids):
+        return {sv_id for sv_id in sv_ids if self._students.get(sv_id, False)}
+
+    def fill_many(self, version, students=(), subjects=None):
+        """Ghi kết quả một lượt tra hàng loạt đã bắt đầu ở `version`."""
+        with self._lock:
+            if version != self.version:
+                return
+            for sv_id in students:
+                self._students.set(sv_id, True)
+            for mh_id, diem_kho in (subjects or {}).items():
+                self._subjects.set(mh_id, diem_kho)
+
+    # --- quản lý ---
+    def warm(self, connection_factory):
+        """Nạp toàn bộ bảng MonHoc vào cache (gọi lúc khởi động worker)."""
+        conn = None
+        try:
+            version = self.version
+            conn = connection_factory()
+            cursor = conn.cursor()
+            cursor.execute("SELECT MonHocID, DiemKho FROM MonHoc")
+            subjects = {
+                row[0]: float(row[1]) if row[1] is not None else 3.0
+                for row in cursor.fetchall()
+            }
+            self.fill_many(version, subjects=subjects)
+            return len(subjects)
+        except Exception as e:
+            print(f"⚠️ Lỗi nạp trước MonHoc: {e}")
+            return 0
+        finally:
+            if conn: conn.close()
+
+    def invalidate(self, mh_id=None, sv_id=None):
+        """Bỏ một môn/sinh viên; không truyền gì = xóa toàn bộ."""
+        self._bump()
+        if mh_id is None and sv_id is None:
+            self._subjects.clear()
+            self._students.clear()
+            return
+        if mh_id is not None:
+            self._subjects.invalidate(mh_id)
+        if sv_id is not None:
+            self._students.invalidate(sv_id)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "db_reads": self.db_reads,
+            "subjects": self._subjects.stats(),
+            "students": self._students.stats(),
+        }
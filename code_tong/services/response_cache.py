@@ -0,0 +1,146 @@
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# ======================================================
+# CACHE CÂU TRẢ LỜI CHAT THEO NGỮ NGHĨA GẦN ĐÚNG
+# ======================================================
+# Khóa = câu hỏi đã chuẩn hóa + dấu vân tay (hash) của ngữ cảnh lịch trình.
+# Câu hỏi gần giống (độ tương đồng trigram ký tự >= ngưỡng) trên cùng ngữ cảnh
+# dùng lại câu trả lời cũ. Ngữ cảnh đổi -> dấu vân tay đổi -> cache cũ tự mất hiệu lực.
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+# Từ phủ định: "nên" / "không nên" gần như trùng trigram nhưng nghĩa ngược nhau
+NEGATION_WORDS = frozenset({"không", "ko", "k", "chẳng", "chả", "chưa", "đừng", "chớ", "not", "no", "never", "dont"})
+
+
+def normalize_question(text):
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def context_fingerprint(context_text):
+    return hashlib.sha1((context_text or "").encode("utf-8")).hexdigest()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def critical_tokens(text):
+    """
+    Các từ phải khớp tuyệt đối thì mới được coi là câu gần giống:
+    từ có chữ số (mã môn MH1/MH2, ngày, số tuần...) và từ phủ định.
+    """
+    return frozenset(t for t in text.split() if t in NEGATION_WORDS or any(c.isdigit() for c in t))
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """
+    Cache câu trả lời theo sinh viên:
+    - Khớp chính xác câu hỏi đã chuẩn hóa: tra dict O(1).
+    - Không khớp chính xác (chỉ khi bật, similarity < 1): so độ tương đồng trigram với các
+      câu đã lưu của cùng sinh viên (tối đa max_per_student câu), lấy câu giống nhất >= similarity
+      và có cùng tập critical_tokens (mã môn, số, từ phủ định).
+    - Mặc định similarity = 1: chỉ khớp chính xác.
+    """
+
+    def __init__(self, ttl=600, similarity=1.0, max_students=5000, max_per_student=50):
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_students = max_students
+        self.max_per_student = max_per_student
+        # sv_id -> {"fp": dấu vân tay ngữ cảnh, "entries": OrderedDict(câu hỏi -> (reply, hết hạn, trigram))}
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _bucket(self, sv_id, fp, create=False):
+        bucket = self._buckets.get(sv_id)
+        if bucket is not None and bucket["fp"] != fp:
+            # Lịch trình đã đổi, câu trả lời cũ không còn đúng
+            bucket = None
+            del self._buckets[sv_id]
+        if bucket is None and create:
+            bucket = self._buckets[sv_id] = {"fp": fp, "entries": OrderedDict()}
+            while len(self._buckets) > self.max_students:
+                self._buckets.popitem(last=False)
+        if bucket is not None:
+            self._buckets.move_to_end(sv_id)
+        return bucket
+
+    def lookup(self, sv_id, question, context_text):
+        key = normalize_question(question)
+        fp = context_fingerprint(context_text)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(sv_id, fp)
+            if bucket is None:
+                self.misses += 1
+                return None
+            entries = bucket["entries"]
+            # Bỏ các câu đã hết hạn
+            for k in [k for k, (_, exp, _, _) in entries.items() if exp <= now]:
+                del entries[k]
+
+            item = entries.get(key)
+            if item is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+
+            if self.similarity < 1:
+                grams = _trigrams(key)
+                critical = critical_tokens(key)
+                best, best_score = None, self.similarity
+                for k, (reply, _, other, other_critical) in entries.items():
+                    if other_critical != critical:
+                        continue
+                    score = _jaccard(grams, other)
+                    if score >= best_score:
+                        best, best_score = reply, score
+                if best is not None:
+                    self.near_hits += 1
+                    return best
+
+            self.misses += 1
+            return None
+
+    def store(self, sv_id, question, context_text, reply):
+        key = normalize_question(question)
+        if not key or not reply:
+            return
+        fp = context_fingerprint(context_text)
+        with self._lock:
+            entries = self._bucket(sv_id, fp, create=True)["entries"]
+            entries[key] = (reply, time.monotonic() + self.ttl, _trigrams(key), critical_tokens(key))
+            entries.move_to_end(key)
+            while len(entries) > self.max_per_student:
+                entries.popitem(last=False)
+
+    def invalidate(self, sv_id):
+        with self._lock:
+            self._buckets.pop(sv_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "students": len(self._buckets),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,160 @@
+import time
+import queue
+import threading
+from collections import deque
+
+
+class TooManySubscribersError(Exception):
+    """Đã đủ số kết nối SSE cho phép trong tiến trình, từ chối ngay thay vì giữ worker."""
+
+
+class _Channel:
+    """Kênh của một sinh viên: các subscriber + lịch sử ngắn để phát bù khi kết nối lại."""
+    __slots__ = ("subscribers", "history", "floor", "idle_since")
+
+    def __init__(self, floor):
+        self.subscribers = set()
+        self.history = deque()          # (seq, event)
+        self.floor = floor              # mọi sự kiện có seq > floor đều còn trong history
+        self.idle_since = None
+
+
+class Subscription:
+    def __init__(self, bus, sv_id, queue_size):
+        self.bus = bus
+        self.sv_id = sv_id
+        self.backlog = []               # [(seq, event)] phát bù theo Last-Event-ID
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._overflowed = False
+
+    def _offer(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Client đọc quá chậm: bỏ hàng đợi, báo client tải lại toàn bộ
+            self._overflowed = True
+            return False
+        return True
+
+    def get(self, timeout=None):
+        """Trả về (seq, event), hoặc None nếu hết thời gian chờ."""
+        if self._overflowed:
+            self._overflowed = False
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            return None, {"type": "resync", "SinhVienID": self.sv_id}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus._unsubscribe(self)
+
+
+class ScheduleEventBus:
+    """
+    Pub/sub trong tiến trình theo SinhVienID cho kênh SSE thay đổi lịch trình.
+    - Chỉ sinh viên đang có người nghe mới có kênh: publish cho sinh viên khác là no-op O(1)
+      (nhập hàng loạt / làm mới điểm hàng nghìn dòng không tốn gì thêm).
+    - Sự kiện được đánh số tăng dần (dùng làm id SSE). Client kết nối lại với Last-Event-ID
+      nhận bù từ lịch sử của kênh; nếu không đủ lịch sử thì nhận 'resync'.
+    - Kênh không còn subscriber được giữ thêm `history_ttl` giây rồi bỏ.
+    Lưu ý: chỉ phát trong một tiến trình, mỗi worker gunicorn có bus riêng.
+    """
+
+    def __init__(self, history_size=100, history_ttl=300, queue_size=256, max_subscribers=100):
+        self.history_size = history_size
+        self.history_ttl = history_ttl
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._lock = threading.Lock()
+        # Bắt đầu từ thời gian (µs) để id sau khi khởi động lại vẫn lớn hơn id cũ của client
+        self._seq = time.time_ns() // 1000
+        self._subscribers = 0
+        self._last_prune = time.monotonic()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, sv_id, last_event_id=None):
+        """
+        Đăng ký nhận sự kiện của sinh viên. last_event_id: id SSE cuối client đã nhận;
+        sub.backlog chứa các sự kiện phát bù, hoặc một 'resync' nếu không phát bù được.
+        """
+        try:
+            last_event_id = int(last_event_id) if last_event_id not in (None, '') else None
+        except ValueError:
+            last_event_id = None
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribersError(f"Đã có {self._subscribers} kết nối theo dõi lịch trình")
+            self._prune_locked()
+            channel = self._channels.get(sv_id)
+            if channel is None:
+                channel = self._channels[sv_id] = _Channel(self._seq)
+            sub = Subscription(self, sv_id, self.queue_size)
+            if last_event_id is not None:
+                if channel.floor <= last_event_id <= self._seq:
+                    sub.backlog = [item for item in channel.history if item[0] > last_event_id]
+                else:
+                    sub.backlog = [(None, {"type": "resync", "SinhVienID": sv_id})]
+            channel.subscribers.add(sub)
+            channel.idle_since = None
+            self._subscribers += 1
+            return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            channel = self._channels.get(sub.sv_id)
+            if channel is None or sub not in channel.subscribers:
+                return
+            channel.subscribers.discard(sub)
+            self._subscribers -= 1
+            if not channel.subscribers:
+                channel.idle_since = time.monotonic()
+
+    def _prune_locked(self):
+        now = time.monotonic()
+        if now - self._last_prune < 30:
+            return
+        self._last_prune = now
+        for sv_id in [sv for sv, ch in self._channels.items()
+                      if ch.idle_since is not None and now - ch.idle_since > self.history_ttl]:
+            del self._channels[sv_id]
+
+    def publish(self, sv_id, event_type, **fields):
+        """Phát một sự kiện cho sinh viên; trả về seq, hoặc None nếu không ai nghe."""
+        with self._lock:
+            channel = self._channels.get(sv_id)
+            if channel is None:
+                return None
+            self._seq += 1
+            seq = self._seq
+            event = {"type": event_type, "SinhVienID": sv_id, **fields}
+            channel.history.append((seq, event))
+            if len(channel.history) > self.history_size:
+                channel.floor = channel.history.popleft()[0]
+            subscribers = list(channel.subscribers)
+            self.published += 1
+        dropped = sum(1 for sub in subscribers if not sub._offer((seq, event)))
+        if dropped:
+            with self._lock:
+                self.dropped += dropped
+        return seq
+
+    def watched(self, sv_id):
+        """Sinh viên có kênh (đang/vừa có người nghe) không -> bỏ qua việc dựng payload nếu không."""
+        return sv_id in self._channels
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": self._subscribers,
+                "channels": len(self._channels),
+                "published": self.published,
+                "dropped": self.dropped,
+            }
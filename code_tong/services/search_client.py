@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import random
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.cache import TTLCache, SingleFlight
+from services.metrics import timed, UPSTREAM_ERRORS
+
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+RESULTS_PER_PAGE = 10
+MAX_PAGES = 3   # Custom Search: start=1, 11, 21
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def normalize_query(query):
+    """Chuẩn hóa câu truy vấn làm khóa cache: NFC, chữ thường, gộp khoảng trắng."""
+    query = unicodedata.normalize('NFC', query or '')
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+class GoogleSearchClient:
+    """
+    Client gọi Google Custom Search. `endpoint` có thể trỏ tới server tìm kiếm
+    giả lập (biến môi trường SEARCH_ENDPOINT) để chạy thử không cần mạng.
+    - Dùng chung một requests.Session (keep-alive), tối đa `max_connections`
+      kết nối tới mỗi host.
+    - Thử lại với backoff ngẫu nhiên (full jitter) khi gặp 429/5xx hoặc lỗi mạng;
+      mỗi lần chờ tối đa `max_backoff` giây, Retry-After dài hơn thì báo lỗi ngay.
+    - search_pages / search_many tải song song nhiều trang / nhiều truy vấn,
+      số luồng tối đa `max_workers`.
+    """
+
+    def __init__(self, api_key, cx, endpoint=None, timeout=5,
+                 max_connections=10, max_workers=4, retries=3, backoff=0.5, max_backoff=5.0):
+        self.api_key = api_key
+        self.cx = cx
+        self.endpoint = endpoint or os.getenv("SEARCH_ENDPOINT", GOOGLE_SEARCH_URL)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._lock = threading.Lock()
+        self.retried = 0
+        self.errors = 0
+
+    def _sleep_before_retry(self, attempt, resp=None):
+        """
+        Chờ trước lần thử lại; trả về False (không chờ) nếu server đòi chờ lâu hơn max_backoff:
+        giữ luồng request (và mọi luồng SingleFlight đang chờ nó) cả giờ còn tệ hơn báo lỗi.
+        """
+        retry_after = resp.headers.get('Retry-After') if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+            if delay > self.max_backoff:
+                return False
+        else:
+            delay = min(random.uniform(0, self.backoff * (2 ** attempt)), self.max_backoff)
+        with self._lock:
+            self.retried += 1
+        time.sleep(delay)
+        return True
+
+    def _get(self, params):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                with timed('search_request'):
+                    resp = self.session.get(self.endpoint, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    with self._lock:
+                        self.errors += 1
+                    UPSTREAM_ERRORS.inc(service='search')
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+            if resp.status_code in RETRY_STATUS and not last and self._sleep_before_retry(attempt, resp):
+                continue
+            if resp.status_code >= 400:
+                with self._lock:
+                    self.errors += 1
+                UPSTREAM_ERRORS.inc(service='search')
+            resp.raise_for_status()
+            return resp.json()
+
+    def search(self, query, start=1):
+        params = {'q': query, 'key': self.api_key, 'cx': self.cx}
+        if start > 1:
+            params['start'] = start
+        return self._get(params).get('items', []) or []
+
+    def search_pages(self, query, pages=1):
+        """Tải song song `pages` trang kết quả đầu tiên và nối theo thứ tự trang."""
+        pages = max(1, min(int(pages), MAX_PAGES))
+        if pages == 1:
+            return self.search(query)
+        starts = [1 + i * RESULTS_PER_PAGE for i in range(pages)]
+        futures = [self._executor.submit(self.search, query, start) for start in starts]
+        items = []
+        for f in futures:
+            items.extend(f.result())
+        return items
+
+    def search_many(self, queries, pages=1):
+        """Tải song song nhiều truy vấn, trả về {query: items}."""
+        pages = max(1, min(int(pages), MAX_PAGES))
+        # Trải phẳng thành từng (truy vấn, trang) để không có tác vụ nào chờ tác vụ khác trong pool
+        futures = [(q, self._executor.submit(self.search, q, 1 + i * RESULTS_PER_PAGE))
+                   for q in queries for i in range(pages)]
+        results = {q: [] for q in queries}
+        for q, f in futures:
+            results[q].extend(f.result())
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class CachedSearch:
+    """
+    Bọc một client tìm kiếm bất kỳ (có hàm search(query) -> list,
+    và search_pages(query, pages) nếu cần nhiều trang):
+    - Cache kết quả theo câu truy vấn đã chuẩn hóa (TTL + giới hạn kích thước).
+    - Các truy vấn giống nhau đến cùng lúc chỉ gọi upstream một lần.
+    Lỗi upstream không được cache.
+    """
+
+    def __init__(self, client, max_size=500, ttl=3600):
+        self.client = client
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._flight = SingleFlight()
+        self.upstream_calls = 0
+
+    def _fetch(self, query, pages):
+        self.upstream_calls += 1
+        if pages > 1:
+            items = self.client.search_pages(query, pages)
+        else:
+            items = self.client.search(query)
+        self.cache.set((query, pages), items)
+        return items
+
+    def search(self, query, pages=1):
+        query = normalize_query(query)
+        pages = max(1, min(int(pages or 1), MAX_PAGES))
+        key = (query, pages)
+        items = self.cache.get(key)
+        if items is not None:
+            return items
+        return self._flight.do(key, lambda: self._fetch(query, pages))
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["upstream_calls"] = self.upstream_calls
+        stats["coalesced"] = self._flight.shared
+        return stats
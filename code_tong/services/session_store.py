@@ -0,0 +1,150 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ======================================================
+# LƯU PHIÊN CHAT PHÍA SERVER
+# ======================================================
+# Client chỉ gửi session_id + tin nhắn mới; lịch sử nằm ở server.
+# Lịch sử lưu dạng [{"role": "user"|"model", "content": "..."}], cũ -> mới.
+
+MAX_TURNS_PER_SESSION = 100
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+class MemorySessionStore:
+    """Lưu trong bộ nhớ: giới hạn số phiên (LRU) và xóa phiên nhàn rỗi quá idle_ttl giây."""
+
+    def __init__(self, max_sessions=10000, idle_ttl=3600, max_turns=MAX_TURNS_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()   # session_id -> (history, last_used)
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return []
+            history, last_used = item
+            if time.monotonic() - last_used > self.idle_ttl:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def append(self, session_id, messages):
+        with self._lock:
+            history, _ = self._sessions.get(session_id, ([], 0))
+            history = (history + list(messages))[-self.max_turns:]
+            self._sessions[session_id] = (history, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, (_, t) in self._sessions.items() if now - t > self.idle_ttl]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    Lưu trên đĩa bằng SQLite (sống qua khởi động lại, dùng chung giữa các worker
+    trên cùng máy). Cùng giao diện với MemorySessionStore.
+    """
+
+    def __init__(self, path="chat_sessions.db", max_sessions=100000, idle_ttl=3600,
+                 max_turns=MAX_TURNS_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ChatSession (
+                SessionID TEXT PRIMARY KEY,
+                History TEXT NOT NULL,
+                LastUsed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS IX_ChatSession_LastUsed ON ChatSession(LastUsed)")
+        self._writes = 0
+
+    def get_history(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT History, LastUsed FROM ChatSession WHERE SessionID = ?", (session_id,)).fetchone()
+            if row is None:
+                return []
+            if time.time() - row[1] > self.idle_ttl:
+                self._conn.execute("DELETE FROM ChatSession WHERE SessionID = ?", (session_id,))
+                return []
+            self._conn.execute("UPDATE ChatSession SET LastUsed = ? WHERE SessionID = ?", (time.time(), session_id))
+            return json.loads(row[0])
+
+    def append(self, session_id, messages):
+        with self._lock:
+            # BEGIN IMMEDIATE: đọc-sửa-ghi nguyên tử kể cả khi nhiều worker dùng chung file
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT History FROM ChatSession WHERE SessionID = ?", (session_id,)).fetchone()
+                history = (json.loads(row[0]) if row else []) + list(messages)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ChatSession (SessionID, History, LastUsed) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(history[-self.max_turns:], ensure_ascii=False), time.time()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Dọn dẹp định kỳ thay vì mỗi lần ghi
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM ChatSession WHERE LastUsed < ?", (time.time() - self.idle_ttl,))
+        self._conn.execute("""
+            DELETE FROM ChatSession WHERE SessionID IN (
+                SELECT SessionID FROM ChatSession ORDER BY LastUsed DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_sessions,))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM ChatSession WHERE SessionID = ?", (session_id,))
+
+    def purge_expired(self):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM ChatSession WHERE LastUsed < ?", (time.time() - self.idle_ttl,))
+            return cur.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ChatSession").fetchone()[0]
+
+
+def create_session_store(backend="memory", **kwargs):
+    if backend == "sqlite":
+        return SQLiteSessionStore(**kwargs)
+    kwargs.pop("path", None)
+    return MemorySessionStore(**kwargs)
@@ -0,0 +1,95 @@
+import pytest
+
+from database.backends import SQLiteBackend, bootstrap_schema
+from services import bulk_import
+from services.bulk_import import IN_CHUNK_SIZE, validate_rows, import_deadlines, _select_in
+
+NOW = "2026-10-18 08:00:00"
+
+
+def _row(sv="SV1", mh="MH1", deadline="2026-10-25 23:59:00", **extra):
+    return {"SinhVienID": sv, "MonHocID": mh, "TieuDe": "Bài tập", "ThoiGianKetThuc": deadline, **extra}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    backend = SQLiteBackend(path=str(tmp_path / "bulk.db"))
+    conn = backend.connect()
+    bootstrap_schema(backend, conn)
+    yield conn
+    conn.close()
+
+
+def _count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_validate_rows_reports_each_error_with_line_number():
+    rows = [
+        _row(),
+        "không phải object",
+        _row(sv=""),
+        _row(MucDoQuanTrong="cao"),
+        _row(deadline="25/10/2026"),
+        _row(deadline="2026-10-25T23:59"),
+    ]
+    valid, errors = validate_rows(rows)
+    assert [line for line, _ in errors] == [2, 3, 4, 5]
+    assert "SinhVienID" in errors[1][1]
+    assert [r["_line"] for r in valid] == [1, 6]
+    assert valid[1]["ThoiGianKetThuc"] == "2026-10-25 23:59:00"
+    assert valid[0]["MucDoQuanTrong"] == 3
+
+
+class _RecordingCursor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, sql, params):
+        self.calls.append(len(params))
+
+    def fetchall(self):
+        return []
+
+
+@pytest.mark.parametrize("n, sizes", [
+    (0, []),
+    (IN_CHUNK_SIZE, [IN_CHUNK_SIZE]),
+    (IN_CHUNK_SIZE + 1, [IN_CHUNK_SIZE, 1]),
+    (2 * IN_CHUNK_SIZE, [IN_CHUNK_SIZE, IN_CHUNK_SIZE]),
+])
+def test_select_in_chunks_at_boundary(n, sizes):
+    cursor = _RecordingCursor()
+    _select_in(cursor, "SELECT SinhVienID FROM SinhVien WHERE SinhVienID", [f"SV{i}" for i in range(n)])
+    assert cursor.calls == sizes
+
+
+def test_lookup_finds_existing_rows_across_chunks(conn):
+    n = IN_CHUNK_SIZE + 1
+    conn.executemany("INSERT INTO SinhVien (SinhVienID, HoTen) VALUES (?, ?)", [(f"SV{i}", "x") for i in range(n)])
+    conn.execute("INSERT INTO MonHoc (MonHocID, TenMonHoc, DiemKho) VALUES ('MH1', 'x', 4.0)")
+    conn.commit()
+    summary = import_deadlines(conn, [_row(sv=f"SV{i}") for i in range(n)], now=NOW)
+    assert summary["inserted"] == n
+    assert summary["new_students"] == 0 and summary["new_subjects"] == 0
+    assert _count(conn, "SinhVien") == n and _count(conn, "LichTrinh") == n
+
+
+def test_import_creates_missing_references(conn):
+    summary = import_deadlines(conn, [_row(), _row(sv="SV2", mh="MH2"), _row(deadline="sai")], now=NOW)
+    assert summary["inserted"] == 2
+    assert (summary["new_students"], summary["new_subjects"]) == (2, 2)
+    assert summary["SinhVienIDs"] == ["SV1", "SV2"]
+    assert [line for line, _ in summary["errors"]] == [3]
+    assert _count(conn, "LichTrinh") == 2
+
+
+def test_mid_batch_failure_rolls_back_everything(conn, monkeypatch):
+    # ID trùng -> lỗi khóa chính ở dòng thứ hai của executemany LichTrinh,
+    # sau khi SinhVien/MonHoc mới đã được chèn trong cùng transaction
+    monkeypatch.setattr(bulk_import, "new_lich_trinh_id", lambda prefix="LT": "LTTRUNG")
+    with pytest.raises(Exception):
+        import_deadlines(conn, [_row(), _row(sv="SV2", mh="MH2")], now=NOW)
+    assert _count(conn, "LichTrinh") == 0
+    assert _count(conn, "SinhVien") == 0
+    assert _count(conn, "MonHoc") == 0
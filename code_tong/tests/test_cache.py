@@ -0,0 +1,31 @@
+from services.cache import TTLCache
+
+
+def test_set_skipped_when_invalidated_during_read():
+    cache = TTLCache(max_size=10, ttl=60)
+    generation = cache.generation("SV1")      # bắt đầu đọc DB
+    cache.invalidate("SV1")                   # lệnh ghi commit + xóa cache giữa chừng
+    assert cache.set("SV1", "cũ", generation=generation) is False
+    assert cache.get("SV1") is None
+
+    generation = cache.generation("SV1")
+    assert cache.set("SV1", "mới", generation=generation) is True
+    assert cache.get("SV1") == "mới"
+
+
+def test_generation_is_per_key_and_reset_by_clear():
+    cache = TTLCache(max_size=10, ttl=60)
+    generation = cache.generation("SV1")
+    cache.invalidate("SV2")
+    assert cache.set("SV1", "x", generation=generation) is True
+
+    generation = cache.generation("SV1")
+    cache.clear()
+    assert cache.set("SV1", "y", generation=generation) is False
+
+
+def test_set_without_generation_always_writes():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.invalidate("k")
+    assert cache.set("k", 1) is True
+    assert cache.get("k") == 1
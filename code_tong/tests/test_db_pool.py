@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from database.db_connector import ConnectionPool, PoolTimeoutError
+
+
+class FakeRaw:
+    """Kết nối giả: đếm rollback/close, có thể giả lập kết nối chết."""
+
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+        self.broken = False
+
+    def rollback(self):
+        if self.broken:
+            raise RuntimeError("kết nối đã chết")
+        self.rollbacks += 1
+
+    def cursor(self):
+        if self.broken:
+            raise RuntimeError("kết nối đã chết")
+        return self
+
+    def execute(self, sql, *params):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        raw = FakeRaw()
+        created.append(raw)
+        return raw
+
+    return ConnectionPool(factory, **kwargs), created
+
+
+def test_checkout_and_return_reuses_connection():
+    pool, created = make_pool(max_size=2, timeout=0.1)
+    conn = pool.acquire()
+    assert pool.stats()["in_use"] == 1
+    conn.close()
+    conn.close()                  # đóng hai lần không trả về pool hai lần
+    assert pool.stats()["idle"] == 1 and pool.stats()["in_use"] == 0
+    assert created[0].rollbacks == 1
+
+    with pool.acquire() as again:
+        assert again._raw is created[0]
+    assert len(created) == 1
+    with pytest.raises(RuntimeError):
+        conn.cursor()             # đối tượng cũ không dùng được sau khi trả
+
+
+def test_timeout_when_exhausted_and_wakeup_on_release():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    conn.close()
+    waiter.join(2)
+    assert got and pool.stats()["in_use"] == 1
+
+
+def test_connection_failing_rollback_is_discarded():
+    pool, created = make_pool(max_size=1, timeout=0.1)
+    conn = pool.acquire()
+    created[0].broken = True
+    conn.close()
+    stats = pool.stats()
+    assert created[0].closed
+    assert stats["size"] == 0 and stats["idle"] == 0 and stats["in_use"] == 0
+    with pool.acquire() as fresh:
+        assert fresh._raw is created[1]
+
+
+def test_dead_idle_connection_is_replaced():
+    pool, created = make_pool(max_size=1, timeout=0.1, check_after=0)
+    pool.acquire().close()
+    created[0].broken = True      # chết trong lúc nằm trong pool
+    with pool.acquire() as conn:
+        assert conn._raw is created[1]
+    assert created[0].closed and pool.stats()["size"] == 1
+
+
+def test_factory_error_does_not_leak_slot():
+    def factory():
+        raise RuntimeError("không kết nối được")
+
+    pool = ConnectionPool(factory, max_size=1, timeout=0.05)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+    assert pool.stats()["size"] == 0 and pool.stats()["in_use"] == 0
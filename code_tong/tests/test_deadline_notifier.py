@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.deadline_notifier import DeadlineNotifier
+
+FMT = '%Y-%m-%d %H:%M:%S'
+
+
+class FakeDB:
+    """LichTrinh giả cho LOAD_SQL (keyset) và truy vấn kiểm tra dòng còn tồn tại."""
+
+    def __init__(self, rows):
+        self.rows = rows          # [(LichTrinhID, SinhVienID, TieuDe, ThoiGianKetThuc)]
+
+    def __call__(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, *params):
+        if "IN (" in sql:
+            ids = set(params[0])
+            self._result = [(r[0],) for r in self.rows if r[0] in ids]
+            return
+        last_time, _, last_id, upper, limit = params
+        matched = sorted((r for r in self.rows
+                          if (r[3] > last_time or (r[3] == last_time and r[0] > last_id)) and r[3] <= upper),
+                         key=lambda r: (r[3], r[0]))
+        self._result = matched[:limit]
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+def run(notifier, start, minutes, refresh_every=10):
+    fired = []
+    notifier.refresh(now=start)
+    for m in range(1, minutes + 1):
+        now = start + timedelta(minutes=m)
+        if m % refresh_every == 0:
+            notifier.refresh(now=now)
+        fired.extend(e["id"] for e in notifier.advance(now=now))
+    return fired
+
+
+@pytest.fixture
+def start():
+    # TimerWheel lấy mốc từ đồng hồ thật: các mốc thử phải nằm sau thời điểm hiện tại
+    return datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_each_mark_fires_once(tmp_path, start, shared):
+    deadline = (start + timedelta(minutes=95)).strftime(FMT)
+    db = FakeDB([("LT1", "SV001", "Bài tập", deadline)])
+    notifier = DeadlineNotifier(lead_minutes=(60, 0), connection_factory=db,
+                                lock_path=str(tmp_path / "lock") if shared else None)
+    assert run(notifier, start, 180) == ["LT1:60", "LT1:0"]
+
+
+def test_shared_mode_sees_rows_from_other_workers_and_skips_deleted(tmp_path, start):
+    db = FakeDB([("LT1", "SV001", "A", (start + timedelta(minutes=30)).strftime(FMT))])
+    notifier = DeadlineNotifier(lead_minutes=(0,), connection_factory=db, lock_path=str(tmp_path / "lock"))
+    notifier.refresh(now=start)
+    # Worker khác tạo LT2 và xóa LT1 sau lần refresh đầu
+    db.rows = [("LT2", "SV001", "B", (start + timedelta(minutes=40)).strftime(FMT))]
+    assert run(notifier, start, 120) == ["LT2:0"]
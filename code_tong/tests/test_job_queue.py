@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from services.job_queue import (
+    JobQueue, SQLiteJobStore, UnknownJobTypeError, QUEUED, RUNNING, DONE, FAILED,
+)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def count_jobs(store):
+    return store._conn.execute("SELECT COUNT(*) FROM Job").fetchone()[0]
+
+
+def test_finished_jobs_are_purged_from_store(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    queue = JobQueue(workers=1, store=store, retention=0, purge_interval=0)
+    queue.register("echo", lambda payload: payload)
+    job_id = queue.enqueue("echo", {"x": 1})
+    assert wait_for(lambda: queue.get(job_id)["status"] == DONE)
+    # Sau việc kế tiếp, việc đã xong đầu tiên bị dọn khỏi store
+    queue.enqueue("echo", {"x": 2})
+    assert wait_for(lambda: store.get(job_id) is None)
+    queue.drain()
+    store.close()
+
+
+def test_purge_on_start_keeps_recent_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    queue = JobQueue(workers=1, store=store)
+    queue.register("echo", lambda payload: payload)
+    job_id = queue.enqueue("echo")
+    assert wait_for(lambda: queue.get(job_id)["status"] == DONE)
+    queue.drain()
+    store.close()
+
+    store = SQLiteJobStore(path)
+    queue = JobQueue(workers=1, store=store)     # retention mặc định: việc vừa xong còn giữ
+    queue.register("echo", lambda payload: payload)
+    queue.start()
+    assert count_jobs(store) == 1
+    queue.drain()
+    store.close()
+
+    store = SQLiteJobStore(path)
+    queue = JobQueue(workers=1, store=store, retention=0)
+    queue.register("echo", lambda payload: payload)
+    queue.start()
+    assert count_jobs(store) == 0
+    queue.drain()
+    store.close()
+
+
+def test_job_state_transitions():
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def handler(payload):
+        started.set()
+        release.wait(5)
+        return payload["x"] * 2
+
+    queue.register("double", handler)
+    job_id = queue.enqueue("double", {"x": 21})
+    assert started.wait(5)
+    assert queue.get(job_id)["status"] == RUNNING
+    waiting = queue.enqueue("double", {"x": 1})
+    assert queue.get(waiting)["status"] == QUEUED
+    release.set()
+    assert wait_for(lambda: queue.get(waiting)["status"] == DONE)
+    assert queue.get(job_id) == {"job_id": job_id, "type": "double", "status": DONE,
+                                 "attempts": 1, "result": 42, "error": None}
+    assert queue.drain()
+    assert queue.stats()["completed"] == 2
+
+
+def test_failing_job_is_retried_then_failed():
+    queue = JobQueue(workers=1, max_attempts=3, backoff=0.01, max_backoff=0.02)
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise ValueError("hỏng")
+
+    queue.register("flaky", flaky)
+    job_id = queue.enqueue("flaky", "p")
+    assert wait_for(lambda: queue.get(job_id)["status"] == FAILED)
+    job = queue.get(job_id)
+    assert job["attempts"] == 3 and job["error"] == "ValueError: hỏng"
+    assert calls == ["p"] * 3
+    assert queue.stats()["retried"] == 2 and queue.stats()["failed"] == 1
+    queue.drain()
+
+
+def test_job_succeeds_after_retry_and_store_records_it(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    queue = JobQueue(workers=1, store=store, backoff=0.01, max_backoff=0.02)
+    attempts = []
+
+    def once_flaky(payload):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("tạm thời")
+        return "ok"
+
+    queue.register("once", once_flaky)
+    job_id = queue.enqueue("once")
+    assert wait_for(lambda: queue.get(job_id)["status"] == DONE)
+    assert store.get(job_id)["status"] == DONE
+    assert store.get(job_id)["attempts"] == 2 and store.get(job_id)["result"] == "ok"
+    queue.drain()
+    store.close()
+
+
+def test_concurrency_limit_per_type():
+    queue = JobQueue(workers=4)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def handler(_):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    queue.register("limited", handler, concurrency=1)
+    ids = [queue.enqueue("limited") for _ in range(5)]
+    assert wait_for(lambda: all(queue.get(i)["status"] == DONE for i in ids))
+    assert peak[0] == 1
+    queue.drain()
+
+
+def test_unknown_job_type_is_rejected():
+    queue = JobQueue(workers=1)
+    with pytest.raises(UnknownJobTypeError):
+        queue.enqueue("missing")
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from services.llm_backend import LLMRunner, LLMBusyError
+
+
+class _Reply:
+    text = "ok"
+
+
+class _BlockingSession:
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def send_message(self, content, stream=False):
+        self.started.set()
+        self.release.wait(5)
+        return _Reply()
+
+
+def test_sync_call_rejected_when_all_workers_busy():
+    runner = LLMRunner(max_workers=1, max_pending=4, timeout=5)
+    busy = _BlockingSession()
+    t = threading.Thread(target=runner.generate, args=(busy, "a"))
+    t.start()
+    assert busy.started.wait(5)
+    try:
+        with pytest.raises(LLMBusyError):
+            runner.generate(_BlockingSession(), "b", queue=False)
+        assert runner.stats() == {"in_flight": 1, "rejected": 1}
+    finally:
+        busy.release.set()
+        t.join(5)
+    free = _BlockingSession()
+    free.release.set()
+    assert runner.generate(free, "c", queue=False) == "ok"
+
+
+def test_queued_call_waits_for_free_worker():
+    runner = LLMRunner(max_workers=1, max_pending=1, timeout=5)
+    busy = _BlockingSession()
+    t = threading.Thread(target=runner.generate, args=(busy, "a"))
+    t.start()
+    assert busy.started.wait(5)
+    result = {}
+    waiting = _BlockingSession()
+    waiting.release.set()
+    q = threading.Thread(target=lambda: result.setdefault("reply", runner.generate(waiting, "b")))
+    q.start()
+    deadline = time.monotonic() + 5
+    while runner.stats()["in_flight"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Hàng đợi (max_pending=1) đã đầy nên lời gọi thứ ba bị từ chối ngay
+    with pytest.raises(LLMBusyError):
+        runner.generate(_BlockingSession(), "c")
+    busy.release.set()
+    t.join(5)
+    q.join(5)
+    assert result["reply"] == "ok"
+    assert runner.stats()["in_flight"] == 0
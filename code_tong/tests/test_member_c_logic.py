@@ -0,0 +1,57 @@
+import pytest
+
+import member_c_logic
+from database.backends import SQLiteBackend, bootstrap_schema
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(path=str(tmp_path / "test.db"))
+    bootstrap_schema(backend)
+    monkeypatch.setattr(member_c_logic, "get_db_connection", backend.connect)
+    return backend
+
+
+def urls_in_db(backend):
+    conn = backend.connect()
+    try:
+        return sorted(row[0] for row in conn.cursor().execute("SELECT URL FROM TaiLieu").fetchall())
+    finally:
+        conn.close()
+
+
+def item(url, title="t", score=50):
+    return {"TieuDe": title, "URL": url, "DiemTinCay": score}
+
+
+def test_duplicates_in_batch_and_db_are_skipped(backend):
+    assert member_c_logic.save_ranked_materials([item("u1"), item("u2")]) == {"inserted": 2, "skipped": 0}
+    result = member_c_logic.save_ranked_materials(
+        [item("u2"), item("u3"), item("u3", "bản xếp hạng thấp hơn"), item("u4")], limit=None)
+    assert result == {"inserted": 2, "skipped": 2}
+    assert urls_in_db(backend) == ["u1", "u2", "u3", "u4"]
+
+
+def test_concurrent_insert_is_not_counted(backend, monkeypatch):
+    original = member_c_logic._existing_urls
+
+    def existing_then_concurrent_insert(cursor, urls):
+        found = original(cursor, urls)
+        # Request khác chèn u2 ngay sau lần kiểm tra: NOT EXISTS chặn dòng của ta
+        other = backend.connect()
+        other.cursor().execute("INSERT INTO TaiLieu (TieuDe, URL, DiemTinCay) VALUES ('khác', 'u2', 1)")
+        other.commit()
+        other.close()
+        return found
+
+    monkeypatch.setattr(member_c_logic, "_existing_urls", existing_then_concurrent_insert)
+    result = member_c_logic.save_ranked_materials([item("u1"), item("u2")])
+    assert result == {"inserted": 1, "skipped": 1}
+    assert urls_in_db(backend) == ["u1", "u2"]
+
+
+def test_count_spans_in_chunks(backend, monkeypatch):
+    monkeypatch.setattr(member_c_logic, "EXISTS_CHUNK_SIZE", 2)
+    items = [item(f"u{i}") for i in range(5)]
+    assert member_c_logic.save_ranked_materials(items, limit=None) == {"inserted": 5, "skipped": 0}
+    assert member_c_logic.save_ranked_materials(items, limit=None) == {"inserted": 0, "skipped": 5}
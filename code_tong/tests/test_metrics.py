@@ -0,0 +1,65 @@
+import os
+import json
+
+from services.metrics import Registry, MultiProcessMetrics, ARCHIVE_FILE
+
+DEAD_PID = 2 ** 22 + 12345   # lớn hơn pid_max mặc định -> chắc chắn không còn sống
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Số request", ("route",))
+    latency = registry.histogram("latency_seconds", "Độ trễ", (), buckets=(0.1, 1.0))
+    registry.add_collector(lambda: [
+        ("pool_in_use", "gauge", "Kết nối đang dùng", {}, 3),
+        ("cache_hits_total", "counter", "Cache hit", {"cache": "ctx"}, 10),
+    ])
+    return registry, requests, latency
+
+
+def write_dead_worker(path, registry):
+    snapshot = registry.snapshot()
+    snapshot["pid"] = DEAD_PID
+    with open(os.path.join(path, f"metrics-{DEAD_PID}.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+def test_counters_summed_across_processes_gauges_only_live(tmp_path):
+    registry, requests, latency = make_registry()
+    requests.inc(route="/a")
+    requests.inc(route="/a")
+    latency.observe(0.05)
+    write_dead_worker(tmp_path, registry)    # worker cũ đã thoát, cùng số liệu
+
+    requests.inc(route="/b")
+    body = MultiProcessMetrics(registry, str(tmp_path)).render()
+
+    assert 'requests_total{route="/a"} 4' in body
+    assert 'requests_total{route="/b"} 1' in body
+    assert 'latency_seconds_bucket{le="0.1"} 2' in body
+    assert "latency_seconds_count 2" in body
+    assert 'cache_hits_total{cache="ctx"} 20' in body
+    assert "pool_in_use 3" in body            # gauge của worker đã thoát không được cộng
+
+
+def test_dead_worker_files_are_archived_and_stay_monotonic(tmp_path):
+    registry, requests, _ = make_registry()
+    requests.inc(route="/a")
+    write_dead_worker(tmp_path, registry)
+    metrics = MultiProcessMetrics(registry, str(tmp_path))
+
+    first = metrics.render()
+    assert not os.path.exists(tmp_path / f"metrics-{DEAD_PID}.json")
+    assert os.path.exists(tmp_path / ARCHIVE_FILE)
+    second = metrics.render()
+    assert 'requests_total{route="/a"} 2' in first
+    assert 'requests_total{route="/a"} 2' in second
+
+
+def test_single_process_render_unchanged():
+    registry, requests, _ = make_registry()
+    requests.inc(route="/a")
+    body = registry.render()
+    assert "# TYPE requests_total counter" in body
+    assert 'requests_total{route="/a"} 1' in body
+    assert "pool_in_use 3" in body
@@ -0,0 +1,57 @@
+import pytest
+
+from services import model_resolver
+from services.model_resolver import ModelProvider, resolve_model_name
+
+
+@pytest.fixture(autouse=True)
+def no_env_model(monkeypatch):
+    monkeypatch.setattr(model_resolver, "GEMINI_MODEL", None)
+
+
+def test_failed_lookup_is_remembered_for_retry_after(monkeypatch):
+    calls = []
+
+    def failing(api_key):
+        calls.append(api_key)
+        raise ConnectionError("mất mạng")
+
+    monkeypatch.setattr(model_resolver, "resolve_model_name", failing)
+    provider = ModelProvider("key", retry_after=60)
+    assert provider.get() is None
+    assert provider.get() is None
+    assert calls == ["key"]
+    assert provider.name.startswith("Lỗi AI")
+
+    provider.reset()                 # reset (vd. sau fork) thử lại ngay
+    assert provider.get() is None
+    assert len(calls) == 2
+
+
+def test_no_model_found_is_remembered(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_resolver, "resolve_model_name", lambda key: calls.append(key))
+    provider = ModelProvider("key", retry_after=60)
+    provider.get(), provider.get()
+    assert calls == ["key"]
+
+
+def test_retry_after_expiry_tries_again(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_resolver, "resolve_model_name", lambda key: calls.append(key))
+    provider = ModelProvider("key", retry_after=0)
+    provider.get(), provider.get()
+    assert calls == ["key", "key"]
+
+
+def test_resolve_reuses_given_names(tmp_path, monkeypatch):
+    def no_network(api_key):
+        raise AssertionError("không được dò lại qua mạng")
+
+    monkeypatch.setattr(model_resolver, "list_generate_models", no_network)
+    path = str(tmp_path / "cache.json")
+    names = ["models/text-bison", "models/gemini-1.5-flash"]
+    assert resolve_model_name("key", force_refresh=True, path=path, names=names) == "models/gemini-1.5-flash"
+    # Lần sau đọc từ file cache
+    assert resolve_model_name("key", path=path) == "models/gemini-1.5-flash"
+    assert resolve_model_name("other-key", path=path, names=[]) is None
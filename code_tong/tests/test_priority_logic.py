@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from algorithms.priority_logic import calculate_priority_score, calculate_priority_scores_batch, np
+
+pytestmark = pytest.mark.skipif(np is None, reason="cần numpy")
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+MALFORMED = [
+    "2026-10-21T14:40",        # NumPy đọc được, strptime thì không
+    "2030-01-01",
+    "2026-10-21 14:40",
+    "2026-13-01 00:00:00",
+    "2026-10-21 14:40:00Z",
+    " 2026-10-21 14:40:00",
+    "",
+    "abc",
+    None,
+    12345,
+]
+VALID = [
+    "2026-10-18 11:00:00",     # quá hạn
+    "2026-10-18 20:00:00",     # < 24h
+    "2026-10-20 12:00:00",     # 24-72h
+    "2026-11-30 08:30:00",     # >= 72h
+    "2026-1-5 3:4:5",          # strptime chấp nhận số không đệm 0
+    datetime(2026, 10, 19, 6, 0, 0),
+]
+
+
+def scalar_scores(deadlines, importance=3, difficulty=3.0):
+    return [calculate_priority_score(d, importance, difficulty, now=NOW) for d in deadlines]
+
+
+@pytest.mark.parametrize("deadlines", [VALID, MALFORMED, VALID + MALFORMED, MALFORMED[::-1] + VALID])
+def test_batch_matches_scalar(deadlines):
+    n = len(deadlines)
+    scores, mask = calculate_priority_scores_batch(deadlines, [3] * n, [3.0] * n, now=NOW)
+    assert scores.tolist() == scalar_scores(deadlines)
+
+
+def test_error_mask_marks_exactly_malformed_deadlines():
+    deadlines = VALID + MALFORMED
+    n = len(deadlines)
+    _, mask = calculate_priority_scores_batch(deadlines, [3] * n, [3.0] * n, now=NOW)
+    assert mask.tolist() == [False] * len(VALID) + [True] * len(MALFORMED)
+
+
+def test_all_canonical_fast_path():
+    deadlines = ["2026-10-18 20:00:00"] * 5
+    scores, mask = calculate_priority_scores_batch(deadlines, [1, 2, 3, 4, 5], [3.0] * 5, now=NOW)
+    assert not mask.any()
+    assert scores.tolist() == [calculate_priority_score(d, i, 3.0, now=NOW)
+                               for d, i in zip(deadlines, [1, 2, 3, 4, 5])]
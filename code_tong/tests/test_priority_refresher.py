@@ -0,0 +1,89 @@
+import threading
+import time
+
+from services.priority_refresher import PriorityRefresher, SELECT_FULL_SQL, SELECT_WINDOW_SQL
+
+
+class FakeConnection:
+    """Kết nối giả: ghi lại truy vấn và đếm số lần chạy chồng nhau."""
+
+    def __init__(self, probe):
+        self.probe = probe
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, *params):
+        self.probe.enter(sql, params)
+
+    def fetchall(self):
+        time.sleep(0.02)      # giữ "truy vấn" đủ lâu để các luồng khác kịp chen vào
+        self.probe.leave()
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Probe:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.queries = []
+
+    def enter(self, sql, params):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.queries.append((sql, params))
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+def test_run_once_is_serialized_with_background_loop():
+    probe = Probe()
+    refresher = PriorityRefresher(interval=0.001, connection_factory=lambda: FakeConnection(probe))
+    refresher.start()
+    threads = [threading.Thread(target=refresher.run_once) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    refresher.stop()
+
+    assert probe.max_active == 1
+    assert refresher.stats["runs"] == len(probe.queries) >= 8
+    assert refresher.stats["last_error"] is None
+    # Chỉ lần đầu quét toàn bộ; các lần sau dùng cửa sổ tính từ lần chạy trước
+    assert [sql for sql, _ in probe.queries].count(SELECT_FULL_SQL) == 1
+    windows = [params[0] for sql, params in probe.queries if sql == SELECT_WINDOW_SQL]
+    assert windows == sorted(windows)
+
+
+def test_only_lock_holder_refreshes(tmp_path):
+    lock_path = str(tmp_path / "refresher.lock")
+    probes = [Probe(), Probe()]
+    refreshers = [PriorityRefresher(interval=0.01, lock_path=lock_path,
+                                    connection_factory=lambda p=p: FakeConnection(p)) for p in probes]
+    for r in refreshers:
+        r.start()
+    time.sleep(0.2)
+    counts = [len(p.queries) for p in probes]
+    assert sorted(counts)[0] == 0 and sorted(counts)[1] > 0
+
+    # Leader dừng -> tiến trình còn lại tiếp quản
+    leader = counts.index(max(counts))
+    refreshers[leader].stop()
+    follower = probes[1 - leader]
+    time.sleep(0.2)
+    assert len(follower.queries) > 0
+    refreshers[1 - leader].stop()
@@ -0,0 +1,100 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.prompt_builder import (
+    assemble_prompt, estimate_tokens, fit_history, render_context, select_context_rows, trim_to_tokens,
+)
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+
+def row(title, hours, score):
+    deadline = (NOW + timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S') if hours is not None else None
+    return (title, "MH01", deadline, 3, score)
+
+
+def turn(role, text):
+    return {"role": role, "parts": [text]}
+
+
+def conversation(n, length=200, seed=0):
+    rng = random.Random(seed)
+    return [turn("user" if i % 2 == 0 else "model", f"{i}: " + "chữ " * rng.randint(1, length))
+            for i in range(n)]
+
+
+def history_tokens(history):
+    return sum(estimate_tokens(m["parts"][0]) for m in history)
+
+
+def test_select_context_rows_keeps_top_and_nearest_upcoming():
+    rows = [row(f"top{i}", 100 + i, 90 - i) for i in range(3)]
+    rows += [row("past", -5, 10), row("far", 500, 9), row("soon", 2, 8), row("no_deadline", None, 7),
+             row("next", 20, 6)]
+    selected, omitted = select_context_rows(rows, top_k=3, nearest_k=2, now=NOW)
+    assert [r[0] for r in selected] == ["top0", "top1", "top2", "soon", "next"]
+    assert omitted == 3
+
+
+def test_select_context_rows_small_input():
+    rows = [row("a", 1, 5)]
+    assert select_context_rows(rows, top_k=10, nearest_k=5, now=NOW) == (rows, 0)
+    assert select_context_rows([], now=NOW) == ([], 0)
+
+
+def test_render_context_mentions_omitted():
+    text = render_context([row("Bài 1", 3, 50)], omitted=4)
+    assert "Bài 1" in text and "Còn 4 deadline" in text
+    assert "chưa có lịch trình" in render_context([])
+
+
+@pytest.mark.parametrize("max_tokens", [0, 5, 20, 50, 200, 10000])
+def test_trim_to_tokens_stays_within_budget(max_tokens):
+    text = render_context([row(f"Nhiệm vụ {i}", i, 100 - i) for i in range(40)])
+    trimmed = trim_to_tokens(text, max_tokens)
+    assert estimate_tokens(trimmed) <= max_tokens
+    assert text.startswith(trimmed.replace("(...đã lược bớt)\n", ""))
+    if estimate_tokens(text) <= max_tokens:
+        assert trimmed == text
+
+
+def test_fit_history_keeps_recent_turns_whole():
+    history = conversation(6, length=5)
+    kept, used = fit_history(history, 10000)
+    assert kept == history and used == history_tokens(history)
+
+
+@pytest.mark.parametrize("budget", [0, 10, 30, 60, 120, 400, 1500])
+@pytest.mark.parametrize("seed", range(3))
+def test_fit_history_within_budget_and_alternating(budget, seed):
+    history = conversation(30, seed=seed)
+    kept, used = fit_history(history, budget)
+    assert used == history_tokens(kept) <= budget
+    roles = [m["role"] for m in kept]
+    assert all(a != b for a, b in zip(roles, roles[1:]))
+    # Các lượt giữ nguyên là đuôi của lịch sử
+    whole = [m for m in kept if m in history]
+    assert whole == history[len(history) - len(whole):]
+
+
+def test_fit_history_summarizes_older_questions():
+    history = [turn("user", "Câu hỏi cũ về toán"), turn("model", "x " * 400), turn("user", "Câu mới")]
+    kept, _ = fit_history(history, 200)
+    assert kept[0]["role"] == "user" and "Câu hỏi cũ về toán" in kept[0]["parts"][0]
+    assert kept[-1] == history[-1]
+
+
+@pytest.mark.parametrize("budget", [200, 500, 1000, 3000])
+def test_assemble_prompt_within_budget(budget):
+    context = render_context([row(f"Nhiệm vụ dài số {i}", i, 100 - i) for i in range(200)])
+    history = conversation(40)
+
+    def build(ctx):
+        return f"Bạn là trợ lý học tập.\n{ctx}\nCâu hỏi: Tôi nên làm gì trước?"
+
+    prompt, kept, total = assemble_prompt(build, context, history, budget)
+    assert total == estimate_tokens(prompt) + history_tokens(kept)
+    assert total <= budget
+    assert prompt.endswith("Tôi nên làm gì trước?")
@@ -0,0 +1,57 @@
+from services.reference_cache import ReferenceCache
+
+
+class FakeCursor:
+    """Trả về `row` cho mọi câu SELECT; on_execute giả lập một lượt ghi chen vào giữa lúc đọc."""
+
+    def __init__(self, row, on_execute=None):
+        self.row = row
+        self.on_execute = on_execute
+        self.executed = 0
+
+    def execute(self, sql, *params):
+        self.executed += 1
+        if self.on_execute:
+            self.on_execute()
+
+    def fetchone(self):
+        return self.row
+
+
+def test_read_through_caches_subject():
+    cache = ReferenceCache()
+    cursor = FakeCursor((4.5,))
+    assert cache.get_diem_kho(cursor, "MH1") == 4.5
+    assert cache.get_diem_kho(cursor, "MH1") == 4.5
+    assert cursor.executed == 1
+
+
+def test_stale_subject_fill_is_rejected():
+    cache = ReferenceCache()
+    # DiemKho được sửa (note_subject) trong lúc lượt đọc cũ đang chạy
+    stale = FakeCursor((2.0,), on_execute=lambda: cache.note_subject("MH1", 5.0))
+    assert cache.get_diem_kho(stale, "MH1") == 2.0
+    cursor = FakeCursor((9.9,))
+    assert cache.get_diem_kho(cursor, "MH1") == 5.0
+    assert cursor.executed == 0
+
+
+def test_stale_student_fill_is_rejected_after_invalidate():
+    cache = ReferenceCache()
+    stale = FakeCursor(("SV1",), on_execute=lambda: cache.invalidate(sv_id="SV1"))
+    assert cache.student_exists(stale, "SV1") is True
+    cursor = FakeCursor(("SV1",))
+    assert cache.student_exists(cursor, "SV1") is True
+    assert cursor.executed == 1
+
+
+def test_fill_many_with_old_version_is_dropped():
+    cache = ReferenceCache()
+    version = cache.version
+    cache.invalidate()
+    cache.fill_many(version, students={"SV1"}, subjects={"MH1": 1.0})
+    assert cache.cached_students({"SV1"}) == set()
+    assert cache.cached_subjects({"MH1"}) == {}
+    cache.fill_many(cache.version, students={"SV1"}, subjects={"MH1": 1.0})
+    assert cache.cached_students({"SV1"}) == {"SV1"}
+    assert cache.cached_subjects({"MH1"}) == {"MH1": 1.0}
@@ -0,0 +1,29 @@
+from services.response_cache import ResponseCache
+
+CONTEXT = "- Bài tập (MH1): hạn 2026-10-20"
+
+
+def test_default_is_exact_match_only():
+    cache = ResponseCache(ttl=60)
+    cache.store("SV1", "Hôm nay tôi nên làm gì trước?", CONTEXT, "Làm bài tập MH1")
+    assert cache.lookup("SV1", "hôm nay tôi nên làm gì trước", CONTEXT) == "Làm bài tập MH1"
+    assert cache.lookup("SV1", "hôm nay tôi nên làm gì trước nhỉ", CONTEXT) is None
+
+
+def test_near_match_requires_same_course_codes_and_numbers():
+    cache = ResponseCache(ttl=60, similarity=0.7)
+    cache.store("SV1", "deadline môn MH1 là khi nào", CONTEXT, "Hạn MH1")
+    assert cache.lookup("SV1", "deadline môn MH2 là khi nào", CONTEXT) is None
+    assert cache.lookup("SV1", "deadline của môn MH1 là khi nào", CONTEXT) == "Hạn MH1"
+
+
+def test_near_match_requires_same_negation():
+    cache = ResponseCache(ttl=60, similarity=0.7)
+    cache.store("SV1", "hôm nay tôi nên làm gì trước", CONTEXT, "Nên làm MH1")
+    assert cache.lookup("SV1", "hôm nay tôi không nên làm gì trước", CONTEXT) is None
+
+
+def test_context_change_invalidates():
+    cache = ResponseCache(ttl=60)
+    cache.store("SV1", "tuần này có gì", CONTEXT, "MH1")
+    assert cache.lookup("SV1", "tuần này có gì", CONTEXT + " (đã đổi)") is None
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from services.schedule_events import ScheduleEventBus, TooManySubscribersError
+
+
+def test_publish_without_listener_is_noop():
+    bus = ScheduleEventBus()
+    assert bus.publish("SV1", "updated") is None
+    assert bus.stats()["published"] == 0
+
+
+def test_reconnect_replays_history_after_last_event_id():
+    bus = ScheduleEventBus(history_size=10)
+    sub = bus.subscribe("SV1")
+    seqs = [bus.publish("SV1", "updated", LichTrinhID=f"LT{i}") for i in range(3)]
+    assert sub.get(timeout=0)[0] == seqs[0]
+    sub.close()
+    again = bus.subscribe("SV1", last_event_id=str(seqs[0]))
+    assert [seq for seq, _ in again.backlog] == seqs[1:]
+    assert [e["LichTrinhID"] for _, e in again.backlog] == ["LT1", "LT2"]
+
+
+def test_reconnect_past_history_gets_resync():
+    bus = ScheduleEventBus(history_size=2)
+    sub = bus.subscribe("SV1")
+    first = bus.publish("SV1", "updated")
+    for _ in range(3):
+        bus.publish("SV1", "updated")
+    sub.close()
+    # Sự kiện sau `first` đã bị đẩy khỏi lịch sử -> không phát bù được
+    again = bus.subscribe("SV1", last_event_id=first)
+    assert again.backlog == [(None, {"type": "resync", "SinhVienID": "SV1"})]
+    # id không phải số thì bị bỏ qua, id "từ tương lai" thì nhận resync
+    assert bus.subscribe("SV1", last_event_id="abc").backlog == []
+    assert bus.subscribe("SV1", last_event_id=10 ** 30).backlog[0][1]["type"] == "resync"
+
+
+def test_max_subscribers():
+    bus = ScheduleEventBus(max_subscribers=2)
+    a = bus.subscribe("SV1")
+    bus.subscribe("SV2")
+    with pytest.raises(TooManySubscribersError):
+        bus.subscribe("SV3")
+    a.close()
+    a.close()                   # đóng hai lần không trừ hai lần
+    bus.subscribe("SV3")
+    assert bus.stats()["subscribers"] == 2
+
+
+def test_slow_subscriber_is_dropped_and_told_to_resync():
+    bus = ScheduleEventBus(queue_size=2)
+    slow = bus.subscribe("SV1")
+    fast = bus.subscribe("SV1")
+    for _ in range(3):
+        bus.publish("SV1", "updated")
+        fast.get(timeout=0)
+    assert bus.stats()["dropped"] == 1
+    assert slow.get(timeout=0) == (None, {"type": "resync", "SinhVienID": "SV1"})
+    assert slow.get(timeout=0) is None          # hàng đợi cũ đã bị bỏ
+    seq = bus.publish("SV1", "updated")
+    assert slow.get(timeout=0)[0] == seq
+
+
+def test_dropped_count_is_exact_under_concurrent_publish():
+    bus = ScheduleEventBus(queue_size=1, history_size=10)
+    bus.subscribe("SV1")
+    bus.publish("SV1", "updated")       # lấp đầy hàng đợi; mọi lần sau đều bị bỏ
+
+    def worker():
+        for _ in range(500):
+            bus.publish("SV1", "updated")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert bus.stats()["published"] == 2001
+    assert bus.stats()["dropped"] == 2000
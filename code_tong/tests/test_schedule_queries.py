@@ -0,0 +1,41 @@
+import pytest
+
+from database.schedule_queries import (
+    build_schedule_page_query, clamp_page_size, normalize_date_filter, parse_flag,
+)
+
+
+def test_date_filters_are_normalized():
+    _, params = build_schedule_page_query("SV001", 20, tu_ngay="2026-10-01", den_ngay="2026-10-31")
+    assert params[1:3] == ["2026-10-01 00:00:00", "2026-10-31 23:59:59"]
+    _, params = build_schedule_page_query("SV001", 20, tu_ngay="2026-10-01 08:00:00")
+    assert params[1] == "2026-10-01 08:00:00"
+
+
+@pytest.mark.parametrize("value", ["2026-10-01T08:00", "01/10/2026", "2026-13-01", "abc", 20261001])
+def test_malformed_date_filter_is_rejected(value):
+    with pytest.raises(ValueError):
+        normalize_date_filter(value, "TuNgay")
+    with pytest.raises(ValueError):
+        build_schedule_page_query("SV001", 20, den_ngay=value)
+
+
+@pytest.mark.parametrize("value", [None, [20], "abc", {}])
+def test_bad_page_size_is_value_error(value):
+    with pytest.raises(ValueError):
+        clamp_page_size(value)
+    assert clamp_page_size("500") == 100 and clamp_page_size(0) == 1
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, False), (False, False), (True, True), (0, False), (1, True),
+    ("false", False), ("0", False), ("", False), ("True", True), ("1", True),
+])
+def test_parse_flag(value, expected):
+    assert parse_flag(value, "QuaHan") is expected
+
+
+@pytest.mark.parametrize("value", ["yes", 2, [True], 1.5])
+def test_parse_flag_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_flag(value, "QuaHan")
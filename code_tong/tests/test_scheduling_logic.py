@@ -0,0 +1,77 @@
+import random
+import sqlite3
+
+import pytest
+
+from algorithms.scheduling_logic import SCHEDULE_ORDER_BY, iter_schedule, optimize_schedule
+
+COLUMNS = ("LichTrinhID", "TieuDe", "ThoiGianKetThuc", "DiemUuTien")
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.description = [(c,) for c in COLUMNS]
+        self._rows = list(rows)
+        self.fetched = 0
+
+    def fetchmany(self, size):
+        batch = self._rows[self.fetched:self.fetched + size]
+        self.fetched += len(batch)
+        return batch
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        score = rng.choice([None, 0.0, 10.0, 55.5, 80.0, 100.0])
+        deadline = None if rng.random() < 0.1 else f"2026-10-{rng.randint(10, 30)} {rng.randint(0, 23):02d}:00:00"
+        rows.append((f"LT{i:04d}", f"Việc {i}", deadline, score))
+    return rows
+
+
+def ids(tasks):
+    return [t["LichTrinhID"] for t in tasks]
+
+
+def test_tie_break_score_desc_then_deadline_asc():
+    rows = [
+        ("A", "", "2026-10-20 08:00:00", 50.0),
+        ("B", "", "2026-10-19 08:00:00", 50.0),
+        ("C", "", None, 50.0),
+        ("D", "", "2026-10-25 08:00:00", 90.0),
+        ("E", "", "2026-10-18 08:00:00", None),
+    ]
+    assert ids(iter_schedule(FakeCursor(rows))) == ["D", "B", "A", "C", "E"]
+
+
+@pytest.mark.parametrize("limit", [1, 5, 37, 500])
+def test_heap_top_k_matches_full_sort(limit):
+    rows = make_rows(300)
+    full = ids(iter_schedule(FakeCursor(rows)))
+    assert ids(iter_schedule(FakeCursor(rows), limit=limit)) == full[:limit]
+
+
+def test_limit_zero_and_none():
+    rows = make_rows(20)
+    assert list(iter_schedule(FakeCursor(rows), limit=0)) == []
+    assert optimize_schedule([{"DiemUuTien": 1}], limit=0) == []
+    assert len(list(iter_schedule(FakeCursor(rows), limit=None))) == 20
+
+
+def test_presorted_stops_reading_after_limit():
+    cursor = FakeCursor(make_rows(1000))
+    assert len(list(iter_schedule(cursor, limit=3, presorted=True, batch_size=10))) == 3
+    assert cursor.fetched == 10
+
+
+def test_sql_order_by_matches_python_order():
+    rows = make_rows(300, seed=1)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE LichTrinh (LichTrinhID TEXT, TieuDe TEXT, ThoiGianKetThuc DATETIME, DiemUuTien FLOAT)")
+    db.executemany("INSERT INTO LichTrinh VALUES (?, ?, ?, ?)", rows)
+    cursor = db.execute(f"SELECT {', '.join(COLUMNS)} FROM LichTrinh {SCHEDULE_ORDER_BY} LIMIT ?", (50,))
+    from_db = list(iter_schedule(cursor, limit=50, presorted=True))
+    from_heap = optimize_schedule([dict(zip(COLUMNS, r)) for r in sorted(rows)], limit=50)
+    key = lambda t: (t["DiemUuTien"] or 0, t["ThoiGianKetThuc"])
+    assert [key(t) for t in from_db] == [key(t) for t in from_heap]
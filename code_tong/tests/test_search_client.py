@@ -0,0 +1,51 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.search_client import GoogleSearchClient
+
+
+@pytest.fixture
+def upstream():
+    """Server giả trả 429 kèm Retry-After cấu hình được, đếm số lần bị gọi."""
+    state = {"retry_after": "3600", "calls": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["calls"] += 1
+            self.send_response(429)
+            self.send_header("Retry-After", state["retry_after"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/"
+    yield state
+    server.shutdown()
+
+
+def test_long_retry_after_fails_fast(upstream):
+    client = GoogleSearchClient("k", "cx", endpoint=upstream["url"], retries=3, max_backoff=1)
+    start = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        client.search("python")
+    assert time.monotonic() - start < 1
+    assert upstream["calls"] == 1
+    client.close()
+
+
+def test_short_retry_after_is_honoured(upstream):
+    upstream["retry_after"] = "0"
+    client = GoogleSearchClient("k", "cx", endpoint=upstream["url"], retries=2, max_backoff=1)
+    with pytest.raises(requests.HTTPError):
+        client.search("python")
+    assert upstream["calls"] == 3
+    assert client.retried == 2
+    client.close()
@@ -0,0 +1,70 @@
+import threading
+
+from services import session_store
+from services.session_store import SQLiteSessionStore, MemorySessionStore
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"q{i}"}, {"role": "model", "content": f"a{i}"}]
+
+
+def test_sqlite_round_trip_survives_reopen(tmp_path):
+    path = str(tmp_path / "s.db")
+    store = SQLiteSessionStore(path=path)
+    store.append("s1", _turn(1))
+    store.append("s1", [{"role": "user", "content": "tiếng Việt"}])
+    reopened = SQLiteSessionStore(path=path)
+    assert reopened.get_history("s1") == _turn(1) + [{"role": "user", "content": "tiếng Việt"}]
+    assert reopened.get_history("khong-co") == []
+    reopened.delete("s1")
+    assert store.get_history("s1") == []
+
+
+def test_sqlite_keeps_last_max_turns(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "s.db"), max_turns=4)
+    for i in range(5):
+        store.append("s1", _turn(i))
+    assert store.get_history("s1") == _turn(3) + _turn(4)
+
+
+def test_sqlite_ttl_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    store = SQLiteSessionStore(path=str(tmp_path / "s.db"), idle_ttl=60)
+    store.append("s1", _turn(1))
+    store.append("s2", _turn(2))
+    now[0] += 30
+    assert store.get_history("s1") == _turn(1)   # đọc cũng gia hạn phiên
+    now[0] += 45
+    assert store.get_history("s2") == []
+    assert store.get_history("s1") == _turn(1)
+    now[0] += 61
+    assert store.purge_expired() == 1
+    assert len(store) == 0
+
+
+def test_memory_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    store = MemorySessionStore(idle_ttl=60)
+    store.append("s1", _turn(1))
+    now[0] += 61
+    assert store.get_history("s1") == []
+
+
+def test_sqlite_concurrent_append_across_workers(tmp_path):
+    # Hai store trên cùng file giống hai worker gunicorn; không được mất lượt nào
+    path = str(tmp_path / "s.db")
+    stores = [SQLiteSessionStore(path=path, max_turns=1000) for _ in range(2)]
+
+    def worker(store, start):
+        for i in range(start, start + 50):
+            store.append("s1", [{"role": "user", "content": f"q{i}"}])
+
+    threads = [threading.Thread(target=worker, args=(stores[k % 2], k * 50)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    contents = [m["content"] for m in stores[0].get_history("s1")]
+    assert sorted(contents) == sorted(f"q{i}" for i in range(200))
@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from algorithms.time_blocking import (
+    FreeSlots, MAX_HORIZON_DAYS, clamp_horizon_days, plan_study_blocks, validate_windows,
+)
+
+NOW = datetime(2026, 10, 19, 8, 0, 0)   # Thứ Hai
+FMT = '%Y-%m-%d %H:%M:%S'
+
+
+def task(lt_id, deadline, minutes, score=0):
+    return {"LichTrinhID": lt_id, "ThoiGianKetThuc": deadline, "SoPhutUocTinh": minutes, "DiemUuTien": score}
+
+
+def window(start, end):
+    return {"BatDau": start, "KetThuc": end}
+
+
+def blocks_by_task(plan):
+    result = {}
+    for b in plan["Blocks"]:
+        result.setdefault(b["LichTrinhID"], []).append((b["BatDau"], b["KetThuc"]))
+    return result
+
+
+def test_edf_earliest_deadline_gets_earliest_slot():
+    tasks = [
+        task("late", "2026-10-25 00:00:00", 60, score=100),
+        task("early", "2026-10-20 00:00:00", 60),
+        task("no_deadline", None, 60, score=100),
+        task("mid_high", "2026-10-22 00:00:00", 60, score=90),
+        task("mid_low", "2026-10-22 00:00:00", 60, score=10),
+    ]
+    plan = plan_study_blocks(tasks, windows=[window("2026-10-19 09:00:00", "2026-10-19 14:00:00")], now=NOW)
+    order = [b["LichTrinhID"] for b in plan["Blocks"]]
+    assert order == ["early", "mid_high", "mid_low", "late", "no_deadline"]
+    assert not any(t["TreHan"] for t in plan["Tasks"])
+
+
+def test_infeasible_deadline_is_flagged():
+    tasks = [task("A", "2026-10-19 10:00:00", 180), task("B", "2026-10-30 00:00:00", 600)]
+    plan = plan_study_blocks(tasks, windows=[window("2026-10-19 09:00:00", "2026-10-19 13:00:00")], now=NOW)
+    summary = {t["LichTrinhID"]: t for t in plan["Tasks"]}
+    # A xong lúc 12:00 sau hạn 10:00; B chỉ còn 60 phút trống cho 600 phút cần
+    assert summary["A"]["TreHan"] and summary["A"]["SoPhutDaXep"] == 180
+    assert summary["B"]["TreHan"] and summary["B"]["SoPhutDaXep"] == 60
+
+
+def test_long_task_is_split_and_blocks_do_not_overlap():
+    windows = [{"Thu": d, "BatDau": "19:00", "KetThuc": "22:00"} for d in range(7)]
+    plan = plan_study_blocks([task("big", "2026-10-31 00:00:00", 400), task("small", "2026-10-31 00:00:00", 30)],
+                             windows=windows, now=NOW)
+    parts = blocks_by_task(plan)["big"]
+    assert [b["SoPhut"] for b in plan["Blocks"] if b["LichTrinhID"] == "big"] == [120, 60, 120, 60, 40]
+    assert parts[0] == ("2026-10-19 19:00:00", "2026-10-19 21:00:00")
+    spans = sorted((b["BatDau"], b["KetThuc"]) for b in plan["Blocks"])
+    assert all(prev[1] <= cur[0] for prev, cur in zip(spans, spans[1:]))
+
+
+def test_short_gap_is_skipped():
+    slots = FreeSlots([(NOW, NOW + timedelta(minutes=10)), (NOW + timedelta(hours=1), NOW + timedelta(hours=2))])
+    assert slots.take(30) == [(NOW + timedelta(hours=1), NOW + timedelta(hours=1, minutes=30))]
+    # Phần còn thiếu nhỏ hơn khối tối thiểu thì được dùng khoảng ngắn
+    assert slots.take(5) == [(NOW, NOW + timedelta(minutes=5))]
+
+
+def test_malformed_task_deadline_is_treated_as_no_deadline():
+    plan = plan_study_blocks([task("bad", "2026-10-20T10:00", 30), task("ok", "2026-10-20 10:00:00", 30)],
+                             windows=[window("2026-10-19 09:00:00", "2026-10-19 12:00:00")], now=NOW)
+    assert [b["LichTrinhID"] for b in plan["Blocks"]] == ["ok", "bad"]
+
+
+@pytest.mark.parametrize("windows", [
+    [], "19:00", [{"Thu": 7, "BatDau": "19:00", "KetThuc": "22:00"}],
+    [{"Thu": 1, "BatDau": "7pm", "KetThuc": "22:00"}], [{"Thu": 1}],
+    [window("2026-10-19 12:00:00", "2026-10-19 09:00:00")], [window("2026-10-19", "2026-10-20")], [42],
+])
+def test_invalid_windows_rejected(windows):
+    with pytest.raises(ValueError):
+        validate_windows(windows)
+
+
+def test_horizon_is_clamped():
+    assert clamp_horizon_days("30") == 30
+    assert clamp_horizon_days(10 ** 9) == MAX_HORIZON_DAYS
+    assert clamp_horizon_days(-5) == 1
+    for bad in ("abc", None, [1]):
+        with pytest.raises(ValueError):
+            clamp_horizon_days(bad)
+
+
+def test_500_tasks_over_30_days_is_fast():
+    rng = random.Random(0)
+    tasks = [{"LichTrinhID": f"LT{i}",
+              "ThoiGianKetThuc": (NOW + timedelta(minutes=rng.randint(60, 30 * 1440))).strftime(FMT),
+              "DiemKho": rng.randint(1, 5), "MucDoQuanTrong": rng.randint(1, 5),
+              "DiemUuTien": rng.uniform(0, 100)} for i in range(500)]
+    windows = [{"Thu": d, "BatDau": s, "KetThuc": e} for d in range(7)
+               for s, e in (("07:00", "11:30"), ("13:30", "17:00"), ("19:00", "23:00"))]
+    plan_study_blocks(tasks, windows=windows, now=NOW)   # làm nóng
+    best = min(_timed(lambda: plan_study_blocks(tasks, windows=windows, now=NOW)) for _ in range(3))
+    assert best < 0.05
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
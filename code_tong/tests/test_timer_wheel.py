@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from services.deadline_notifier import TimerWheel
+
+
+def make_wheel(levels=(4, 4, 4)):
+    # tick 1s, tầm xa 64 tick: đủ nhỏ để đi qua mọi tầng và heap tràn
+    return TimerWheel(tick=1.0, levels=levels, now=0)
+
+
+def fire_ticks(wheel, until):
+    fired = {}
+    for t in range(1, until + 1):
+        for payload in wheel.advance(t):
+            assert payload not in fired, f"{payload} bắn hai lần"
+            fired[payload] = t
+    return fired
+
+
+@pytest.mark.parametrize("expire", [1, 3, 4, 5, 15, 16, 17, 63, 64, 65, 200])
+def test_fires_exactly_on_expire_tick(expire):
+    wheel = make_wheel()
+    wheel.add("k", expire, expire)
+    assert fire_ticks(wheel, 300) == {expire: expire}
+    assert wheel.size == 0
+
+
+def test_cascades_through_every_level():
+    wheel = make_wheel()
+    expires = list(range(1, 130))
+    for e in expires:
+        wheel.add(e, e, e)
+    assert sum(map(len, wheel._wheels[2])) > 0 and wheel._overflow
+    assert fire_ticks(wheel, 140) == {e: e for e in expires}
+
+
+def test_cancel_before_and_after_cascade():
+    wheel = make_wheel()
+    early = wheel.add("a", 20, "a")
+    late = wheel.add("b", 40, "b")
+    kept = wheel.add("c", 40, "c")
+    wheel.cancel(early)
+    wheel.cancel(early)           # hủy hai lần không làm lệch size
+    assert wheel.advance(32) == []
+    wheel.cancel(late)            # đã được đổ xuống tầng dưới rồi mới hủy
+    assert wheel.advance(50) == ["c"]
+    wheel.cancel(kept)            # đã bắn: no-op
+    assert wheel.size == 0
+
+
+def test_past_deadline_fires_on_next_advance():
+    wheel = make_wheel()
+    wheel.advance(10)
+    wheel.add("old", 3, "old")
+    assert wheel.advance(10) == ["old"]
+    assert wheel.advance(11) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fuzz_against_reference(seed):
+    rng = random.Random(seed)
+    wheel = make_wheel(levels=(8, 4, 3))
+    now = 0
+    live = {}                     # payload -> (entry, expire)
+    fired = []
+    for step in range(3000):
+        op = rng.random()
+        if op < 0.5:
+            expire = now + rng.randint(-5, 250)
+            payload = step
+            live[payload] = (wheel.add(payload, expire, payload), expire)
+        elif op < 0.6 and live:
+            payload = rng.choice(list(live))
+            wheel.cancel(live.pop(payload)[0])
+        else:
+            now += rng.choice([0, 1, 1, 2, 7, 30])
+            for payload in wheel.advance(now):
+                entry, expire = live.pop(payload)
+                fired.append(payload)
+                assert expire <= now      # không bắn sớm
+            # Không bắn trễ: sau advance, entry còn sống đều có hạn sau `now`
+            assert all(expire > now for _, expire in live.values())
+        assert wheel.size == len(live)
+    now += 300
+    for payload in wheel.advance(now):
+        live.pop(payload)
+        fired.append(payload)
+    assert live == {}
+    assert len(fired) == len(set(fired))
@@ -0,0 +1,63 @@
+import pytest
+
+from algorithms.trust_ranking import TrustRanker, extract_host
+
+
+@pytest.mark.parametrize("url, host", [
+    ("https://hcmus.edu.vn/giao-trinh", "hcmus.edu.vn"),
+    ("HTTP://Fit.HCMUS.edu.vn:8080/a?b=c#d", "fit.hcmus.edu.vn"),
+    ("hcmus.edu.vn/bai-giang", "hcmus.edu.vn"),
+    ("//cdn.example.com/x", "cdn.example.com"),
+    ("https://user:pw@docs.python.org/3/", "docs.python.org"),
+    ("example.com.", "example.com"),
+    ("", ""),
+    (None, ""),
+])
+def test_extract_host(url, host):
+    assert extract_host(url) == host
+
+
+def test_edu_label_matches_subdomains_only_as_whole_label():
+    ranker = TrustRanker()
+    base = ranker.score("https://example.com", "")
+    assert ranker.score("https://fit.hcmus.edu.vn/x", "") > base
+    assert ranker.score("hcmus.edu.vn/x", "") == ranker.score("https://hcmus.edu.vn/x", "")
+    assert ranker.score("https://education.com", "") == base
+    assert ranker.score("https://example.com/edu", "") == base
+
+
+def test_first_rule_in_group_wins():
+    ranker = TrustRanker()
+    edu = ranker.score("https://a.edu", "")
+    gov = ranker.score("https://a.gov", "")
+    assert edu > gov
+    # Cùng nhóm "tld": chỉ luật đầu tiên (edu) được tính, không cộng dồn
+    assert ranker.score("https://a.gov.edu", "") == edu
+    assert ranker.score("https://a.edu.gov", "") == edu
+
+
+def test_groups_add_up_and_social_is_penalized():
+    ranker = TrustRanker()
+    base = ranker.score("https://example.com", "")
+    edu = ranker.score("https://a.edu", "")
+    assert ranker.score("https://a.edu", "Giáo trình PDF") > edu
+    assert ranker.score("https://m.facebook.com/post", "") < base
+    assert ranker.score("https://notfacebook.com", "") == base
+
+
+def test_score_is_clamped():
+    rules = [{"group": "g", "field": "title", "match": "keyword", "values": ["x"], "weight": 100.0}]
+    assert TrustRanker(rules).score("", "x") == 99.0
+    rules[0]["weight"] = -100.0
+    assert TrustRanker(rules).score("", "x") == 1.0
+
+
+def test_rank_sorts_by_score():
+    results = [
+        {"URL": "https://m.facebook.com/a", "TieuDe": "post"},
+        {"URL": "hcmus.edu.vn/a", "TieuDe": "Bài giảng"},
+        {"URL": "https://example.com", "TieuDe": ""},
+    ]
+    ranked = TrustRanker().rank(results)
+    assert [r["URL"] for r in ranked] == ["hcmus.edu.vn/a", "https://example.com", "https://m.facebook.com/a"]
+    assert all("DiemTinCay" in r for r in ranked)
@@ -0,0 +1,5 @@
+# Điểm vào WSGI cho production:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app
+
+app = create_app()